@@ -0,0 +1 @@
+"""Бенчмарки горячих участков пайплайна (запуск: python -m benchmarks.<имя>)."""
@@ -0,0 +1,70 @@
+"""Бенчмарк извлечения <pre><code> блоков: BeautifulSoup ×2 против однопроходного парсера.
+
+Прежняя реализация фактчекинга строила дерево BeautifulSoup дважды (синтаксис
+и песочница). Скрипт сравнивает её с `extract_code_blocks` на больших статьях.
+
+Запуск: python -m benchmarks.bench_code_blocks [--sections 200] [--repeat 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from src.html_scan import extract_code_blocks
+
+
+def _make_article(sections: int) -> str:
+    return "".join(
+        f"<h2>Раздел {i}</h2><p>Текст раздела с <a href='https://example.com/{i}'>ссылкой</a> "
+        f"и <strong>выделением</strong> &amp; сущностями.</p>"
+        "<ul><li>пункт один</li><li>пункт два</li></ul>"
+        f'<pre><code class="language-python">def f_{i}(x):\n    return x * {i} if x &lt; 10 else x\n'
+        f"print(f_{i}(3))</code></pre>"
+        for i in range(sections)
+    )
+
+
+def _legacy(article_html: str) -> int:
+    found = 0
+    for _ in range(2):
+        soup = BeautifulSoup(article_html, "html.parser")
+        for pre in soup.find_all("pre"):
+            code = pre.find("code")
+            if code and any("python" in c for c in code.get("class", [])):
+                code.get_text()
+                found += 1
+    return found // 2
+
+
+def _fast(article_html: str) -> int:
+    return sum(1 for b in extract_code_blocks(article_html) if b.is_python)
+
+
+def _measure(fn, article_html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(article_html)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sections", type=int, nargs="*", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(f"{'sections':>8} {'html KB':>8} {'bs4x2 ms':>10} {'stream ms':>10} {'speedup':>8}")
+    for n in args.sections:
+        doc = _make_article(n)
+        assert _legacy(doc) == _fast(doc) == n
+        legacy = _measure(_legacy, doc, args.repeat)
+        fast = _measure(_fast, doc, args.repeat)
+        print(f"{n:>8} {len(doc) / 1024:>8.0f} {legacy:>10.1f} {fast:>10.1f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Бенчмарк рендеринга обложек: прежний путь против быстрого.
+
+Прежний путь рисовал градиент 630 вызовами `ImageDraw.line`, масштабировал
+весь исходник 1792x1024 LANCZOS перед обрезкой и загружал шрифт на каждую
+обложку. Скрипт меряет время на обложку (фон, обрезка исходника DALL‑E,
+заголовок; с `--encode` — и PNG) при пакетном рендеринге `--covers` штук.
+
+В поэтапной таблице градиент сравнивается честно: построчная отрисовка против
+построения через LUT без `lru_cache`; выигрыш от кэша (копия готового фона
+против построения заново) печатается отдельной строкой. Пакетный замер тоже не
+опирается на кэши: быстрый путь строит градиент заново (`__wrapped__`), у каждой
+обложки свой заголовок, а кэш раскладки строк сбрасывается перед каждым повтором,
+так что ускорение на обложку — это ускорение рендеринга, а не попаданий в кэш.
+Кэшируется только загруженный шрифт (он и должен грузиться один раз на процесс).
+
+Запуск: python -m benchmarks.bench_cover [--covers 10 100] [--repeat 3] [--encode]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from src.cover_generator import (
+    _COVER_SIZE,
+    _FALLBACK_COLORS,
+    _center_crop_to,
+    _generate_base_image,
+    _gradient,
+    _layout_lines,
+    _overlay_text,
+)
+
+_TITLES = [
+    "FastAPI и асинхронность: практическое руководство",
+    "Rust для Python‑разработчиков: первые шаги",
+    "PostgreSQL 16: что нового в логической репликации",
+    "Kubernetes‑операторы на Python без боли",
+]
+
+
+def _title(i: int) -> str:
+    """Уникальный заголовок i‑й обложки (разные заголовки — разная раскладка строк)."""
+    return f"{_TITLES[i % len(_TITLES)]}, часть {i + 1}"
+
+
+def _legacy_base() -> Image.Image:
+    width, height = 1200, 630
+    img = Image.new("RGB", (width, height))
+    top, bottom = (240, 248, 255), (210, 225, 255)
+    for y in range(height):
+        ratio = y / max(1, height - 1)
+        color = tuple(int(top[i] * (1 - ratio) + bottom[i] * ratio) for i in range(3))
+        ImageDraw.Draw(img).line([(0, y), (width, y)], fill=color)
+    return img
+
+
+def _legacy_crop(img: Image.Image, target: tuple[int, int]) -> Image.Image:
+    tw, th = target
+    w, h = img.size
+    scale = max(tw / w, th / h)
+    nw, nh = int(w * scale + 0.5), int(h * scale + 0.5)
+    img2 = img.resize((nw, nh), Image.LANCZOS)
+    left, top = (nw - tw) // 2, (nh - th) // 2
+    return img2.crop((left, top, left + tw, top + th))
+
+
+def _legacy_overlay(img: Image.Image, text: str) -> Image.Image:
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype("arial.ttf", 44)
+    except Exception:
+        font = ImageFont.load_default()
+    margin = 48
+    draw.rectangle([(margin - 16, img.height - 220), (img.width - margin, img.height - margin)], fill=(0, 24, 64))
+    lines: list[str] = []
+    line = ""
+    for w in text.split():
+        test = (line + (" " if line else "") + w).strip()
+        if draw.textlength(test, font=font) <= img.width - 2 * margin:
+            line = test
+        else:
+            if line:
+                lines.append(line)
+            line = w
+    if line:
+        lines.append(line)
+    y = img.height - 200
+    for ln in lines[:2]:
+        draw.text((margin, y), ln, fill=(255, 255, 255), font=font)
+        y += 56
+    return img
+
+
+def _encode(img: Image.Image) -> int:
+    out = io.BytesIO()
+    img.save(out, format="PNG", compress_level=1)
+    return out.tell()
+
+
+def _legacy(source: Image.Image, n: int, encode: bool) -> None:
+    for i in range(n):
+        _legacy_base()
+        img = _legacy_overlay(_legacy_crop(source, (1200, 630)), _title(i))
+        if encode:
+            _encode(img)
+
+
+def _fast(source: Image.Image, n: int, encode: bool) -> None:
+    for i in range(n):
+        _gradient.__wrapped__(_COVER_SIZE, *_FALLBACK_COLORS)
+        img = _overlay_text(_center_crop_to(source, (1200, 630)), _title(i))
+        if encode:
+            _encode(img)
+
+
+def _measure(fn, source: Image.Image, n: int, repeat: int, encode: bool) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        _layout_lines.cache_clear()
+        t0 = time.perf_counter()
+        fn(source, n, encode)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0 / n
+
+
+def _stage(fn, repeat: int = 20) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000.0 / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--covers", type=int, nargs="*", default=[10, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--encode", action="store_true", help="включить кодирование PNG в замер")
+    args = parser.parse_args()
+    # Исходник 1792x1024 — как декодированный ответ DALL‑E (плавные формы + шум)
+    source = Image.merge(
+        "RGB",
+        [
+            Image.linear_gradient("L").resize((1792, 1024)),
+            Image.radial_gradient("L").resize((1792, 1024)),
+            Image.effect_noise((1792, 1024), 24),
+        ],
+    )
+    # `__wrapped__` — функция без lru_cache: каждый вызов строит градиент заново
+    gradient_lut = _stage(lambda: _gradient.__wrapped__(_COVER_SIZE, *_FALLBACK_COLORS))
+    stages = [
+        ("gradient", _stage(_legacy_base), gradient_lut),
+        (
+            "crop",
+            _stage(lambda: _legacy_crop(source, (1200, 630))),
+            _stage(lambda: _center_crop_to(source, (1200, 630))),
+        ),
+    ]
+    print(f"{'stage':>10} {'legacy ms':>10} {'fast ms':>10} {'speedup':>8}")
+    for name, legacy, fast in stages:
+        print(f"{name:>10} {legacy:>10.2f} {fast:>10.2f} {legacy / fast:>7.1f}x")
+    _generate_base_image()  # прогрев кэша
+    gradient_cached = _stage(_generate_base_image)
+    print(
+        f"gradient cache: build {gradient_lut:.2f} ms -> cached copy {gradient_cached:.2f} ms "
+        f"({gradient_lut / gradient_cached:.1f}x)",
+    )
+    print()
+    print(f"{'covers':>8} {'legacy ms/cover':>16} {'fast ms/cover':>14} {'speedup':>8}")
+    for n in args.covers:
+        legacy = _measure(_legacy, source, n, args.repeat, args.encode)
+        fast = _measure(_fast, source, n, args.repeat, args.encode)
+        print(f"{n:>8} {legacy:>16.1f} {fast:>14.1f} {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Контрольные точки прогона агента на диске.
+
+После каждого успешно выполненного узла графа состояние прогона сохраняется в
+`CACHE_DIR/checkpoints/<run_id>.json.gz` — компактный JSON (без пробелов,
+gzip): поля контекста и список завершённых узлов. Байты обложки лежат рядом
+отдельным файлом `<run_id>.cover` и перезаписываются, только если изменились
+(в JSON — их SHA‑256). Запись атомарная (временный файл + `os.replace`), так
+что падение процесса посреди записи не портит предыдущую точку.
+
+Точки старше `CHECKPOINT_TTL_DAYS` удаляются при очередном сохранении.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from ..config import Config
+
+_VERSION = 1
+_SUFFIX = ".json.gz"
+
+
+@dataclass
+class Checkpoint:
+    """Сохранённое состояние прогона: поля контекста (без обложки) и байты обложки."""
+
+    run_id: str
+    fields: dict = field(default_factory=dict)
+    cover_bytes: bytes | None = None
+    saved_at: float = 0.0
+
+
+class CheckpointStore:
+    """Каталог контрольных точек: сохранение, поиск последней, удаление."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        # SHA‑256 уже записанных обложек по run_id — чтобы не переписывать side‑файл на каждом узле
+        self._cover_sha: dict[str, str] = {}
+        root.mkdir(parents=True, exist_ok=True)
+
+    def _state_path(self, run_id: str) -> Path:
+        return self.root / f"{run_id}{_SUFFIX}"
+
+    def _cover_path(self, run_id: str) -> Path:
+        return self.root / f"{run_id}.cover"
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def save(self, run_id: str, fields: dict, cover_bytes: bytes | None = None) -> None:
+        """Сохраняет состояние прогона (поля должны сериализоваться в JSON)."""
+        with self._lock:
+            cover: dict | None = None
+            if cover_bytes:
+                sha = hashlib.sha256(cover_bytes).hexdigest()
+                if self._cover_sha.get(run_id) != sha or not self._cover_path(run_id).exists():
+                    self._write_atomic(self._cover_path(run_id), cover_bytes)
+                    self._cover_sha[run_id] = sha
+                cover = {"file": self._cover_path(run_id).name, "sha256": sha}
+            payload = {"version": _VERSION, "run_id": run_id, "saved_at": time.time(), "cover": cover, "fields": fields}
+            raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._write_atomic(self._state_path(run_id), gzip.compress(raw, compresslevel=6))
+            self._prune()
+
+    def load(self, run_id: str | None = None) -> Checkpoint | None:
+        """Загружает точку `run_id` или самую свежую; None — если точек нет или файл повреждён."""
+        path = self._state_path(run_id) if run_id else self._latest()
+        if path is None or not path.exists():
+            return None
+        try:
+            payload = json.loads(gzip.decompress(path.read_bytes()).decode("utf-8"))
+        except (OSError, ValueError) as e:
+            logging.warning("Checkpoint %s unreadable: %s", path.name, e)
+            return None
+        if payload.get("version") != _VERSION:
+            logging.warning("Checkpoint %s: unsupported version %s", path.name, payload.get("version"))
+            return None
+        rid = str(payload.get("run_id") or path.name[: -len(_SUFFIX)])
+        cover_bytes: bytes | None = None
+        cover = payload.get("cover") or {}
+        if cover:
+            try:
+                cover_bytes = (self.root / str(cover.get("file"))).read_bytes()
+            except OSError as e:
+                logging.warning("Checkpoint %s: cover file missing: %s", rid, e)
+            if cover_bytes is not None and hashlib.sha256(cover_bytes).hexdigest() != cover.get("sha256"):
+                logging.warning("Checkpoint %s: cover checksum mismatch, cover will be regenerated", rid)
+                cover_bytes = None
+        if cover_bytes is not None:
+            self._cover_sha[rid] = hashlib.sha256(cover_bytes).hexdigest()
+        return Checkpoint(rid, dict(payload.get("fields") or {}), cover_bytes, float(payload.get("saved_at") or 0.0))
+
+    def discard(self, run_id: str) -> None:
+        """Удаляет точку прогона (после успешной публикации)."""
+        with self._lock:
+            self._state_path(run_id).unlink(missing_ok=True)
+            self._cover_path(run_id).unlink(missing_ok=True)
+            self._cover_sha.pop(run_id, None)
+
+    def _latest(self) -> Path | None:
+        paths = list(self.root.glob(f"*{_SUFFIX}"))
+        return max(paths, key=lambda p: p.stat().st_mtime) if paths else None
+
+    def _prune(self) -> None:
+        cutoff = time.time() - Config.CHECKPOINT_TTL_DAYS * 86400
+        for path in self.root.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+            except OSError:
+                continue
+
+
+_store: CheckpointStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> CheckpointStore | None:
+    """Общий каталог контрольных точек (создаётся лениво); None, если выключен или недоступен."""
+    global _store  # noqa: PLW0603
+    if not Config.CHECKPOINT_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = CheckpointStore(Config.CACHE_DIR / "checkpoints")
+            except Exception as e:
+                logging.warning("Checkpoints unavailable: %s", e)
+                return None
+        return _store
@@ -1,20 +1,31 @@
-"""Узел графа: вставка CTA в HTML статьи.
+"""Узел графа: вставка CTA и финализация HTML статьи.
 
-Выбирает 1–2 CTA из провайдера и добавляет их в конец статьи. Если CTA нет,
-ничего не делает. Узел изолирован, чтобы провайдер можно было легко заменить.
+Выбирает 1–2 CTA из провайдера (каталог берётся из кэша, без ожидания сети) и
+за один проход по HTML подставляет их на места маркеров `<!--CTA_SLOT-->`
+(без маркеров — в конец), чистит опасную разметку, схлопывает пробелы и
+соблюдает бюджет размера (см. `html_finalizer`). Узел изолирован, чтобы
+провайдер можно было легко заменить.
 """
 
 from __future__ import annotations
 
+import logging
+
 from ..cta_inserter import CTAProvider
+from ..html_finalizer import finalize_html
 
 
 def insert_cta(html: str) -> tuple[str, int]:
-    """Возвращает HTML с добавленными CTA и количество вставленных блоков."""
+    """Возвращает финализированный HTML со вставленными CTA и количество вставленных блоков."""
     provider = CTAProvider()
-    picks = provider.pick_pair()
-    if not picks:
-        return html, 0
-    blocks = [provider.render_cta_html(c) for c in picks]
-    enhanced = html + "\n\n" + "\n".join(blocks)
-    return enhanced, len(blocks)
+    blocks = [provider.render_cta_html(c) for c in provider.pick_pair()]
+    result = finalize_html(html, blocks)
+    logging.info(
+        "FinalizeHTML: %d -> %d bytes, ctas=%d removed=%d truncated=%s",
+        len(html.encode("utf-8")),
+        len(result.html.encode("utf-8")),
+        result.ctas_inserted,
+        result.removed,
+        result.truncated,
+    )
+    return result.html, result.ctas_inserted
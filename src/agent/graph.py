@@ -1,28 +1,72 @@
-"""Минимальный каркас агента (стейт‑машина без внешних зависимостей).
-
-Выполняет один прогон публикации:
-- SelectTopic → Generate → FactCheck (retry=1) → Cover → Publish (retry=3)
-
-Каркас узлов упрощённый, без сторонних библиотек: каждый узел мутирует контекст
-и возвращает признак продолжения графа. В случае неуспеха граф останавливается.
+"""Минимальный каркас агента (граф узлов без внешних зависимостей).
+
+Выполняет один прогон публикации. Граф задан как DAG узлов с объявленными
+входами (зависимостями):
+
+- SelectTopic → GenerateArticle → FactCheck (починка кода или retry=1)
+- SelectTopic → GenerateCover (обложке нужен только заголовок — рисуется параллельно статье)
+- FactCheck → InsertCTA; GenerateCover + FactCheck → UploadCover (параллельно вставке CTA)
+- InsertCTA + UploadCover → Publish (retry=3)
+
+Планировщик запускает узел, как только выполнены все его входы; независимые
+узлы идут параллельно в пуле потоков. Каждый узел мутирует контекст и
+возвращает признак продолжения графа: при `False` новые узлы не запускаются
+(уже запущенные дорабатывают), исключение узла останавливает граф и
+пробрасывается наружу. По итогам прогона в лог пишется критический путь.
+
+`run_graph_async` — тот же граф на asyncio с общим сроком прогона: каждому
+узлу выдаётся таймаут «оставшееся время минус минимальные бюджеты
+обязательных узлов после него» (`NODE_MIN_SEC`); бюджет передаётся в сетевые
+вызовы (`src/deadline.py`) — таймауты HTTP/OpenAI урезаются до остатка, а после
+таймаута узла его поток выходит на ближайшем вызове. Необязательные узлы
+(обложка, её загрузка, CTA) при нехватке времени пропускаются, а по таймауту
+не останавливают граф; внутри узлов так же деградируют DALL‑E и проверка ссылок.
+
+`run_publication_batch` прогоняет N статей конвейером: темы выбираются за
+один сбор кандидатов, графы статей идут параллельно, а число статей,
+одновременно проходящих один узел, ограничено (`BATCH_STAGE_CONCURRENCY`);
+время в очереди к узлу не входит в его бюджет.
+
+После каждого успешного узла контекст сохраняется в контрольную точку
+(`checkpoint.py`); `resume_publication` продолжает прогон с последнего
+завершённого узла — уже выполненные узлы (выбор темы, генерация, фактчекинг,
+обложка) не повторяются. После успешной публикации точка удаляется. Пост
+помечается внутренним тегом Ghost с id прогона, и Publish (в том числе повторная
+попытка и resume после таймаута узла) сначала ищет его — ответ на создание мог
+потеряться, а сам пост уже существовать.
 """
 
 from __future__ import annotations
 
+import asyncio
+import datetime as dt
 import logging
+import threading
 import time
+import uuid
 from collections.abc import Callable
-from dataclasses import dataclass, field
-
-from ..article_generator import generate_article, generate_russian_title
-from ..cover_generator import generate_cover_bytes
-from ..fact_checker import fact_check
-from ..publisher import GhostPublisher
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field, fields, replace
+from functools import partial
+
+from ..article_generator import generate_article, generate_russian_title, repair_code_blocks
+from ..config import Config, parse_mapping
+from ..cover_generator import generate_cover_bytes, start_render_pool
+from ..cta_inserter import prefetch_cta_catalog
+from ..deadline import Budget, DeadlineExceeded, use_budget
+from ..fact_checker import check_code_blocks, fact_check, fact_check_report, replace_code_blocks
+from ..ghost_utils import upload_image_bytes
+from ..publisher import GhostPublisher, slot_msk_11
 from ..state import StateStore
-from ..topics_selector import select_topic
+from ..topics_selector import select_topic, select_topics
+from .checkpoint import Checkpoint, get_checkpoint_store
 from .cta_node import insert_cta
 
 
+def _new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
 @dataclass
 class AgentContext:
     """Контекст одного прогона агента.
@@ -39,19 +83,65 @@ class AgentContext:
     tags: list[str] = field(default_factory=list)
     html: str | None = None
     cover_bytes: bytes | None = None
+    feature_image_url: str | None = None
     publish_result: dict | None = None
     errors: list[str] = field(default_factory=list)
+    # Отчёт планировщика о последнем прогоне (тайминги узлов, критический путь)
+    report: RunReport | None = None
+    # Идентификатор прогона (имя контрольной точки) и узлы, уже выполненные успешно
+    run_id: str = field(default_factory=_new_run_id)
+    completed: list[str] = field(default_factory=list)
+    # Слот публикации (ISO‑время); None — ближайшие 11:00 МСК. Задаётся пакетным режимом
+    publish_at: str | None = None
 
     # Параметры поведения (можно вынести в отдельный конфиг при необходимости)
     retry_publish: int = 3
     retry_delay_sec: float = 2.0
 
 
+@dataclass(frozen=True)
+class Node:
+    """Узел графа: имя, действие над контекстом и имена узлов‑входов.
+
+    Действие возвращает `False`, чтобы остановить граф (None/True — продолжить).
+    `optional` и `min_sec` используются асинхронным планировщиком: необязательный
+    узел пропускается, если на него остаётся меньше `min_sec` секунд.
+    """
+
+    name: str
+    run: Callable[[AgentContext], bool | None]
+    deps: tuple[str, ...] = ()
+    optional: bool = False
+    min_sec: float = 0.0
+
+
+@dataclass
+class RunReport:
+    """Итоги прогона графа: окна выполнения узлов (мс от старта), стена, критический путь."""
+
+    spans: dict[str, tuple[float, float]] = field(default_factory=dict)
+    wall_ms: float = 0.0
+    critical_path: list[str] = field(default_factory=list)
+    critical_ms: float = 0.0
+    halted_at: str | None = None
+    # Необязательные узлы, пропущенные из‑за нехватки времени или по таймауту
+    skipped: list[str] = field(default_factory=list)
+
+    @property
+    def serial_ms(self) -> float:
+        """Сколько занял бы прогон при последовательном выполнении тех же узлов."""
+        return sum(end - start for start, end in self.spans.values())
+
+
 def _timed(step: str, fn: Callable[[], None], *, extra: dict | None = None) -> None:
     """Измеряет время шага и логирует длительность."""
     t0 = time.perf_counter()
     try:
         fn()
+    except DeadlineExceeded as e:
+        # отмена по сроку — штатная ситуация асинхронного планировщика, без трассировки
+        logging.warning("%s stopped: %s", step, e)
+        raise
     except Exception as e:
         logging.exception("%s failed: %s", step, e)
         raise
@@ -79,94 +169,699 @@ def _run_with_retries(action: Callable[[], None], retries: int, delay_sec: float
             time.sleep(delay_sec)
 
 
-def run_publication_once(ctx: AgentContext | None = None) -> AgentContext:
-    """Выполняет полный цикл публикации и возвращает заполненный контекст.
-
-    - Выбирает уникальную тему (с учётом антидублей за 20 дней)
-    - Генерирует статью и при необходимости один раз пересобирает при провале фактчекинга
-    - Генерирует обложку в памяти
-    - Публикует пост в Ghost (или пропускает, если Ghost не настроен)
+def _topological_order(nodes: list[Node]) -> list[Node]:
+    """Проверяет граф (известные входы, нет циклов) и возвращает узлы в топологическом порядке."""
+    by_name = {n.name: n for n in nodes}
+    for n in nodes:
+        missing = [d for d in n.deps if d not in by_name]
+        if missing:
+            raise ValueError(f"Node {n.name}: unknown inputs {missing}")
+    order: list[Node] = []
+    state: dict[str, int] = {}
+
+    def visit(n: Node) -> None:
+        mark = state.get(n.name)
+        if mark == 2:
+            return
+        if mark == 1:
+            raise ValueError(f"Cycle in agent graph at {n.name}")
+        state[n.name] = 1
+        for d in n.deps:
+            visit(by_name[d])
+        state[n.name] = 2
+        order.append(n)
+
+    for n in nodes:
+        visit(n)
+    return order
+
+
+def _critical_path(order: list[Node], spans: dict[str, tuple[float, float]]) -> tuple[list[str], float]:
+    """Самая длинная по суммарной длительности цепочка выполненных узлов."""
+    best: dict[str, tuple[float, str | None]] = {}
+    for n in order:
+        if n.name not in spans:
+            continue
+        start, end = spans[n.name]
+        prev = max(((best[d][0], d) for d in n.deps if d in best), default=(0.0, None))
+        best[n.name] = (prev[0] + (end - start), prev[1])
+    if not best:
+        return [], 0.0
+    name: str | None = max(best, key=lambda k: best[k][0])
+    total = best[name][0]
+    path: list[str] = []
+    while name is not None:
+        path.append(name)
+        name = best[name][1]
+    return path[::-1], total
+
+
+def run_graph(
+    nodes: list[Node],
+    context: AgentContext,
+    *,
+    max_workers: int | None = None,
+    on_node_done: Callable[[str], None] | None = None,
+) -> RunReport:
+    """Выполняет DAG узлов: каждый узел стартует, как только готовы его входы.
+
+    Семантика отказов как у последовательного графа: `False` от узла — новые
+    узлы не запускаются; исключение — то же и затем проброс исключения.
+    Узлы из `context.completed` считаются выполненными и не запускаются;
+    успешно выполненные узлы добавляются туда же, после чего вызывается
+    `on_node_done(имя)` (например, сохранение контрольной точки).
     """
-    context = ctx or AgentContext()
-
-    # 1) Выбор темы
-    def _select() -> None:
-        sel = select_topic(context.state)
-        context.raw_title = str(sel.get("title", ""))
-        context.title = generate_russian_title(context.raw_title or "")
-        context.tags = list(sel.get("tags", []))
-        context.outline = list(sel.get("outline", []))
-
-    _timed("SelectTopic", _select, extra={"raw": context.raw_title})
+    order = _topological_order(nodes)
+    report = RunReport()
+    ok: set[str] = {n.name for n in order if n.name in context.completed}
+    started: set[str] = set(ok)
+    if ok:
+        logging.info("Graph: run %s, already done: %s", context.run_id, ", ".join(context.completed))
+    pending: dict[Future, Node] = {}
+    error: BaseException | None = None
+    t_run = time.perf_counter()
+    starts: dict[str, float] = {}
+
+    def _call(node: Node) -> bool:
+        starts[node.name] = (time.perf_counter() - t_run) * 1000.0
+        result: bool | None = None
+
+        def _body() -> None:
+            nonlocal result
+            result = node.run(context)
+
+        _timed(node.name, _body)
+        return result is not False
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(order), thread_name_prefix="agent")
+    try:
+        while True:
+            if error is None and report.halted_at is None:
+                for node in order:
+                    if node.name not in started and all(d in ok for d in node.deps):
+                        started.add(node.name)
+                        pending[pool.submit(_call, node)] = node
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                node = pending.pop(fut)
+                end = (time.perf_counter() - t_run) * 1000.0
+                report.spans[node.name] = (starts.get(node.name, end), end)
+                try:
+                    if fut.result():
+                        ok.add(node.name)
+                        context.completed.append(node.name)
+                        if on_node_done is not None:
+                            on_node_done(node.name)
+                    elif report.halted_at is None:
+                        report.halted_at = node.name
+                except Exception as e:
+                    if error is None:
+                        error = e
+                        report.halted_at = node.name
+    finally:
+        pool.shutdown(wait=True)
+    _finish_report(order, report, context, t_run)
+    if error is not None:
+        raise error
+    return report
+
+
+def _finish_report(order: list[Node], report: RunReport, context: AgentContext, t_run: float) -> None:
+    report.wall_ms = (time.perf_counter() - t_run) * 1000.0
+    report.critical_path, report.critical_ms = _critical_path(order, report.spans)
+    context.report = report
+    logging.info(
+        "Graph: wall=%.0f ms critical_path=%s (%.0f ms) serial=%.0f ms%s%s",
+        report.wall_ms,
+        " → ".join(report.critical_path) or "-",
+        report.critical_ms,
+        report.serial_ms,
+        f" skipped={','.join(report.skipped)}" if report.skipped else "",
+        f" halted_at={report.halted_at}" if report.halted_at else "",
+    )
 
-    # 2) Генерация текста
-    def _generate() -> None:
-        html, tags = generate_article(context.title or "", context.outline, context.tags)
-        context.html, context.tags = html, tags
 
-    _timed("GenerateArticle", _generate)
+def _downstream_reserve(order: list[Node]) -> dict[str, float]:
+    """Сколько секунд нужно оставить после узла: самая длинная цепочка минимальных бюджетов обязательных потомков."""
+    children: dict[str, list[Node]] = {n.name: [] for n in order}
+    for n in order:
+        for d in n.deps:
+            children[d].append(n)
+    reserve: dict[str, float] = {}
+    for n in reversed(order):
+        reserve[n.name] = max(
+            ((0.0 if c.optional else c.min_sec) + reserve[c.name] for c in children[n.name]),
+            default=0.0,
+        )
+    return reserve
+
+
+# Служебные поля, которые узлы не меняют и которые не переносятся из копии
+_FORK_SHARED = frozenset({"state", "report", "completed"})
+
+
+def _fork_context(context: AgentContext) -> tuple[AgentContext, dict[str, object]]:
+    """Копия контекста для узла (списки — свои, остальное узлы присваивают целиком) и снимок значений до запуска."""
+    own = replace(context)
+    before: dict[str, object] = {}
+    for f in fields(context):
+        value = getattr(context, f.name)
+        before[f.name] = value
+        if f.name not in _FORK_SHARED and isinstance(value, list):
+            setattr(own, f.name, list(value))
+    return own, before
+
+
+def _merge_context(context: AgentContext, own: AgentContext, before: dict[str, object]) -> None:
+    """Переносит в общий контекст поля, изменённые узлом; в списки — дописанный хвост (например, errors)."""
+    for f in fields(context):
+        if f.name in _FORK_SHARED:
+            continue
+        old, new = before[f.name], getattr(own, f.name)
+        if isinstance(old, list) and isinstance(new, list):
+            if new == old:
+                continue
+            if new[: len(old)] == old:
+                getattr(context, f.name).extend(new[len(old) :])
+                continue
+        elif new is old:
+            continue
+        setattr(context, f.name, new)
+
+
+class _NodeSkipped(Exception):
+    """Необязательному узлу не хватило времени — он пропускается без запуска."""
+
+
+async def run_graph_async(
+    nodes: list[Node],
+    context: AgentContext,
+    *,
+    deadline_sec: float | Callable[[], float],
+    max_workers: int | None = None,
+    on_node_done: Callable[[str], None] | None = None,
+    gates: dict[str, asyncio.Semaphore] | None = None,
+) -> RunReport:
+    """Выполняет DAG на asyncio с общим сроком `deadline_sec` (см. описание модуля).
+
+    Узлы остаются синхронными и исполняются в пуле потоков; у каждого свой
+    `Budget`. Семантика `False`/исключений и `context.completed` — как у
+    `run_graph`; таймаут обязательного узла — `DeadlineExceeded`.
+
+    `gates` — семафоры по именам узлов, общие для нескольких графов в одном
+    цикле событий (пакетный режим): узел ждёт свой семафор до того, как ему
+    выдаётся бюджет, так что очередь не съедает его время. Срок прогона
+    отсчитывается от запуска первого узла (`deadline_sec` может быть функцией —
+    она вызывается в этот момент).
+
+    Узел работает с собственной копией контекста; его изменения переносятся в
+    общий контекст, только если он завершился в срок. Поток узла, снятого по
+    таймауту, может ещё доработать до ближайшей проверки срока, но его записи
+    уже не попадут ни в контекст, ни в контрольную точку.
+    """
+    order = _topological_order(nodes)
+    reserve = _downstream_reserve(order)
+    report = RunReport()
+    ok: set[str] = {n.name for n in order if n.name in context.completed}
+    started: set[str] = set(ok)
+    tasks: dict[asyncio.Task, Node] = {}
+    starts: dict[str, float] = {}
+    error: BaseException | None = None
+    loop = asyncio.get_running_loop()
+    t_run = time.perf_counter()
+    run_deadline: float | None = None
+
+    def _call(node: Node, budget: Budget, own: AgentContext) -> bool:
+        result: bool | None = None
+
+        def _body() -> None:
+            nonlocal result
+            with use_budget(budget):
+                result = node.run(own)
+
+        _timed(node.name, _body)
+        return result is not False
+
+    def _node_seconds(node: Node) -> float:
+        """Бюджет узла в момент его запуска (после ожидания в очереди); срок прогона стартует с первым узлом."""
+        nonlocal run_deadline
+        if run_deadline is None:
+            total = deadline_sec() if callable(deadline_sec) else deadline_sec
+            run_deadline = time.monotonic() + total
+            logging.info("Graph: run %s, deadline %.0f s", context.run_id, total)
+        left = run_deadline - time.monotonic()
+        available = left - reserve[node.name]
+        if node.optional and available < node.min_sec:
+            logging.warning(
+                "Graph: %s skipped, %.0f s left for it (needs %.0f s)",
+                node.name,
+                max(0.0, available),
+                node.min_sec,
+            )
+            raise _NodeSkipped(node.name)
+        if left <= 0:
+            raise DeadlineExceeded(f"run deadline passed before {node.name}")
+        return available if available >= node.min_sec else left
+
+    async def _run(node: Node) -> bool:
+        gate = gates.get(node.name) if gates else None
+        if gate is None:
+            return await _run_budgeted(node)
+        async with gate:
+            return await _run_budgeted(node)
+
+    async def _run_budgeted(node: Node) -> bool:
+        if error is not None or report.halted_at is not None:
+            # граф остановился, пока узел ждал своей очереди
+            return False
+        seconds = _node_seconds(node)
+        starts[node.name] = (time.perf_counter() - t_run) * 1000.0
+        budget = Budget(seconds, node.name)
+        own, before = _fork_context(context)
+        fut = loop.run_in_executor(pool, _call, node, budget, own)
+        try:
+            result = await asyncio.wait_for(fut, timeout=seconds)
+        except asyncio.TimeoutError:
+            # Поток узла не прервать — он выйдет на ближайшем сетевом вызове; его копия контекста отбрасывается
+            budget.cancel()
+            raise DeadlineExceeded(f"{node.name}: no result in {seconds:.0f} s") from None
+        except Exception:
+            _merge_context(context, own, before)
+            raise
+        _merge_context(context, own, before)
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(order), thread_name_prefix="agent")
+    try:
+        while True:
+            progressed = True
+            while progressed and error is None and report.halted_at is None:
+                progressed = False
+                for node in order:
+                    if node.name in started or not all(d in ok for d in node.deps):
+                        continue
+                    started.add(node.name)
+                    tasks[asyncio.create_task(_run(node))] = node
+                    progressed = True
+            if not tasks:
+                break
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                node = tasks.pop(task)
+                if node.name in starts:
+                    report.spans[node.name] = (starts[node.name], (time.perf_counter() - t_run) * 1000.0)
+                try:
+                    if task.result():
+                        ok.add(node.name)
+                        context.completed.append(node.name)
+                        if on_node_done is not None:
+                            on_node_done(node.name)
+                    elif report.halted_at is None:
+                        report.halted_at = node.name
+                except _NodeSkipped:
+                    report.skipped.append(node.name)
+                    ok.add(node.name)
+                except DeadlineExceeded as e:
+                    if node.optional:
+                        logging.warning("Graph: %s timed out, continuing without it: %s", node.name, e)
+                        report.skipped.append(node.name)
+                        ok.add(node.name)
+                    elif error is None:
+                        error = e
+                        report.halted_at = node.name
+                except Exception as e:
+                    if error is None:
+                        error = e
+                        report.halted_at = node.name
+    finally:
+        # не ждём потоки отменённых узлов: их сетевые таймауты уже урезаны бюджетом
+        pool.shutdown(wait=False, cancel_futures=True)
+    _finish_report(order, report, context, t_run)
+    if error is not None:
+        raise error
+    return report
+
+
+# ---- Узлы графа публикации ----
+
+
+def _apply_topic(context: AgentContext, sel: dict[str, object], taken: list[str] | None = None) -> None:
+    """Заполняет контекст выбранной темой; `taken` — заголовки, уже занятые другими статьями пакета."""
+    context.raw_title = str(sel.get("title", ""))
+    recent = [str(t) for t in sel.get("recent_titles", []) or []] + list(taken or [])
+    context.title = generate_russian_title(context.raw_title or "", recent_titles=recent)
+    context.tags = list(sel.get("tags", []))
+    context.outline = list(sel.get("outline", []))
+
+
+def _node_select(context: AgentContext) -> None:
+    _apply_topic(context, select_topic(context.state))
+
+
+def _node_generate(context: AgentContext) -> None:
+    html, tags = generate_article(context.title or "", context.outline, context.tags)
+    context.html, context.tags = html, tags
+
+
+def _node_fact_check(context: AgentContext) -> bool:
+    """Фактчекинг: точечная починка кода, иначе одна пересборка и повторная проверка."""
+    report = fact_check_report(context.html or "", context.title or "")
+    context.errors.extend(report.errors)
+    ok = report.ok
+    if not ok and report.code_issues and not report.fact_errors:
+        # Провалились только блоки кода — чиним их и перепроверяем только исправленные
+        def _repair() -> None:
+            nonlocal ok
+            fixes = repair_code_blocks(report.code_issues)
+            if not fixes or set(fixes) != {i.index for i in report.code_issues}:
+                return
+            repaired_html = replace_code_blocks(context.html or "", fixes)
+            remaining = check_code_blocks(repaired_html, only=set(fixes), max_executions=None)
+            if remaining:
+                context.errors.extend(i.error for i in remaining)
+                return
+            context.html = repaired_html
+            ok = True
+
+        _timed("RepairCodeBlocks", _repair)
+    if ok:
+        return True
+
+    # Пересборка
+    def _regenerate() -> None:
+        html2, tags2 = generate_article(context.title or "", context.outline, context.tags)
+        context.html, context.tags = html2, tags2
+
+    _timed("RegenerateAfterFactCheckFail", _regenerate)
 
-    # 3) Фактчекинг с одной пересборкой
     def _factcheck_once() -> bool:
-        ok, errs = fact_check(context.html or "", context.title or "")
-        if not ok:
+        ok2, errs = fact_check(context.html or "", context.title or "")
+        if not ok2:
             context.errors.extend(errs)
-        return ok
+        return ok2
 
-    ok = False
-    _timed("FactCheck#1", lambda: None)
-    ok = _factcheck_once()
-    if not ok:
-        # Пересборка
-        def _regenerate() -> None:
-            html2, tags2 = generate_article(context.title or "", context.outline, context.tags)
-            context.html, context.tags = html2, tags2
+    # Провал второй проверки — останавливаемся без публикации
+    return _factcheck_once()
 
-        _timed("RegenerateAfterFactCheckFail", _regenerate)
 
-        _timed("FactCheck#2", lambda: None)
-        ok = _factcheck_once()
-        if not ok:
-            # Останавливаемся без публикации
-            return context
+def _node_cover(context: AgentContext) -> None:
+    # Теги — из выбора темы: генерация статьи может идти параллельно
+    context.cover_bytes = generate_cover_bytes(context.title or "", list(context.tags))
 
-    # 4) Обложка
-    def _cover() -> None:
-        context.cover_bytes = generate_cover_bytes(context.title or "")
 
-    _timed("GenerateCover", _cover)
+def _ghost_publisher() -> GhostPublisher | None:
+    try:
+        return GhostPublisher()
+    except Exception:
+        return None
 
-    # 4.1) Вставка CTA
-    def _cta() -> None:
-        if context.html:
-            context.html, _ = insert_cta(context.html)
 
-    _timed("InsertCTA", _cta)
+def _node_upload_cover(context: AgentContext) -> None:
+    # Загрузка идёт параллельно вставке CTA; при неудаче Publish попробует загрузить сам
+    if context.cover_bytes and context.feature_image_url is None and _ghost_publisher() is not None:
+        context.feature_image_url = upload_image_bytes(context.cover_bytes)
 
-    # 5) Публикация (если настроен Ghost) с повторами
-    try:
-        publisher = GhostPublisher()
-    except Exception:
+
+def _node_insert_cta(context: AgentContext) -> None:
+    if context.html:
+        context.html, _ = insert_cta(context.html)
+
+
+def _node_publish(context: AgentContext) -> bool:
+    publisher = _ghost_publisher()
+    if publisher is None:
         # Ghost не настроен — выходим без публикации
-        return context
+        return False
 
     def _publish() -> None:
+        # Пост мог быть создан попыткой, ответ которой потерян (таймаут узла, сбой до
+        # контрольной точки): повтор и resume сначала ищут его по тегу прогона
+        existing = publisher.find_run_post(context.run_id)
+        if existing is not None:
+            logging.info(
+                "Publish: run %s already has post %s, not creating another",
+                context.run_id,
+                existing.get("id"),
+            )
+            context.publish_result = {"posts": [existing]}
+            return
         context.publish_result = publisher.publish(
             title=context.title or "",
             html=context.html or "",
             tags=context.tags,
             feature_image_bytes=context.cover_bytes,
             schedule_msk_11=True,
+            feature_image_url=context.feature_image_url,
+            publish_at=dt.datetime.fromisoformat(context.publish_at) if context.publish_at else None,
+            run_id=context.run_id,
         )
 
     published = _run_with_retries(
         _publish,
         retries=context.retry_publish,
         delay_sec=context.retry_delay_sec,
-        step="Publish",
+        step="PublishAttempt",
     )
     if not published:
-        return context
-
+        return False
     context.state.add_topic(context.title or "")
+    return True
+
+
+def build_publication_graph() -> list[Node]:
+    """DAG одного прогона публикации (см. описание модуля); минимальные бюджеты — из `NODE_MIN_SEC`."""
+    limits = parse_mapping(Config.NODE_MIN_SEC)
+
+    def _min(name: str) -> float:
+        try:
+            return float(limits.get(name.lower(), "0"))
+        except ValueError:
+            return 0.0
+
+    return [
+        Node("SelectTopic", _node_select, min_sec=_min("SelectTopic")),
+        Node("GenerateArticle", _node_generate, ("SelectTopic",), min_sec=_min("GenerateArticle")),
+        Node("FactCheck", _node_fact_check, ("GenerateArticle",), min_sec=_min("FactCheck")),
+        Node("GenerateCover", _node_cover, ("SelectTopic",), optional=True, min_sec=_min("GenerateCover")),
+        Node("InsertCTA", _node_insert_cta, ("FactCheck",), optional=True, min_sec=_min("InsertCTA")),
+        Node(
+            "UploadCover",
+            _node_upload_cover,
+            ("GenerateCover", "FactCheck"),
+            optional=True,
+            min_sec=_min("UploadCover"),
+        ),
+        Node("Publish", _node_publish, ("InsertCTA", "UploadCover"), min_sec=_min("Publish")),
+    ]
+
+
+# Не сохраняются: хранилище состояния и отчёт пересоздаются, обложка — отдельным файлом
+_CHECKPOINT_SKIP = frozenset({"state", "report", "cover_bytes"})
+
+
+def _checkpoint_fields(context: AgentContext) -> dict:
+    data = {}
+    for f in fields(context):
+        if f.name in _CHECKPOINT_SKIP:
+            continue
+        value = getattr(context, f.name)
+        # копии списков/словарей: узлы в других потоках могут дописывать их во время сохранения
+        data[f.name] = list(value) if isinstance(value, list) else dict(value) if isinstance(value, dict) else value
+    return data
+
+
+def _context_from_checkpoint(cp: Checkpoint) -> AgentContext:
+    known = {f.name for f in fields(AgentContext)} - _CHECKPOINT_SKIP
+    context = AgentContext(**{k: v for k, v in cp.fields.items() if k in known})
+    context.run_id = cp.run_id
+    context.cover_bytes = cp.cover_bytes
+    if context.cover_bytes is None and context.feature_image_url is None:
+        # без файла обложки (и уже загруженной в Ghost) узлы обложки нужно выполнить заново
+        context.completed = [n for n in context.completed if n not in ("GenerateCover", "UploadCover")]
     return context
+
+
+def _run_deadline_sec(context: AgentContext) -> float:
+    """Срок прогона: `RUN_DEADLINE_SEC`, но не позже слота публикации минус `RUN_SLOT_MARGIN_SEC`."""
+    slot = dt.datetime.fromisoformat(context.publish_at) if context.publish_at else slot_msk_11()
+    until_slot = (slot - dt.datetime.now(dt.timezone.utc)).total_seconds() - Config.RUN_SLOT_MARGIN_SEC
+    if until_slot <= 0:
+        # слот уже не успеть — публикатор возьмёт следующий, ограничиваемся общим сроком
+        return float(Config.RUN_DEADLINE_SEC) or 3600.0
+    return min(float(Config.RUN_DEADLINE_SEC), until_slot) if Config.RUN_DEADLINE_SEC > 0 else until_slot
+
+
+def _checkpoint_saver(context: AgentContext) -> Callable[[str], None]:
+    store = get_checkpoint_store()
+
+    def _save(_node: str) -> None:
+        if store is None:
+            return
+        try:
+            store.save(context.run_id, _checkpoint_fields(context), context.cover_bytes)
+        except Exception as e:
+            logging.warning("Checkpoint save failed: %s", e)
+
+    return _save
+
+
+def _finish_checkpoint(context: AgentContext) -> None:
+    store = get_checkpoint_store()
+    if store is not None:
+        if context.publish_result:
+            store.discard(context.run_id)
+        else:
+            logging.info("Run %s not published; continue with: python -m src.main resume", context.run_id)
+
+
+async def _run_checkpointed_async(
+    context: AgentContext,
+    nodes: list[Node],
+    gates: dict[str, asyncio.Semaphore] | None = None,
+) -> None:
+    await run_graph_async(
+        nodes,
+        context,
+        deadline_sec=partial(_run_deadline_sec, context),
+        on_node_done=_checkpoint_saver(context),
+        gates=gates,
+    )
+    _finish_checkpoint(context)
+
+
+def _run_checkpointed(context: AgentContext, nodes: list[Node] | None = None) -> None:
+    nodes = nodes or build_publication_graph()
+    if Config.AGENT_RUNNER == "async":
+        asyncio.run(_run_checkpointed_async(context, nodes))
+        return
+    run_graph(nodes, context, on_node_done=_checkpoint_saver(context))
+    _finish_checkpoint(context)
+
+
+def run_publication_once(ctx: AgentContext | None = None) -> AgentContext:
+    """Выполняет полный цикл публикации и возвращает заполненный контекст.
+
+    - Выбирает уникальную тему (с учётом антидублей за 20 дней)
+    - Генерирует статью; при провале фактчекинга только из‑за кода чинит проблемные
+      блоки, иначе (или если починка не помогла) один раз пересобирает статью
+    - Параллельно статье генерирует обложку в памяти
+    - Публикует пост в Ghost (или пропускает, если Ghost не настроен)
+    - После каждого узла сохраняет контрольную точку (`CHECKPOINT_ENABLED`)
+    """
+    context = ctx or AgentContext()
+    # Каталог CTA обновляется в фоне, пока идут генерация и фактчекинг
+    prefetch_cta_catalog()
+    # Пул рендеринга обложек — до потоков графа
+    start_render_pool()
+    _run_checkpointed(context)
+    return context
+
+
+def resume_publication(run_id: str | None = None) -> AgentContext | None:
+    """Продолжает прогон из контрольной точки `run_id` (по умолчанию — самой свежей).
+
+    Узлы, завершённые до сбоя, не выполняются повторно. None — если точки нет.
+    """
+    store = get_checkpoint_store()
+    cp = store.load(run_id) if store is not None else None
+    if cp is None:
+        return None
+    context = _context_from_checkpoint(cp)
+    if "InsertCTA" not in context.completed:
+        prefetch_cta_catalog()
+    if "GenerateCover" not in context.completed:
+        start_render_pool()
+    _run_checkpointed(context)
+    return context
+
+
+def _stage_limits(nodes: list[Node]) -> dict[str, int]:
+    """Лимиты одновременных прогонов по именам узлов из `BATCH_STAGE_CONCURRENCY`."""
+    limits = parse_mapping(Config.BATCH_STAGE_CONCURRENCY)
+    result: dict[str, int] = {}
+    for node in nodes:
+        spec = limits.get(node.name.lower(), "")
+        if spec.isdigit() and int(spec) > 0:
+            result[node.name] = int(spec)
+    return result
+
+
+def _stage_limited(nodes: list[Node]) -> list[Node]:
+    """Оборачивает узлы семафорами (общими для всех статей пакета) — для потокового планировщика без бюджетов."""
+    limits = _stage_limits(nodes)
+    result: list[Node] = []
+    for node in nodes:
+        if node.name not in limits:
+            result.append(node)
+            continue
+        sem = threading.BoundedSemaphore(limits[node.name])
+
+        def _run(context: AgentContext, _run=node.run, _sem=sem) -> bool | None:
+            with _sem:
+                return _run(context)
+
+        result.append(replace(node, run=_run))
+    return result
+
+
+async def _run_batch_async(contexts: list[AgentContext], nodes: list[Node]) -> list[BaseException | None]:
+    """Графы статей пакета в одном цикле событий с общими семафорами узлов; исключение каждой статьи — её итог."""
+    gates = {name: asyncio.Semaphore(limit) for name, limit in _stage_limits(nodes).items()}
+    results = await asyncio.gather(
+        *(_run_checkpointed_async(context, nodes, gates) for context in contexts),
+        return_exceptions=True,
+    )
+    return [r if isinstance(r, BaseException) else None for r in results]
+
+
+def run_publication_batch(count: int) -> list[AgentContext]:
+    """Готовит и планирует `count` статей за один запуск, на последовательные слоты 11:00 МСК.
+
+    - Источники тем и история Ghost опрашиваются один раз; темы различны между
+      собой и с историей (`select_topics`), заголовки выбираются с учётом уже
+      занятых в пакете
+    - Графы статей выполняются параллельно: пока одна статья проходит
+      фактчекинг, следующая генерируется; на каждый узел действует общий
+      лимит одновременных прогонов (`BATCH_STAGE_CONCURRENCY`). В асинхронном
+      планировщике все статьи идут в одном цикле событий: узел ждёт очереди
+      до выдачи бюджета, а срок статьи отсчитывается от её первого узла
+    - Ошибка одной статьи не останавливает остальные; у каждой своя
+      контрольная точка для `resume`
+    """
+    state = StateStore()
+    prefetch_cta_catalog()
+    start_render_pool()
+    # если различных тем меньше `count`, select_topics пишет об этом в лог
+    topics = select_topics(state, count)
+    contexts: list[AgentContext] = []
+    taken: list[str] = []
+    for i, sel in enumerate(topics):
+        context = AgentContext(state=state, publish_at=slot_msk_11(i).isoformat())
+        _timed("SelectTopic", partial(_apply_topic, context, sel, taken))
+        taken.append(context.title or "")
+        context.completed.append("SelectTopic")
+        contexts.append(context)
+    if not contexts:
+        return []
+    t0 = time.perf_counter()
+    if Config.AGENT_RUNNER == "async":
+        outcomes = asyncio.run(_run_batch_async(contexts, build_publication_graph()))
+    else:
+        nodes = _stage_limited(build_publication_graph())
+        with ThreadPoolExecutor(max_workers=len(contexts), thread_name_prefix="batch") as pool:
+            futures = [pool.submit(_run_checkpointed, context, nodes) for context in contexts]
+            outcomes = [fut.exception() for fut in futures]
+    for context, exc in zip(contexts, outcomes):
+        if exc is not None:
+            context.errors.append(str(exc))
+            logging.error("Batch: %s failed: %s", context.title, exc)
+    published = sum(1 for c in contexts if c.publish_result)
+    logging.info(
+        "Batch: %d/%d articles scheduled in %.0f ms",
+        published,
+        len(contexts),
+        (time.perf_counter() - t0) * 1000.0,
+    )
+    return contexts
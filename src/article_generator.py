@@ -2,9 +2,38 @@
 
 from __future__ import annotations
 
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from .config import Config
+from .deadline import DeadlineExceeded, bound
+from .domain.dedup import tokens as _title_tokens
+from .fact_checker import CodeBlockIssue
+from .llm_router import chat_completion
+
+CTA_SLOT = "<!--CTA_SLOT-->"
+
+# Общие стилевые требования: одинаковы для цельной статьи и для отдельных частей
+_STYLE_RULES = (
+    "Ты технический редактор блога буткемпа по IT. Пиши по-русски, живым стилем. "
+    "Примеры кода должны быть исполняемыми и использовать только стандартную библиотеку Python (без сторонних пакетов). "
+    "Используй HTML (h2/h3/p/pre/code/ul/ol/li). Без Markdown."
+)
+_STYLE_SYSTEM = (
+    _STYLE_RULES
+    + " Структура: интригующее вступление, разделы h2/h3, примеры кода где уместно. Длина 4000–8000 символов."
+)
+
+# Границы длины статьи и целевой размер
+_MIN_CHARS, _MAX_CHARS, _TARGET_CHARS = 4000, 8000, 6000
+_INTRO_CHARS = 600
+
+
+def _part_system(part: str, chars: int) -> str:
+    """Системный промпт для одной части статьи (вступления или раздела) с её собственной длиной."""
+    return f"{_STYLE_RULES} Сейчас ты пишешь {part} статьи длиной около {chars} символов, а не статью целиком."
 
 
 def _openai_client():
@@ -19,36 +48,104 @@ def _openai_client():
         return None
 
 
-def generate_russian_title(topic: str) -> str:
+def _score_title(title: str, topic: str, recent_titles: list[str]) -> float:
+    """Локальная оценка варианта заголовка: длина 60–90, пересечение с темой, новизна.
+
+    - длина: 1.0 внутри диапазона, линейный штраф за каждый символ вне его;
+    - ключевые слова: доля токенов темы, встречающихся в заголовке;
+    - новизна: штраф по максимальному Jaccard с недавними заголовками.
+    """
+    n = len(title)
+    length_score = 1.0 if 60 <= n <= 90 else max(0.0, 1.0 - min(abs(n - 60), abs(n - 90)) / 30)
+    lowered = title.lower()
+    topic_tokens = _title_tokens(topic)
+    overlap = sum(1 for t in topic_tokens if t in lowered) / len(topic_tokens) if topic_tokens else 0.0
+    own = _title_tokens(title)
+    similarity = 0.0
+    for r in recent_titles:
+        other = _title_tokens(r)
+        if own and other:
+            similarity = max(similarity, len(own & other) / len(own | other))
+    return 2.0 * length_score + overlap - 1.5 * similarity
+
+
+def _generate_title_variants(client, topic: str, recent_titles: list[str], variants: int) -> str | None:
+    """Запрашивает несколько вариантов заголовка одним вызовом (JSON) и выбирает лучший."""
+    prompt = (
+        f"Сформулируй {variants} разных коротких заголовка на РУССКОМ по теме ниже. "
+        "Каждый — 60–90 символов, без кавычек и эмодзи, сохрани ключевые названия технологий. "
+        'Верни JSON вида {"titles": ["...", "..."]} без пояснений.\n\n' + topic
+    )
+    resp = chat_completion(
+        client,
+        "title",
+        [
+            {"role": "system", "content": "Ты редактор заголовков техноблога."},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.8,
+        response_format={"type": "json_object"},
+    )
+    data = json.loads(resp.choices[0].message.content or "{}")
+    raw = data.get("titles", []) if isinstance(data, dict) else []
+    candidates = [str(t).strip().strip("\"«»'") for t in raw if str(t).strip()]
+    if not candidates:
+        return None
+    scored = sorted(candidates, key=lambda t: _score_title(t, topic, recent_titles), reverse=True)
+    logging.info("Title variants: %d, best=%r", len(candidates), scored[0])
+    return scored[0]
+
+
+def generate_russian_title(
+    topic: str,
+    *,
+    recent_titles: list[str] | None = None,
+    variants: int | None = None,
+) -> str:
     """Генерирует краткий русский заголовок на основе темы.
 
     Требования: 60–90 символов, без кавычек, без эмодзи.
-    При отсутствии клиента — возвращает исходную тему, подрезанную до 100 символов.
+    При `variants > 1` (по умолчанию — `Config.TITLE_VARIANTS`) модель возвращает
+    несколько вариантов за один вызов, лучший выбирается локально с учётом
+    `recent_titles`. При отсутствии клиента — возвращает исходную тему,
+    подрезанную до 100 символов.
     """
     client = _openai_client()
     base = (topic or "").strip()
     if not client:
         return (base[:100]).rstrip()
+    if variants is None:
+        variants = Config.TITLE_VARIANTS
+    if variants > 1:
+        try:
+            best = _generate_title_variants(client, base, list(recent_titles or []), variants)
+            if best:
+                return best[:100].rstrip(" -:,.!") if len(best) > 100 else best
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logging.warning("Варианты заголовка не получены, пробуем один: %s", e)
     try:
         prompt = (
             "Сформулируй один короткий заголовок на РУССКОМ по теме ниже. "
             "60–90 символов. Без кавычек и эмодзи. Верни только заголовок.\n\n" + base
         )
-        kwargs = {
-            "model": Config.OPENAI_MODEL,
-            "messages": [
+        resp = chat_completion(
+            client,
+            "title",
+            [
                 {"role": "system", "content": "Ты редактор заголовков техноблога."},
                 {"role": "user", "content": prompt},
             ],
-        }
-        if ("gpt-5" not in Config.OPENAI_MODEL) and ("thinking" not in Config.OPENAI_MODEL):
-            kwargs["temperature"] = 0.5
-        resp = client.chat.completions.create(**kwargs)
+            temperature=0.5,
+        )
         title = (resp.choices[0].message.content or base).strip()
         # защита от слишком длинного
         if len(title) > 100:
             title = title[:100].rstrip(" -:,.!")
         return title
+    except DeadlineExceeded:
+        raise
     except Exception:
         return (base[:100]).rstrip()
 
@@ -59,7 +156,7 @@ def _adjust_length_with_model(client, html: str) -> str:
     Если вызов не удался — возвращает исходный HTML без изменений.
     """
     length = len(html)
-    if 4000 <= length <= 8000:
+    if _MIN_CHARS <= length <= _MAX_CHARS:
         return html
     try:
         # целевой размер ~6000, используется только в описании промпта
@@ -68,65 +165,239 @@ def _adjust_length_with_model(client, html: str) -> str:
             "сохранив структуру, язык и смысл. Нельзя использовать Markdown, только HTML. Верни только HTML.\n\n"
             f"---\n{html}\n---"
         )
-        kwargs = {
-            "model": Config.OPENAI_MODEL,
-            "messages": [
+        resp = chat_completion(
+            client,
+            "length_fit",
+            [
                 {
                     "role": "system",
                     "content": "Ты редактор, который аккуратно изменяет длину текста и сохраняет структуру.",
                 },
                 {"role": "user", "content": prompt},
             ],
-        }
-        if ("gpt-5" not in Config.OPENAI_MODEL) and ("thinking" not in Config.OPENAI_MODEL):
-            kwargs["temperature"] = 0.4
-        resp = client.chat.completions.create(**kwargs)
+            temperature=0.4,
+        )
         return resp.choices[0].message.content or html
+    except DeadlineExceeded:
+        raise
     except Exception:
         return html
 
 
-def generate_article(topic: str, outline: list[str], tags: list[str]) -> tuple[str, list[str]]:
+def _complete(client, system: str, user: str, *, temperature: float) -> str:
+    """Один вызов Chat Completions задачи `article`; возвращает текст ответа (или пустую строку)."""
+    resp = chat_completion(
+        client,
+        "article",
+        [{"role": "system", "content": system}, {"role": "user", "content": user}],
+        temperature=temperature,
+    )
+    return resp.choices[0].message.content or ""
+
+
+def _fit_section(client, html: str, chars: int) -> str:
+    """Сокращает или расширяет один раздел до ~`chars` символов; при ошибке — раздел как есть."""
+    try:
+        resp = chat_completion(
+            client,
+            "length_fit",
+            [
+                {
+                    "role": "system",
+                    "content": "Ты редактор, который аккуратно изменяет длину текста и сохраняет структуру.",
+                },
+                {
+                    "role": "user",
+                    "content": (
+                        f"Отредактируй ниже HTML-раздел статьи так, чтобы его длина была около {chars} символов, "
+                        "сохранив заголовок, структуру, примеры кода, язык и смысл. Нельзя использовать Markdown, "
+                        f"только HTML. Верни только HTML раздела.\n\n---\n{html}\n---"
+                    ),
+                },
+            ],
+            temperature=0.4,
+        )
+        return (resp.choices[0].message.content or "").replace(CTA_SLOT, "").strip() or html
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        return html
+
+
+def _stitch(intro: str, sections: list[str]) -> str:
+    """Склейка: вступление → первая половина → CTA → вторая половина → CTA."""
+    middle = (len(sections) + 1) // 2
+    return "\n".join([intro, *sections[:middle], CTA_SLOT, *sections[middle:], CTA_SLOT])
+
+
+def _generate_sections_parallel(client, topic: str, outline: list[str], tags: list[str]) -> str:
+    """Генерирует статью по разделам: сначала вступление, затем все тезисы параллельно.
+
+    Вступление задаёт тон и передаётся в промпт каждого раздела, чтобы стиль был
+    единым; у каждой части свой системный промпт со своей длиной. Разделы
+    склеиваются в исходном порядке, CTA‑слоты ставятся после середины статьи и в
+    конце. Если склейка вышла за 4000–8000 символов, параллельно подгоняются
+    только разделы, отклонившиеся от бюджета в ту же сторону. Любая ошибка
+    раздела поднимается наверх — тогда вызывающая сторона откатывается к
+    генерации одним запросом.
+    """
+    points = [p for p in outline if p.strip()]
+    if not points:
+        raise ValueError("empty outline")
+    plan = "".join(f"<li>{p}</li>" for p in points)
+    intro = _complete(
+        client,
+        _part_system("только вступление", _INTRO_CHARS),
+        f"Тема: {topic}. Теги: {', '.join(tags)}.\n"
+        f"План статьи: <ul>{plan}</ul>\n"
+        f"Напиши только интригующее вступление (1–2 абзаца <p>, до {_INTRO_CHARS} символов) без заголовков разделов. "
+        "Верни только HTML.",
+        temperature=0.7,
+    ).strip()
+    if not intro:
+        raise ValueError("empty intro")
+
+    # Бюджет символов на раздел, чтобы итог попадал в 4000–8000
+    budget = max(600, (_TARGET_CHARS - len(intro)) // len(points))
+    system = _part_system("один раздел", budget)
+
+    def _section(point: str) -> str:
+        html = _complete(
+            client,
+            system,
+            f"Тема статьи: {topic}. Вступление уже написано:\n{intro}\n\n"
+            f"Напиши ОДИН раздел статьи с заголовком <h2>{point}</h2> (подзаголовки h3 по желанию), "
+            f"около {budget} символов. Не повторяй вступление, не пиши заключение всей статьи, "
+            "не вставляй CTA и комментарии. Верни только HTML раздела.",
+            temperature=0.7,
+        )
+        html = html.replace(CTA_SLOT, "").strip()
+        if not html:
+            raise ValueError(f"empty section: {point}")
+        return html
+
+    t0 = time.perf_counter()
+    workers = max(1, min(Config.ARTICLE_SECTION_WORKERS, len(points)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sections = list(pool.map(bound(_section), points))
+        logging.info("Article sections: %d in %.0f ms (parallel)", len(sections), (time.perf_counter() - t0) * 1000.0)
+
+        html = _stitch(intro, sections)
+        if _MIN_CHARS <= len(html) <= _MAX_CHARS:
+            return html
+        # Вне границ: переписываем только разделы, отклонившиеся от бюджета в сторону перекоса
+        too_long = len(html) > _MAX_CHARS
+        offending = [i for i, sec in enumerate(sections) if (len(sec) > budget) == too_long]
+        t0 = time.perf_counter()
+        fitted = list(pool.map(bound(lambda i: _fit_section(client, sections[i], budget)), offending))
+    for i, sec in zip(offending, fitted):
+        sections[i] = sec
+    html = _stitch(intro, sections)
+    logging.info(
+        "Article length fit: %d/%d sections in %.0f ms, %d chars",
+        len(offending),
+        len(sections),
+        (time.perf_counter() - t0) * 1000.0,
+        len(html),
+    )
+    return html
+
+
+def generate_article(
+    topic: str,
+    outline: list[str],
+    tags: list[str],
+    *,
+    parallel: bool | None = None,
+) -> tuple[str, list[str]]:
     """Генерирует HTML статьи и итоговые теги по теме и тезисам.
 
-    Возвращает кортеж: (html, tags). При недоступности LLM использует простой
-    локальный шаблон через `_fallback_html`.
+    Возвращает кортеж: (html, tags). При `parallel=True` (по умолчанию —
+    `Config.ARTICLE_PARALLEL_SECTIONS`) разделы по тезисам пишутся параллельно,
+    и время генерации определяется самым долгим разделом. При недоступности LLM
+    использует простой локальный шаблон через `_fallback_html`.
     """
     client = _openai_client()
+    if parallel is None:
+        parallel = Config.ARTICLE_PARALLEL_SECTIONS
 
     if client:
-        system = (
-            "Ты технический редактор блога буткемпа по IT. Пиши по-русски, живым стилем. "
-            "Структура: интригующее вступление, разделы h2/h3, примеры кода где уместно. "
-            "Примеры кода должны быть исполняемыми и использовать только стандартную библиотеку Python (без сторонних пакетов). "
-            "Длина 4000–8000 символов. Используй HTML (h2/h3/p/pre/code/ul/ol/li). Без Markdown."
-        )
-        outline_html = "".join(f"<li>{p}</li>" for p in outline)
-        user = (
-            f"Тема: {topic}. Теги: {', '.join(tags)}.\n"
-            f"Сделай структуру по тезисам: <ul>{outline_html}</ul>\n"
-            f"Вставь места для CTA в двух местах как комментарии <!--CTA_SLOT-->."
-        )
-        try:
-            kwargs = {
-                "model": Config.OPENAI_MODEL,
-                "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}],
-            }
-            if ("gpt-5" not in Config.OPENAI_MODEL) and ("thinking" not in Config.OPENAI_MODEL):
-                kwargs["temperature"] = 0.7
-            resp = client.chat.completions.create(**kwargs)
-            html = resp.choices[0].message.content or ""
-            # Коррекция длины при необходимости
-            html = _adjust_length_with_model(client, html)
-        except Exception as e:
-            logging.warning("OpenAI не ответил: %s", e)
-            html = _fallback_html(topic, outline)
+        html = ""
+        if parallel:
+            try:
+                html = _generate_sections_parallel(client, topic, outline, tags)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logging.warning("Параллельная генерация разделов не удалась, пробуем целиком: %s", e)
+        if not html:
+            outline_html = "".join(f"<li>{p}</li>" for p in outline)
+            user = (
+                f"Тема: {topic}. Теги: {', '.join(tags)}.\n"
+                f"Сделай структуру по тезисам: <ul>{outline_html}</ul>\n"
+                f"Вставь места для CTA в двух местах как комментарии {CTA_SLOT}."
+            )
+            try:
+                html = _complete(client, _STYLE_SYSTEM, user, temperature=0.7)
+                # Коррекция длины при необходимости
+                html = _adjust_length_with_model(client, html)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                logging.warning("OpenAI не ответил: %s", e)
+                html = _fallback_html(topic, outline)
     else:
         html = _fallback_html(topic, outline)
 
     return html, tags
 
 
+def repair_code_blocks(issues: list[CodeBlockIssue]) -> dict[int, str]:
+    """Просит LLM исправить только проблемные блоки кода; возвращает {index: исправленный код}.
+
+    Один запрос на все блоки, ответ — JSON. Блоки, которые модель не вернула,
+    в результат не попадают. При недоступности LLM/ошибке — пустой словарь.
+    """
+    client = _openai_client()
+    fixable = [i for i in issues if i.index >= 0 and i.code.strip()]
+    if not client or not fixable:
+        return {}
+    listed = "\n\n".join(f"### index={i.index}\nОшибка: {i.error}\n```python\n{i.code}\n```" for i in fixable)
+    user = (
+        "Исправь приведённые Python‑сниппеты из статьи так, чтобы они были синтаксически корректны "
+        "и исполнялись без ошибок, используя только стандартную библиотеку. Сохрани смысл и стиль примера, "
+        "меняй минимально. Верни JSON вида "
+        '{"blocks": [{"index": <номер>, "code": "<исправленный код>"}]} без пояснений.\n\n' + listed
+    )
+    try:
+        resp = chat_completion(
+            client,
+            "repair",
+            [
+                {"role": "system", "content": "Ты аккуратный Python‑ревьюер, исправляющий примеры кода."},
+                {"role": "user", "content": user},
+            ],
+            temperature=0.2,
+            response_format={"type": "json_object"},
+        )
+        data = json.loads(resp.choices[0].message.content or "{}")
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.warning("Починка блоков кода не удалась: %s", e)
+        return {}
+    wanted = {i.index for i in fixable}
+    fixes: dict[int, str] = {}
+    for item in data.get("blocks", []) if isinstance(data, dict) else []:
+        try:
+            index, code = int(item["index"]), str(item["code"])
+        except Exception:
+            continue
+        if index in wanted and code.strip():
+            fixes[index] = code
+    return fixes
+
+
 def _fallback_html(topic: str, outline: list[str]) -> str:
     """Простейший HTML-шаблон статьи на случай недоступности LLM."""
     items = "".join(f"<li>{p}</li>" for p in outline)
@@ -135,5 +406,5 @@ def _fallback_html(topic: str, outline: list[str]) -> str:
         f"<p>Короткое вступление: почему тема важна именно сейчас.</p>"
         f"<h3>План</h3><ul>{items}</ul>"
         f"<h3>Пример кода</h3><pre><code class=\"language-python\">print('Hello, AI')</code></pre>"
-        f"<!--CTA_SLOT-->"
+        f"{CTA_SLOT}"
     )
@@ -0,0 +1,188 @@
+"""Извлечение и пакетная проверка конкретных утверждений статьи.
+
+Из видимого текста HTML извлекаются проверяемые утверждения:
+
+- `version` — «Название X.Y[.Z]» (Python 3.12, Django 5.0, Node.js 20.10);
+- `library` — имена пакетов из `pip install ...` и `import`/`from ... import` в
+  инлайн‑<code> (произвольные идентификаторы в <code> библиотеками не считаются);
+- `date` — «месяц ГГГГ» / «в ГГГГ году» рядом с латинским названием в том же предложении.
+
+Утверждения нормализуются и дедуплицируются, затем проверяются параллельно (не
+больше `CLAIM_CONCURRENCY` запросов одновременно; пакетного API у провайдеров нет)
+через провайдеры подтверждений (CSE/HN для версий и дат, GitHub для библиотек) — с
+общим кэшем и ограничителем частоты. Модули стандартной библиотеки и builtins
+подтверждаются локально, без сети.
+
+Квота CSE нужна прежде всего проверке тем, поэтому утверждения берут из неё
+немного: ответ из кэша (CSE или HN) используется без запроса, живых запросов CSE на одну
+проверку — не больше `CLAIM_CSE_MAX`, и только пока остаток дневной квоты выше
+`CLAIM_CSE_RESERVE`; остальные версии и даты проверяются через HN.
+"""
+
+from __future__ import annotations
+
+import builtins
+import logging
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .config import Config
+from .deadline import DeadlineExceeded, bound
+from .evidence_cache import cached_hits, peek_hits
+from .evidence_providers import CSE_HOST, FETCHERS
+from .html_scan import extract_text
+from .rate_limiter import RateLimitExceeded, get_rate_limiter
+
+
+@dataclass(frozen=True)
+class Claim:
+    """Проверяемое утверждение: вид, субъект (название) и значение (версия/год)."""
+
+    kind: str
+    subject: str
+    value: str = ""
+
+    @property
+    def key(self) -> tuple[str, str, str]:
+        return (self.kind, self.subject.lower(), self.value)
+
+    def __str__(self) -> str:
+        return f"{self.subject} {self.value}".strip()
+
+
+@dataclass
+class ClaimVerdict:
+    """Вердикт по утверждению: confirmed / unconfirmed / skipped и источник."""
+
+    claim: Claim
+    verdict: str
+    source: str | None = None
+    detail: str | None = None
+
+
+_VERSION_RE = re.compile(
+    r"\b([A-Z][A-Za-z0-9+#]*(?:[.\-][A-Za-z][A-Za-z0-9+#]*)*)\s+(?:v|version\s+|версии\s+)?(\d+\.\d+(?:\.\d+)?)\b",
+)
+_PIP_RE = re.compile(r"pip\s+install\s+(.+)")
+_PACKAGE_RE = re.compile(r"^([A-Za-z0-9][A-Za-z0-9_.\-]*)(?:\[[^\]]*\])?(?:[=<>~!]=?[\w.*]+)?$")
+_IMPORT_RE = re.compile(r"^\s*(?:from\s+([A-Za-z_]\w*)(?:\.\w+)*\s+import\b|import\s+([A-Za-z_]\w*))")
+_MONTHS = (
+    "январ|феврал|март|апрел|ма[йя]|июн|июл|август|сентябр|октябр|ноябр|декабр|"
+    "january|february|march|april|may|june|july|august|september|october|november|december"
+)
+_DATE_RE = re.compile(rf"(?:\b(?:{_MONTHS})[а-яa-z]*\s+((?:19|20)\d{{2}})\b|\b((?:19|20)\d{{2}})\s+год)", re.IGNORECASE)
+_SUBJECT_RE = re.compile(r"\b([A-Z][A-Za-z0-9+#]*(?:[.\-][A-Za-z][A-Za-z0-9+#]*)*)\b")
+_NOT_SUBJECTS = {"HTML", "CSS", "API", "AI", "CTA", "URL", "HTTP", "JSON", "CLI", "I", "A", "The", "In", "On"}
+
+_LOCAL_NAMES = set(getattr(sys, "stdlib_module_names", ())) | set(dir(builtins))
+
+
+def _sentences(text: str) -> list[str]:
+    return [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if s.strip()]
+
+
+def extract_claims(article_html: str, *, limit: int | None = None) -> list[Claim]:
+    """Извлекает, нормализует и дедуплицирует проверяемые утверждения статьи."""
+    text, inline_code = extract_text(article_html)
+    found: list[Claim] = []
+    for sentence in _sentences(text):
+        found.extend(
+            Claim("version", name, ver) for name, ver in _VERSION_RE.findall(sentence) if name not in _NOT_SUBJECTS
+        )
+        for m in _DATE_RE.finditer(sentence):
+            year = m.group(1) or m.group(2)
+            subjects = [s for s in _SUBJECT_RE.findall(sentence[: m.start()]) if s not in _NOT_SUBJECTS]
+            if subjects:
+                found.append(Claim("date", subjects[-1], year))
+    libs: list[str] = []
+    for line in [*inline_code, *_sentences(text)]:
+        m = _PIP_RE.search(line)
+        if not m:
+            continue
+        for token in m.group(1).split():
+            if token.startswith("-"):
+                continue
+            pkg = _PACKAGE_RE.match(token.rstrip(".,;:"))
+            if not pkg:
+                break
+            libs.append(pkg.group(1))
+    for snippet in inline_code:
+        m = _IMPORT_RE.match(snippet)
+        if m:
+            libs.append(m.group(1) or m.group(2))
+    found.extend(Claim("library", lib.lower()) for lib in libs if len(lib) > 1)
+
+    seen: set[tuple[str, str, str]] = set()
+    result: list[Claim] = []
+    for c in found:
+        if c.key not in seen:
+            seen.add(c.key)
+            result.append(c)
+    return result[:limit] if limit is not None else result
+
+
+def _cse_allowed() -> bool:
+    """Можно ли утверждениям потратить живой запрос CSE, не трогая резерв квоты для тем."""
+    if not (Config.GOOGLE_API_KEY and Config.GOOGLE_CSE_ID):
+        return False
+    left = get_rate_limiter().remaining(CSE_HOST)
+    return left is None or left > Config.CLAIM_CSE_RESERVE
+
+
+def _plan_routes(claims: list[Claim]) -> list[tuple[str, str] | None]:
+    """Выбирает (провайдер, запрос) для каждого утверждения; None — подтверждается локально.
+
+    Версии и даты берут готовый ответ из кэша (CSE или HN), если он есть; иначе идут
+    в CSE, пока не исчерпан лимит живых запросов `CLAIM_CSE_MAX` этой проверки и
+    резерв квоты цел, а дальше — в HN.
+    """
+    cse_left = Config.CLAIM_CSE_MAX if _cse_allowed() else 0
+    routes: list[tuple[str, str] | None] = []
+    for claim in claims:
+        if claim.kind == "library":
+            routes.append(None if claim.subject in _LOCAL_NAMES else ("github", claim.subject))
+            continue
+        query = f'"{claim.subject} {claim.value}"' if claim.kind == "version" else f"{claim.subject} {claim.value}"
+        cached = next((p for p in ("cse", "hn") if peek_hits(p, query) is not None), None)
+        if cached:
+            routes.append((cached, query))
+        elif cse_left > 0:
+            cse_left -= 1
+            routes.append(("cse", query))
+        else:
+            routes.append(("hn", query))
+    return routes
+
+
+def _verify_one(claim: Claim, route: tuple[str, str] | None) -> ClaimVerdict:
+    if route is None:
+        return ClaimVerdict(claim, "confirmed", source="stdlib")
+    provider, query = route
+    try:
+        hits = cached_hits(provider, query, FETCHERS[provider])
+    except DeadlineExceeded:
+        raise
+    except RateLimitExceeded as e:
+        return ClaimVerdict(claim, "skipped", source=provider, detail=str(e))
+    except Exception as e:
+        return ClaimVerdict(claim, "skipped", source=provider, detail=f"error: {e}")
+    return ClaimVerdict(claim, "confirmed" if hits > 0 else "unconfirmed", source=provider, detail=f"hits={hits}")
+
+
+def verify_claims(claims: list[Claim], *, concurrency: int | None = None) -> list[ClaimVerdict]:
+    """Проверяет утверждения параллельно: не больше `concurrency` запросов одновременно, порядок сохраняется."""
+    if not claims:
+        return []
+    workers = max(1, min(concurrency or Config.CLAIM_CONCURRENCY, len(claims)))
+    t0 = time.perf_counter()
+    routes = _plan_routes(claims)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        verdicts = list(pool.map(bound(_verify_one), claims, routes))
+    counts: dict[str, int] = {}
+    for v in verdicts:
+        counts[v.verdict] = counts.get(v.verdict, 0) + 1
+    logging.info("Claims: %d checked in %.0f ms %s", len(verdicts), (time.perf_counter() - t0) * 1000.0, counts)
+    return verdicts
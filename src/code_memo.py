@@ -0,0 +1,94 @@
+"""Постоянная память результатов исполнения сниппетов в песочнице.
+
+Ключ — хэш нормализованного текста сниппета, вид проверки (`sandbox`) и версия
+рантайма (провайдер+версия Python). Синтаксис (`ast.parse`) не запоминается:
+разбор дешевле похода в SQLite.
+После пересборки или починки статьи повторно проверяются только новые или
+изменённые сниппеты. Хранилище — SQLite в `Config.CACHE_DIR`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .config import Config
+
+
+def normalize_code(code: str) -> str:
+    """Нормализует сниппет без смены смысла: переводы строк, хвостовые пробелы, пустые края.
+
+    Отступы не трогаем — для Python они значимы.
+    """
+    lines = [ln.rstrip() for ln in code.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+def code_digest(code: str) -> str:
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+
+class CodeMemo:
+    """Результаты проверок по (хэш кода, вид проверки, рантайм) с TTL."""
+
+    def __init__(self, path: Path, ttl_sec: float) -> None:
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS code_memo ("
+            "digest TEXT NOT NULL, kind TEXT NOT NULL, runtime TEXT NOT NULL, "
+            "ok INTEGER NOT NULL, output TEXT NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (digest, kind, runtime))",
+        )
+        self._conn.commit()
+
+    def get(self, kind: str, runtime: str, code: str) -> tuple[bool, str] | None:
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT ok, output, stored_at FROM code_memo WHERE digest = ? AND kind = ? AND runtime = ?",
+                    (code_digest(code), kind, runtime),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning("Code memo read failed: %s", e)
+            return None
+        if not row or time.time() - float(row[2]) > self.ttl_sec:
+            return None
+        return bool(row[0]), str(row[1])
+
+    def put(self, kind: str, runtime: str, code: str, ok: bool, output: str) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO code_memo (digest, kind, runtime, ok, output, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (code_digest(code), kind, runtime, int(ok), output, time.time()),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning("Code memo write failed: %s", e)
+
+
+_memo: CodeMemo | None = None
+_memo_lock = threading.Lock()
+
+
+def get_code_memo() -> CodeMemo | None:
+    """Общая память (создаётся лениво); None, если выключена или недоступна."""
+    global _memo  # noqa: PLW0603
+    if not Config.CODE_MEMO_ENABLED:
+        return None
+    with _memo_lock:
+        if _memo is None:
+            try:
+                _memo = CodeMemo(Config.CACHE_DIR / "code_memo.sqlite3", Config.CODE_MEMO_TTL_SEC)
+            except Exception as e:
+                logging.warning("Code memo unavailable: %s", e)
+                return None
+        return _memo
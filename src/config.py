@@ -21,6 +21,16 @@ def get_env(name: str, default: str | None = None) -> str | None:
     return value if value not in (None, "", "None") else default
 
 
+def parse_mapping(raw: str | None) -> dict[str, str]:
+    """Разбирает строку вида `key=value,key2=value2` в словарь (ключи в нижнем регистре)."""
+    result: dict[str, str] = {}
+    for part in (raw or "").split(","):
+        key, sep, value = part.partition("=")
+        if sep and key.strip() and value.strip():
+            result[key.strip().lower()] = value.strip()
+    return result
+
+
 def _df_str(name: str, default: str | None = None):
     """Default factory: str or None from env with fallback."""
     return lambda: get_env(name, default)
@@ -41,6 +51,19 @@ class Config:
     OPENAI_API_KEY: str | None = get_env("OPENAI_API_KEY")
     OPENAI_MODEL: str = get_env("OPENAI_MODEL", "gpt-5")
     OPENAI_IMAGE_MODEL: str = get_env("OPENAI_IMAGE_MODEL", "dall-e-3")
+    # Маршрутизация моделей по задачам: "dedup=gpt-4o-mini,title=gpt-4o-mini,article=gpt-5"
+    OPENAI_MODEL_ROUTES: str | None = get_env("OPENAI_MODEL_ROUTES")
+    # Быстрая модель на случай превышения бюджета задержки (пусто — без фоллбека)
+    OPENAI_FALLBACK_MODEL: str | None = get_env("OPENAI_FALLBACK_MODEL")
+    # Бюджеты задержки по задачам в секундах: "dedup=5,title=10,article=180"
+    OPENAI_LATENCY_BUDGETS: str | None = get_env("OPENAI_LATENCY_BUDGETS")
+    OPENAI_SLOW_COOLDOWN_SEC: float = float(get_env("OPENAI_SLOW_COOLDOWN_SEC", "600") or "600")
+
+    # Генерация статьи: параллельные разделы по тезисам (1/true — включено)
+    ARTICLE_PARALLEL_SECTIONS: bool = (get_env("ARTICLE_PARALLEL_SECTIONS", "0") or "0").lower() in {"1", "true", "yes"}
+    ARTICLE_SECTION_WORKERS: int = int(get_env("ARTICLE_SECTION_WORKERS", "5") or "5")
+    # Число вариантов заголовка за один вызов (1 — один заголовок, как раньше)
+    TITLE_VARIANTS: int = int(get_env("TITLE_VARIANTS", "1") or "1")
 
     # Ghost Admin API
     GHOST_ADMIN_API_URL: str | None = get_env("GHOST_ADMIN_API_URL")
@@ -49,6 +72,83 @@ class Config:
     # Google Custom Search (для фактчекинга)
     GOOGLE_API_KEY: str | None = get_env("GOOGLE_API_KEY")
     GOOGLE_CSE_ID: str | None = get_env("GOOGLE_CSE_ID")
+    # Перекрытие запросов CSE: сколько одновременно (1 — строго по очереди) и задержка перед следующим
+    CSE_PARALLELISM: int = int(get_env("CSE_PARALLELISM", "1") or "1")
+    CSE_HEDGE_DELAY_SEC: float = float(get_env("CSE_HEDGE_DELAY_SEC", "0.5") or "0.5")
+
+    # Планировщик запросов CSE по истории успешности форм запросов: вкл., минимум попыток до отсечения,
+    # порог отсечения и доля «разведки» отсечённых форм
+    QUERY_PLANNER_ENABLED: bool = (get_env("QUERY_PLANNER_ENABLED", "1") or "1").lower() in {"1", "true", "yes"}
+    QUERY_PLANNER_MIN_TRIES: int = int(get_env("QUERY_PLANNER_MIN_TRIES", "20") or "20")
+    QUERY_PLANNER_PRUNE_BELOW: float = float(get_env("QUERY_PLANNER_PRUNE_BELOW", "0.05") or "0.05")
+    QUERY_PLANNER_EXPLORE: float = float(get_env("QUERY_PLANNER_EXPLORE", "0.1") or "0.1")
+
+    # Проверка фактов гонкой провайдеров (CSE ∥ GitHub ∥ HN) и их таймауты, сек; 0 — цепочка CSE → GitHub → HN
+    EVIDENCE_RACE: bool = (get_env("EVIDENCE_RACE", "1") or "1").lower() in {"1", "true", "yes"}
+    EVIDENCE_TIMEOUTS: str | None = get_env("EVIDENCE_TIMEOUTS", "cse=45,github=20,hn=20")
+    # Лимиты частоты по хостам ("host=N/сек") и дневные квоты ("host=N"), журнал квот — в CACHE_DIR
+    RATE_LIMITS: str | None = get_env(
+        "RATE_LIMITS",
+        "www.googleapis.com=5/1,api.github.com=10/60,hn.algolia.com=5/1",
+    )
+    DAILY_QUOTAS: str | None = get_env("DAILY_QUOTAS", "www.googleapis.com=100")
+    RATE_LIMIT_MAX_WAIT_SEC: float = float(get_env("RATE_LIMIT_MAX_WAIT_SEC", "2") or "2")
+    QUOTA_TIMEZONE: str = get_env("QUOTA_TIMEZONE", "America/Los_Angeles")
+    # Проверка конкретных утверждений статьи: off | report | strict; параллельность и лимит утверждений
+    CLAIM_CHECK: str = (get_env("CLAIM_CHECK", "off") or "off").lower()
+    CLAIM_CONCURRENCY: int = int(get_env("CLAIM_CONCURRENCY", "6") or "6")
+    CLAIM_MAX: int = int(get_env("CLAIM_MAX", "15") or "15")
+    # Живых запросов CSE на одну проверку утверждений и неприкосновенный остаток дневной квоты CSE
+    # для проверки тем: при остатке не выше резерва (и сверх лимита) утверждения идут в HN
+    CLAIM_CSE_MAX: int = int(get_env("CLAIM_CSE_MAX", "3") or "3")
+    CLAIM_CSE_RESERVE: int = int(get_env("CLAIM_CSE_RESERVE", "60") or "60")
+    # Проверка внешних ссылок статьи: off | report | strict; параллельность, лимит на хост, таймаут и TTL кэша, сек
+    LINK_CHECK: str = (get_env("LINK_CHECK", "report") or "report").lower()
+    LINK_CHECK_CONCURRENCY: int = int(get_env("LINK_CHECK_CONCURRENCY", "32") or "32")
+    LINK_CHECK_PER_HOST: int = int(get_env("LINK_CHECK_PER_HOST", "4") or "4")
+    LINK_CHECK_TIMEOUT_SEC: float = float(get_env("LINK_CHECK_TIMEOUT_SEC", "8") or "8")
+    LINK_CHECK_TTL_SEC: int = int(get_env("LINK_CHECK_TTL_SEC", "86400") or "86400")
+    # Память результатов проверки сниппетов (AST/песочница) по хэшу кода и рантайму
+    CODE_MEMO_ENABLED: bool = (get_env("CODE_MEMO_ENABLED", "1") or "1").lower() in {"1", "true", "yes"}
+    CODE_MEMO_TTL_SEC: int = int(get_env("CODE_MEMO_TTL_SEC", "2592000") or "2592000")
+    # Кэш подтверждений (CSE/GitHub/HN) на диске: TTL по провайдерам и для «нет результатов», сек
+    EVIDENCE_CACHE_ENABLED: bool = (get_env("EVIDENCE_CACHE_ENABLED", "1") or "1").lower() in {"1", "true", "yes"}
+    EVIDENCE_CACHE_TTLS: str | None = get_env("EVIDENCE_CACHE_TTLS", "cse=604800,github=259200,hn=259200")
+    EVIDENCE_CACHE_NEGATIVE_TTL_SEC: int = int(get_env("EVIDENCE_CACHE_NEGATIVE_TTL_SEC", "21600") or "21600")
+    # Библиотека базовых изображений обложек: порог сходства тем (Жаккар по токенам), вытеснение по возрасту,
+    # числу использований и размеру; сдвиг оттенка при повторном использовании, градусы (0 — без изменений)
+    COVER_CACHE_ENABLED: bool = (get_env("COVER_CACHE_ENABLED", "1") or "1").lower() in {"1", "true", "yes"}
+    COVER_CACHE_SIMILARITY: float = float(get_env("COVER_CACHE_SIMILARITY", "0.5") or "0.5")
+    COVER_CACHE_MAX_AGE_DAYS: float = float(get_env("COVER_CACHE_MAX_AGE_DAYS", "60") or "60")
+    COVER_CACHE_MAX_USES: int = int(get_env("COVER_CACHE_MAX_USES", "4") or "4")
+    COVER_CACHE_MAX_ITEMS: int = int(get_env("COVER_CACHE_MAX_ITEMS", "300") or "300")
+    COVER_HUE_VARIATION: int = int(get_env("COVER_HUE_VARIATION", "25") or "25")
+    # Кодирование обложки: auto (PNG‑палитра для плоских, прогрессивный JPEG для фото) | webp | jpeg | png;
+    # бюджет размера файла для 1200x630 (байт, другие размеры — пропорционально площади) и минимальное качество
+    COVER_FORMAT: str = (get_env("COVER_FORMAT", "auto") or "auto").lower()
+    COVER_MAX_BYTES: int = int(get_env("COVER_MAX_BYTES", "200000") or "200000")
+    COVER_MIN_QUALITY: int = int(get_env("COVER_MIN_QUALITY", "55") or "55")
+    # Процессы для параллельного рендеринга размеров обложки (0 — по числу ядер, 1 — в текущем процессе)
+    COVER_RENDER_WORKERS: int = int(get_env("COVER_RENDER_WORKERS", "0") or "0")
+    CACHE_DIR: Path = Path(get_env("CACHE_DIR", str(PROJECT_ROOT / ".cache")) or ".cache")
+    # Контрольные точки прогона агента (CACHE_DIR/checkpoints) для команды resume; срок хранения, дней
+    CHECKPOINT_ENABLED: bool = (get_env("CHECKPOINT_ENABLED", "1") or "1").lower() in {"1", "true", "yes"}
+    CHECKPOINT_TTL_DAYS: int = int(get_env("CHECKPOINT_TTL_DAYS", "7") or "7")
+    # Планировщик графа: async (общий срок прогона, бюджеты узлов) | threads (без сроков)
+    AGENT_RUNNER: str = (get_env("AGENT_RUNNER", "async") or "async").lower()
+    # Срок прогона, сек (0 — только до слота публикации), и запас до слота 11:00, сек
+    RUN_DEADLINE_SEC: int = int(get_env("RUN_DEADLINE_SEC", "1800") or "1800")
+    RUN_SLOT_MARGIN_SEC: int = int(get_env("RUN_SLOT_MARGIN_SEC", "600") or "600")
+    # Минимальные бюджеты узлов, сек ("узел=N"): резерв для обязательных узлов и порог пропуска необязательных
+    NODE_MIN_SEC: str | None = get_env(
+        "NODE_MIN_SEC",
+        "SelectTopic=60,GenerateArticle=180,FactCheck=120,GenerateCover=30,UploadCover=15,InsertCTA=2,Publish=30",
+    )
+    # Пакетный режим (batch): одновременных прогонов узла на все статьи пакета ("узел=N", имена узлов графа)
+    BATCH_STAGE_CONCURRENCY: str | None = get_env(
+        "BATCH_STAGE_CONCURRENCY",
+        "GenerateArticle=2,FactCheck=2,GenerateCover=1,UploadCover=2,Publish=1",
+    )
 
     # Google Analytics 4 (для аналитики: сбор данных о просмотрах)
     GA4_PROPERTY_ID: str | None = get_env("GA4_PROPERTY_ID")
@@ -60,12 +160,22 @@ class Config:
 
     # CTA (JSON-массив), пример см. env.example
     CTAS_JSON: str | None = get_env("CTAS_JSON")
+    # Бюджет размера итогового HTML статьи, байт (0 — без ограничения); сверх — обрезка по целым элементам
+    HTML_MAX_BYTES: int = int(get_env("HTML_MAX_BYTES", "300000") or "300000")
+    # TTL каталога CTA в памяти/на диске, сек: по истечении каталог обновляется в фоне
+    CTA_CACHE_TTL_SEC: int = int(get_env("CTA_CACHE_TTL_SEC", "3600") or "3600")
 
     # Telegram RSS (выбор популярных тем — список URL через запятую)
     TELEGRAM_RSS_FEEDS: str | None = get_env("TELEGRAM_RSS_FEEDS")
 
-    # Песочница кода: piston (по умолчанию) или replit
+    # Песочница кода: piston (по умолчанию), replit или local (пул локальных процессов в bubblewrap)
     SANDBOX_PROVIDER: str = get_env("SANDBOX_PROVIDER", "piston").lower()
+    # Путь к bubblewrap для local: без него локальная песочница не запускается (сниппеты пропускаются)
+    SANDBOX_BWRAP: str = get_env("SANDBOX_BWRAP", "bwrap") or "bwrap"
+    SANDBOX_POOL_SIZE: int = int(get_env("SANDBOX_POOL_SIZE", str(min(8, os.cpu_count() or 2))) or "2")
+    SANDBOX_CPU_SEC: int = int(get_env("SANDBOX_CPU_SEC", "2") or "2")
+    SANDBOX_MEMORY_MB: int = int(get_env("SANDBOX_MEMORY_MB", "256") or "256")
+    SANDBOX_WALL_SEC: float = float(get_env("SANDBOX_WALL_SEC", "5") or "5")
     REPLIT_EVAL_URL: str | None = get_env("REPLIT_EVAL_URL")
     REPLIT_EVAL_TOKEN: str | None = get_env("REPLIT_EVAL_TOKEN")
 
@@ -0,0 +1,216 @@
+"""Библиотека базовых изображений обложек (ответов DALL‑E) с поиском по теме.
+
+Каждое сгенерированное базовое изображение сохраняется в `CACHE_DIR/covers/`
+вместе с нормализованными токенами темы и тегов (SQLite‑индекс). Для новой
+темы ищется запись с наибольшим сходством Жаккара по токенам; если оно не ниже
+`COVER_CACHE_SIMILARITY`, базовое изображение переиспользуется (заголовок
+накладывается заново, цвет может слегка смещаться) и вызов DALL‑E не нужен.
+
+Вытеснение: записи старше `COVER_CACHE_MAX_AGE_DAYS`, использованные
+`COVER_CACHE_MAX_USES` раз (чтобы обложки не примелькались) и сверх
+`COVER_CACHE_MAX_ITEMS` (давно не использованные) удаляются. Счётчики
+попаданий/промахов хранятся в том же индексе.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import Config
+
+_STOP = {
+    "и",
+    "в",
+    "во",
+    "на",
+    "по",
+    "для",
+    "как",
+    "что",
+    "это",
+    "из",
+    "от",
+    "до",
+    "с",
+    "со",
+    "к",
+    "о",
+    "об",
+    "без",
+    "the",
+    "and",
+    "for",
+    "with",
+    "how",
+    "what",
+    "to",
+    "of",
+    "in",
+    "on",
+    "a",
+    "an",
+}
+_STEM_LEN = 6
+
+
+def theme_tokens(title: str, tags: list[str] | None = None) -> frozenset[str]:
+    """Нормализованные токены темы: нижний регистр, без стоп‑слов, грубая основа (первые 6 букв)."""
+    words = re.findall(r"[a-zа-яё0-9+#]+", " ".join([title or "", *(tags or [])]).lower())
+    return frozenset(w[:_STEM_LEN] for w in words if len(w) > 1 and w not in _STOP)
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class CoverMatch:
+    """Найденное базовое изображение и его сходство с темой."""
+
+    key: str
+    image_bytes: bytes
+    similarity: float
+
+
+class CoverCache:
+    """Индекс базовых изображений по токенам темы с вытеснением по возрасту и числу использований."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(root / "index.sqlite3"), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS covers ("
+            "key TEXT PRIMARY KEY, tokens TEXT NOT NULL, created_at REAL NOT NULL, "
+            "last_used REAL NOT NULL, uses INTEGER NOT NULL)",
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.img"
+
+    def _bump(self, name: str) -> None:
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def lookup(self, tokens: frozenset[str]) -> CoverMatch | None:
+        """Ищет самое похожее базовое изображение не ниже порога и отмечает его использование.
+
+        Ошибка индекса (заблокирован, повреждён) — промах: фон сгенерирует DALL‑E.
+        """
+        try:
+            return self._lookup(tokens)
+        except (OSError, sqlite3.Error) as e:
+            logging.warning("Cover cache read failed: %s", e)
+            with contextlib.suppress(sqlite3.Error):
+                self._conn.rollback()
+            return None
+
+    def _lookup(self, tokens: frozenset[str]) -> CoverMatch | None:
+        with self._lock:
+            self._evict()
+            best: tuple[float, str] | None = None
+            for key, raw in self._conn.execute("SELECT key, tokens FROM covers"):
+                score = similarity(tokens, frozenset(raw.split()))
+                if score >= Config.COVER_CACHE_SIMILARITY and (best is None or score > best[0]):
+                    best = (score, key)
+            data: bytes | None = None
+            if best is not None:
+                try:
+                    data = self._path(best[1]).read_bytes()
+                except OSError:
+                    self._conn.execute("DELETE FROM covers WHERE key = ?", (best[1],))
+            if data is None or best is None:
+                self._bump("misses")
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE covers SET uses = uses + 1, last_used = ? WHERE key = ?",
+                (time.time(), best[1]),
+            )
+            self._bump("hits")
+            self._conn.commit()
+            return CoverMatch(best[1], data, best[0])
+
+    def put(self, tokens: frozenset[str], image_bytes: bytes) -> None:
+        """Сохраняет новое базовое изображение (первое использование уже учтено)."""
+        if not tokens:
+            return
+        key = uuid.uuid4().hex
+        try:
+            self._path(key).write_bytes(image_bytes)
+            now = time.time()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO covers (key, tokens, created_at, last_used, uses) VALUES (?, ?, ?, ?, 1)",
+                    (key, " ".join(sorted(tokens)), now, now),
+                )
+                self._evict()
+                self._conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            logging.warning("Cover cache write failed: %s", e)
+
+    def _evict(self) -> None:
+        cutoff = time.time() - Config.COVER_CACHE_MAX_AGE_DAYS * 86400
+        stale = [
+            k
+            for (k,) in self._conn.execute(
+                "SELECT key FROM covers WHERE created_at < ? OR uses >= ?",
+                (cutoff, Config.COVER_CACHE_MAX_USES),
+            )
+        ]
+        stale.extend(
+            k
+            for (k,) in self._conn.execute(
+                "SELECT key FROM covers ORDER BY last_used DESC LIMIT -1 OFFSET ?",
+                (Config.COVER_CACHE_MAX_ITEMS,),
+            )
+        )
+        for key in set(stale):
+            self._conn.execute("DELETE FROM covers WHERE key = ?", (key,))
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict[str, float]:
+        try:
+            with self._lock:
+                counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+                items = self._conn.execute("SELECT COUNT(*) FROM covers").fetchone()[0]
+        except sqlite3.Error as e:
+            logging.warning("Cover cache stats failed: %s", e)
+            counters, items = {}, 0
+        hits, misses = int(counters.get("hits", 0)), int(counters.get("misses", 0))
+        total = hits + misses
+        return {"items": items, "hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+
+_cache: CoverCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cover_cache() -> CoverCache | None:
+    """Общая библиотека обложек (создаётся лениво); None, если выключена или недоступна."""
+    global _cache  # noqa: PLW0603
+    if not Config.COVER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = CoverCache(Config.CACHE_DIR / "covers")
+            except Exception as e:
+                logging.warning("Cover cache unavailable: %s", e)
+                return None
+        return _cache
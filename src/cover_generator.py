@@ -3,12 +3,46 @@
 from __future__ import annotations
 
 import base64
+import hashlib
 import io
 import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from multiprocessing import shared_memory
 
 from PIL import Image, ImageDraw, ImageFont
 
 from .config import Config
+from .cover_cache import get_cover_cache, theme_tokens
+from .deadline import DeadlineExceeded, check, has_budget, http_timeout
+from .image_encoding import encode_cover
+
+_COVER_SIZE = (1200, 630)
+# Размеры вариантов обложки: Open Graph, Twitter (summary_large_image), квадрат для соцсетей, превью
+COVER_VARIANTS: dict[str, tuple[int, int]] = {
+    "og": _COVER_SIZE,
+    "twitter": (1200, 675),
+    "square": (1080, 1080),
+    "thumb": (480, 252),
+}
+# Светлый вертикальный градиент (fallback): почти белый с синим оттенком → голубой
+_FALLBACK_COLORS = ((240, 248, 255), (210, 225, 255))
+# Сколько нужно оставшегося бюджета узла, чтобы имело смысл ждать DALL‑E (иначе — градиентный фон)
+_DALLE_MIN_SEC = 30.0
+_FONT_NAME = "arial.ttf"
+_FONT_SIZE = 44
+_MARGIN = 48
+# Сколько ждать варианты из пула без бюджета узла (с бюджетом — не дольше его остатка)
+_RENDER_TIMEOUT_SEC = 60.0
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
 
 
 def _openai_client():
@@ -24,98 +58,286 @@ def _openai_client():
 
 
 def _center_crop_to(img: Image.Image, target: tuple[int, int]) -> Image.Image:
-    """Масштабирует по краткой стороне и центрирует обрезку под `target`."""
+    """Центрирует обрезку под пропорции `target` и масштабирует за одну операцию.
+
+    Прямоугольник обрезки считается в координатах исходника и передаётся в
+    `resize(box=...)`: ресэмплируется только нужная область, а `reducing_gap`
+    включает быстрое предварительное уменьшение для больших исходников.
+    """
     tw, th = target
     w, h = img.size
-    # Масштаб по краткой стороне
+    # Масштаб по краткой стороне: видимая область исходника имеет пропорции target
     scale = max(tw / w, th / h)
-    nw, nh = int(w * scale + 0.5), int(h * scale + 0.5)
-    img2 = img.resize((nw, nh), Image.LANCZOS)
-    # Центр обрезки
-    left = (nw - tw) // 2
-    top = (nh - th) // 2
-    return img2.crop((left, top, left + tw, top + th))
-
-
-def generate_cover_bytes(title: str) -> bytes:
-    """Генерирует PNG обложку: DALL‑E (если доступно) + наложение заголовка."""
-    img = _generate_base_image()
-
-    # Если есть ключ OpenAI — генерируем через DALL‑E (или выбранную модель), затем приводим к 1200x630
-    if Config.OPENAI_API_KEY:
-        client = _openai_client()
-        if client:
-            try:
-                prompt = (
-                    "Minimalist, high-contrast blog cover, modern and clean, abstract tech shapes, vector style; "
-                    "flat colors, glossy highlights; no letters, no words, no watermark, no logo. "
-                    f"Theme: {title}."
-                )
-                # Сгенерируем крупнее для качества и обрежем в 1200x630
-                res = client.images.generate(
-                    model=Config.OPENAI_IMAGE_MODEL,
-                    prompt=prompt,
-                    size="1792x1024",
-                    response_format="b64_json",
-                )
-                b64 = res.data[0].b64_json
-                if not b64 and getattr(res.data[0], "url", None):
-                    # Фолбэк: если вернулся URL
-                    import requests  # локальный импорт, чтобы не тянуть лишнее выше
-
-                    r = requests.get(res.data[0].url, timeout=60)
-                    r.raise_for_status()
-                    img_bytes = r.content
-                else:
-                    img_bytes = base64.b64decode(b64)
-                base_img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-                img = _center_crop_to(base_img, (1200, 630))
-            except Exception as e:
-                logging.warning("Cover: DALL-E generation failed: %s", e)
-
-    img = _overlay_text(img, title)
-    out = io.BytesIO()
-    img.save(out, format="PNG")
-    return out.getvalue()
+    cw, ch = min(w, tw / scale), min(h, th / scale)
+    left = max(0.0, (w - cw) / 2)
+    top = max(0.0, (h - ch) / 2)
+    return img.resize((tw, th), Image.LANCZOS, box=(left, top, left + cw, top + ch), reducing_gap=3.0)
+
+
+def _dalle_base_bytes(title: str) -> bytes | None:
+    """Запрашивает базовое изображение 1792x1024 у DALL‑E (или выбранной модели); None — если недоступно."""
+    client = _openai_client() if Config.OPENAI_API_KEY else None
+    if not client:
+        return None
+    if not has_budget(_DALLE_MIN_SEC):
+        logging.info("Cover: node budget too small for DALL-E, using fallback background")
+        return None
+    try:
+        prompt = (
+            "Minimalist, high-contrast blog cover, modern and clean, abstract tech shapes, vector style; "
+            "flat colors, glossy highlights; no letters, no words, no watermark, no logo. "
+            f"Theme: {title}."
+        )
+        # Сгенерируем крупнее для качества и обрежем в 1200x630
+        res = client.images.generate(
+            model=Config.OPENAI_IMAGE_MODEL,
+            prompt=prompt,
+            size="1792x1024",
+            response_format="b64_json",
+            timeout=http_timeout(600.0),
+        )
+        b64 = res.data[0].b64_json
+        if not b64 and getattr(res.data[0], "url", None):
+            # Фолбэк: если вернулся URL
+            import requests  # локальный импорт, чтобы не тянуть лишнее выше
+
+            r = requests.get(res.data[0].url, timeout=http_timeout(60))
+            r.raise_for_status()
+            return r.content
+        return base64.b64decode(b64)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.warning("Cover: DALL-E generation failed: %s", e)
+        return None
+
+
+def _vary_hue(img: Image.Image, seed: str, max_degrees: int) -> Image.Image:
+    """Сдвигает оттенок на детерминированный (по `seed`) угол в пределах ±`max_degrees`."""
+    if max_degrees <= 0:
+        return img
+    digest = int(hashlib.sha1(seed.encode("utf-8")).hexdigest()[:8], 16)
+    degrees = digest % (2 * max_degrees + 1) - max_degrees
+    shift = round(degrees * 256 / 360)
+    if not shift:
+        return img
+    h, s, v = img.convert("HSV").split()
+    h = h.point([(x + shift) % 256 for x in range(256)])
+    return Image.merge("HSV", (h, s, v)).convert("RGB")
+
+
+def _base_image_bytes(title: str, tags: list[str] | None) -> tuple[bytes | None, bool]:
+    """Базовое изображение из библиотеки похожих тем или от DALL‑E; второй элемент — взято ли из библиотеки."""
+    cache = get_cover_cache()
+    tokens = theme_tokens(title, tags)
+    if cache is not None:
+        match = cache.lookup(tokens)
+        stats = cache.stats()
+        if match is not None:
+            logging.info(
+                "Cover cache: hit (similarity %.2f), hit rate %.0f%% (%d/%d)",
+                match.similarity,
+                stats["hit_rate"] * 100,
+                stats["hits"],
+                stats["hits"] + stats["misses"],
+            )
+            return match.image_bytes, True
+        logging.info(
+            "Cover cache: miss, hit rate %.0f%% (%d/%d)",
+            stats["hit_rate"] * 100,
+            stats["hits"],
+            stats["hits"] + stats["misses"],
+        )
+    img_bytes = _dalle_base_bytes(title)
+    if img_bytes and cache is not None:
+        cache.put(tokens, img_bytes)
+    return img_bytes, False
+
+
+def _render_variant(base: Image.Image | None, size: tuple[int, int], title: str) -> bytes:
+    """Рендерит один размер: обрезка/масштаб фона (или градиент), заголовок по раскладке размера, кодирование."""
+    img = _center_crop_to(base, size) if base is not None else _gradient(size, *_FALLBACK_COLORS).copy()
+    return encode_cover(_overlay_text(img, title))
+
+
+def _render_variant_shared(
+    shm_name: str | None,
+    base_size: tuple[int, int],
+    size: tuple[int, int],
+    title: str,
+) -> bytes:
+    """То же в процессе пула: фон читается из разделяемой памяти, а не приходит в каждой задаче."""
+    base: Image.Image | None = None
+    if shm_name is not None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            base = Image.frombytes("RGB", base_size, bytes(shm.buf[: base_size[0] * base_size[1] * 3]))
+        finally:
+            shm.close()
+    return _render_variant(base, size, title)
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    # fork из многопоточного процесса (узлы графа — потоки) может унести чужие захваченные блокировки
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _render_pool() -> ProcessPoolExecutor | None:
+    """Общий пул процессов для рендеринга вариантов; None — рендер в текущем процессе.
+
+    Создаётся `start_render_pool` при старте прогона; здесь — только если этого не сделали.
+    """
+    global _pool  # noqa: PLW0603
+    workers = min(Config.COVER_RENDER_WORKERS or os.cpu_count() or 1, len(COVER_VARIANTS))
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+        return _pool
+
+
+def start_render_pool() -> None:
+    """Поднимает пул рендеринга заранее, до запуска потоков графа."""
+    try:
+        _render_pool()
+    except Exception as e:
+        logging.warning("Cover: render pool unavailable: %s", e)
+
+
+def _drop_render_pool() -> None:
+    """Бросает пул с зависшим или упавшим воркером; следующий вызов создаст новый."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _render_in_pool(
+    pool: ProcessPoolExecutor,
+    base: Image.Image | None,
+    names: list[str],
+    title: str,
+) -> dict[str, bytes]:
+    """Варианты параллельно в пуле; фон кладётся в разделяемую память один раз на обложку.
+
+    Ждём не дольше остатка бюджета узла; по таймауту пул сбрасывается, а при
+    исчерпанном бюджете поднимается `DeadlineExceeded`. Пустой словарь — рендерить
+    в текущем процессе.
+    """
+    timeout = http_timeout(_RENDER_TIMEOUT_SEC)
+    shm: shared_memory.SharedMemory | None = None
+    try:
+        if base is not None:
+            raw = base.tobytes()
+            shm = shared_memory.SharedMemory(create=True, size=len(raw))
+            shm.buf[: len(raw)] = raw
+        futures = {
+            n: pool.submit(
+                _render_variant_shared,
+                shm.name if shm is not None else None,
+                base.size if base is not None else (0, 0),
+                COVER_VARIANTS[n],
+                title,
+            )
+            for n in names
+        }
+        t_end = time.monotonic() + timeout
+        return {n: f.result(timeout=max(0.0, t_end - time.monotonic())) for n, f in futures.items()}
+    except FuturesTimeout:
+        logging.warning("Cover: render pool gave no result in %.1f s, dropping it", timeout)
+        _drop_render_pool()
+        check()
+        return {}
+    except BrokenProcessPool as e:
+        logging.warning("Cover: render pool failed, rendering in-process: %s", e)
+        _drop_render_pool()
+        return {}
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def render_cover_variants(
+    title: str,
+    tags: list[str] | None = None,
+    variants: list[str] | None = None,
+) -> dict[str, bytes]:
+    """Рендерит обложку сразу в нескольких размерах: {имя варианта: закодированное изображение}.
+
+    Базовое изображение получается (библиотека/DALL‑E) и декодируется один раз,
+    затем каждый вариант (`og`, `twitter`, `square`, `thumb`) обрезается и
+    получает свою раскладку заголовка параллельно в пуле процессов
+    (`COVER_RENDER_WORKERS`, forkserver/spawn — без fork многопоточного
+    процесса); фон передаётся воркерам через разделяемую память, ожидание
+    ограничено бюджетом узла. Без ключа OpenAI фон — градиент нужного размера.
+    Формат и качество подбираются под бюджет размера (`image_encoding.encode_cover`).
+    """
+    names = [v for v in (variants or list(COVER_VARIANTS)) if v in COVER_VARIANTS]
+    base: Image.Image | None = None
+    img_bytes, reused = _base_image_bytes(title, tags)
+    if img_bytes:
+        try:
+            base = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+            if reused:
+                # Повторно используемый фон слегка перекрашиваем, чтобы обложки различались
+                base = _vary_hue(base, title, Config.COVER_HUE_VARIATION)
+        except Exception as e:
+            logging.warning("Cover: base image decode failed: %s", e)
+    t0 = time.perf_counter()
+    pool = _render_pool() if len(names) > 1 else None
+    results = _render_in_pool(pool, base, names, title) if pool is not None else {}
+    for n in names:
+        if n not in results:
+            results[n] = _render_variant(base, COVER_VARIANTS[n], title)
+    logging.info("Cover: %d variants rendered in %.0f ms", len(results), (time.perf_counter() - t0) * 1000.0)
+    return results
+
+
+def generate_cover_bytes(title: str, tags: list[str] | None = None) -> bytes:
+    """Генерирует обложку 1200x630 (PNG/JPEG/WebP по `COVER_FORMAT`): базовое изображение (библиотека похожих тем или DALL‑E) + заголовок.
+
+    Без ключа OpenAI и без подходящего изображения в библиотеке — градиентный фон.
+    """
+    return render_cover_variants(title, tags, ["og"])["og"]
+
+
+@lru_cache(maxsize=16)
+def _gradient(size: tuple[int, int], top: tuple[int, int, int], bottom: tuple[int, int, int]) -> Image.Image:
+    """Вертикальный градиент без цикла по строкам: столбец шириной 1 px (маска + LUT на канал),
+    растянутый по ширине NEAREST — LUT применяется к `height` пикселям, а не ко всему кадру."""
+    width, height = size
+    mask = Image.linear_gradient("L").resize((1, height), Image.BILINEAR)
+    channels = [mask.point([t + (b - t) * v // 255 for v in range(256)]) for t, b in zip(top, bottom)]
+    return Image.merge("RGB", channels).resize((width, height), Image.NEAREST)
 
 
 def _generate_base_image() -> Image.Image:
     """Рисует базовый градиентный фон (fallback), 1200x630."""
-    # Светлый вертикальный градиент (fallback)
-    width, height = 1200, 630
-    img = Image.new("RGB", (width, height))
-    top = (240, 248, 255)  # почти белый с синим оттенком
-    bottom = (210, 225, 255)
-    for y in range(height):
-        ratio = y / max(1, height - 1)
-        r = int(top[0] * (1 - ratio) + bottom[0] * ratio)
-        g = int(top[1] * (1 - ratio) + bottom[1] * ratio)
-        b = int(top[2] * (1 - ratio) + bottom[2] * ratio)
-        ImageDraw.Draw(img).line([(0, y), (width, y)], fill=(r, g, b))
-    # без фигур — фон оставляем чистым
-    return img
+    return _gradient(_COVER_SIZE, *_FALLBACK_COLORS).copy()
 
 
-def _overlay_text(img: Image.Image, text: str) -> Image.Image:
-    """Накладывает заголовок с переносами строк по ширине блока."""
-    draw = ImageDraw.Draw(img)
+@lru_cache(maxsize=16)
+def _font(size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """Шрифт заголовка (загружается один раз на размер)."""
     try:
-        font = ImageFont.truetype("arial.ttf", 44)
+        return ImageFont.truetype(_FONT_NAME, size)
     except Exception:
-        font = ImageFont.load_default()
-    margin = 48
-    # Подложка
-    box = [(margin - 16, img.height - 220), (img.width - margin, img.height - margin)]
-    draw.rectangle(box, fill=(0, 24, 64))
-    # Перенос строк по ширине
-    title = (text or "").strip()
-    max_width = img.width - 2 * margin
-    words = title.split()
-    lines = []
+        return ImageFont.load_default(size)
+
+
+@lru_cache(maxsize=256)
+def _layout_lines(title: str, font_size: int, max_width: int, max_lines: int = 2) -> tuple[str, ...]:
+    """Перенос заголовка по ширине блока (не больше `max_lines` строк); кэшируется по тексту и размеру."""
+    font = _font(font_size)
+    lines: list[str] = []
     line = ""
-    for w in words:
+    for w in title.split():
         test = (line + (" " if line else "") + w).strip()
-        if draw.textlength(test, font=font) <= max_width:
+        if font.getlength(test) <= max_width:
             line = test
         else:
             if line:
@@ -123,9 +345,27 @@ def _overlay_text(img: Image.Image, text: str) -> Image.Image:
             line = w
     if line:
         lines.append(line)
-    lines = lines[:2]
-    y = img.height - 200
-    for ln in lines:
-        draw.text((margin, y), ln, fill=(255, 255, 255), font=font)
-        y += 56
+    return tuple(lines[:max_lines])
+
+
+def _overlay_text(img: Image.Image, text: str) -> Image.Image:
+    """Накладывает заголовок с переносами строк по ширине блока.
+
+    Раскладка задана для 1200x630 и масштабируется под размер изображения;
+    на вытянутых по высоте форматах (квадрат) помещается три строки вместо двух.
+    """
+    w, h = img.size
+    scale = min(w / _COVER_SIZE[0], h / _COVER_SIZE[1])
+    max_lines = 3 if h / w > 0.8 else 2
+    font_size = max(10, round(_FONT_SIZE * scale))
+    margin = round(_MARGIN * scale)
+    line_height = round(56 * scale)
+    box_top = h - margin - max_lines * line_height - round(60 * scale)
+    draw = ImageDraw.Draw(img)
+    # Подложка
+    draw.rectangle([(margin - round(16 * scale), box_top), (w - margin, h - margin)], fill=(0, 24, 64))
+    y = box_top + round(20 * scale)
+    for ln in _layout_lines((text or "").strip(), font_size, w - 2 * margin, max_lines):
+        draw.text((margin, y), ln, fill=(255, 255, 255), font=_font(font_size))
+        y += line_height
     return img
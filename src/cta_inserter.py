@@ -1,10 +1,19 @@
-"""Модуль вставки рекламных CTA."""
+"""Модуль вставки рекламных CTA.
+
+Каталог CTA кэшируется в памяти с TTL (`CTA_CACHE_TTL_SEC`), последняя удачная
+копия хранится в `CACHE_DIR/cta_catalog.json`, обновление из to.click идёт в
+фоне. Выбор CTA — по индексу нормализованного типа, без ожидания сети.
+"""
 
 from __future__ import annotations
 
+import html
 import json
+import logging
 import random
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
 import requests
@@ -21,71 +30,183 @@ class CTA:
     fresh: bool = False
 
 
-class CTAProvider:
-    """Провайдер CTA: собирает карточки из ENV/to.click/файла и выбирает 1–2 штуки."""
+_TYPE_ALIASES = {"freebie": "free", "program": "course"}
 
-    def __init__(self, path: Path | None = None) -> None:
-        self.path = path  # локальный файл больше не обязателен
-        self._ctas: list[CTA] = []
-        self._load()
 
-    def _load(self) -> None:
-        """Загружает CTA из доступных источников, нормализует и сортирует."""
-        # 1) ENV CTAS_JSON
-        if Config.CTAS_JSON:
-            try:
-                raw: list[dict] = json.loads(Config.CTAS_JSON)
-                self._ctas = [CTA(**x) for x in raw]
-                if self._ctas:
-                    self._prioritize()
-                    return
-            except Exception:
-                pass
-        # 2) to.click API (условно: /ctas)
-        if Config.TOCLICK_API_KEY:
-            try:
-                url = (Config.TOCLICK_BASE_URL or "https://to.click/api").rstrip("/") + "/ctas"
-                r = requests.get(url, headers={"Authorization": f"Bearer {Config.TOCLICK_API_KEY}"}, timeout=20)
-                if r.status_code < 400:
-                    raw = r.json()
-                    if isinstance(raw, list):
-                        self._ctas = [CTA(**x) for x in raw]
-                        if self._ctas:
-                            self._prioritize()
-                            return
-            except Exception:
-                pass
-        # 3) Локальный файл (опционально)
-        if self.path and Path(self.path).exists():
-            try:
-                with Path(self.path).open("r", encoding="utf-8") as f:
-                    raw = json.load(f)
-                self._ctas = [CTA(**x) for x in raw]
-                self._prioritize()
-                return
-            except Exception:
-                pass
-        self._ctas = []
+def normalize_cta_type(cta_type: str | None) -> str:
+    """Нормализованный тип CTA: `free`/`freebie` → free, `course`/`program` → course."""
+    t = (cta_type or "").strip().lower()
+    return _TYPE_ALIASES.get(t, t)
+
+
+def _parse_ctas(raw: object) -> list[CTA]:
+    if not isinstance(raw, list):
+        return []
+    return [CTA(**x) for x in raw]
+
 
-    def _prioritize(self) -> None:
+def _fetch_ctas(path: Path | None, *, network: bool = True) -> list[CTA]:
+    """Загружает CTA из источников по приоритету: CTAS_JSON → to.click `/ctas` → локальный файл."""
+    # 1) ENV CTAS_JSON
+    if Config.CTAS_JSON:
+        try:
+            ctas = _parse_ctas(json.loads(Config.CTAS_JSON))
+            if ctas:
+                return ctas
+        except Exception:
+            pass
+    # 2) to.click API (условно: /ctas)
+    if network and Config.TOCLICK_API_KEY:
+        try:
+            url = (Config.TOCLICK_BASE_URL or "https://to.click/api").rstrip("/") + "/ctas"
+            r = requests.get(url, headers={"Authorization": f"Bearer {Config.TOCLICK_API_KEY}"}, timeout=20)
+            if r.status_code < 400:
+                ctas = _parse_ctas(r.json())
+                if ctas:
+                    return ctas
+        except Exception:
+            pass
+    # 3) Локальный файл (опционально)
+    if path and Path(path).exists():
+        try:
+            with Path(path).open("r", encoding="utf-8") as f:
+                return _parse_ctas(json.load(f))
+        except Exception:
+            pass
+    return []
+
+
+@dataclass
+class CTACatalog:
+    """Отсортированный каталог CTA с индексом по нормализованному типу."""
+
+    ctas: list[CTA]
+    loaded_at: float = 0.0
+    by_type: dict[str, list[CTA]] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
         # Сначала свежие, затем по priority (меньше — выше), затем прочие; сохраняем порядок
         def sort_key(c: CTA):
             fresh_rank = 0 if c.fresh else 1
             prio = c.priority if isinstance(c.priority, int) else 999
             return (fresh_rank, prio)
 
-        self._ctas.sort(key=sort_key)
+        self.ctas = sorted(self.ctas, key=sort_key)
+        self.by_type = {}
+        for c in self.ctas:
+            self.by_type.setdefault(normalize_cta_type(c.type), []).append(c)
+
+    def top(self, cta_type: str, n: int) -> list[CTA]:
+        """Первые `n` CTA типа по приоритету (без просмотра всего каталога)."""
+        return self.by_type.get(normalize_cta_type(cta_type), [])[:n]
+
+
+class CTACatalogCache:
+    """Каталог CTA в памяти с TTL, сохранённой на диск последней удачной копией и фоновым обновлением.
+
+    `get()` никогда не ждёт сеть: отдаёт текущий (возможно, устаревший) каталог и
+    при необходимости запускает обновление в фоне. При холодном старте без копии на
+    диске сразу используются локальные источники (CTAS_JSON, файл).
+    """
+
+    def __init__(self, store: Path, ttl_sec: float, source: Path | None = None) -> None:
+        self.store = store
+        self.ttl_sec = ttl_sec
+        self.source = source
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._catalog: CTACatalog | None = None
+        # CTAS_JSON — локальный и главный источник: разбираем сразу, без сети
+        local = _fetch_ctas(None, network=False) if Config.CTAS_JSON else []
+        if local:
+            self._catalog = CTACatalog(local, time.time())
+            return
+        try:
+            data = json.loads(store.read_text(encoding="utf-8"))
+            self._catalog = CTACatalog(_parse_ctas(data.get("ctas")), float(data.get("fetched_at", 0.0)))
+        except Exception:
+            self._catalog = None
+
+    def _stale(self) -> bool:
+        return self._catalog is None or time.time() - self._catalog.loaded_at > self.ttl_sec
+
+    def get(self) -> CTACatalog:
+        with self._lock:
+            catalog = self._catalog
+            stale = self._stale()
+        if catalog is None:
+            catalog = CTACatalog(_fetch_ctas(self.source, network=False))
+        if stale:
+            self.refresh_async()
+        return catalog
+
+    def refresh_async(self) -> None:
+        """Запускает обновление в фоновом потоке (не больше одного одновременно)."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="cta-catalog-refresh", daemon=True).start()
+
+    def refresh(self) -> CTACatalog | None:
+        """Загружает каталог из источников; при неудаче остаётся последняя удачная копия."""
+        try:
+            ctas = _fetch_ctas(self.source)
+            if not ctas:
+                logging.info("CTA catalog refresh: no CTAs, keeping last good copy")
+                return None
+            catalog = CTACatalog(ctas, time.time())
+            with self._lock:
+                self._catalog = catalog
+            try:
+                self.store.parent.mkdir(parents=True, exist_ok=True)
+                payload = {"fetched_at": catalog.loaded_at, "ctas": [asdict(c) for c in catalog.ctas]}
+                self.store.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+            except Exception as e:
+                logging.warning("CTA catalog write failed: %s", e)
+            return catalog
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+_catalogs: dict[Path | None, CTACatalogCache] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_cta_catalog_cache(path: Path | None = None) -> CTACatalogCache:
+    """Общий кэш каталога для источника `path` (создаётся лениво)."""
+    with _catalogs_lock:
+        cache = _catalogs.get(path)
+        if cache is None:
+            cache = CTACatalogCache(Config.CACHE_DIR / "cta_catalog.json", Config.CTA_CACHE_TTL_SEC, path)
+            _catalogs[path] = cache
+        return cache
+
+
+def prefetch_cta_catalog() -> None:
+    """Прогревает каталог CTA в фоне — вызывается в начале прогона, задолго до публикации."""
+    get_cta_catalog_cache().get()
+
+
+class CTAProvider:
+    """Провайдер CTA: берёт каталог из кэша (ENV/to.click/файл) и выбирает 1–2 штуки."""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path  # локальный файл больше не обязателен
+        self._catalog = get_cta_catalog_cache(path).get()
+        self._ctas: list[CTA] = self._catalog.ctas
 
     def pick_pair(self) -> list[CTA]:
         """Возвращает до 2 CTA с приоритетом: free + course (если доступны)."""
-        free = [c for c in self._ctas if c.type.lower() in {"free", "freebie"}]
-        course = [c for c in self._ctas if c.type.lower() in {"course", "program"}]
-        result: list[CTA] = []
         # ограничим выбор верхними 5 по приоритету
+        free = self._catalog.top("free", 5)
+        course = self._catalog.top("course", 5)
+        result: list[CTA] = []
         if free:
-            result.append(random.choice(free[: min(5, len(free))]))
+            result.append(random.choice(free))
         if course:
-            result.append(random.choice(course[: min(5, len(course))]))
+            result.append(random.choice(course))
         if not result and self._ctas:
             pool = self._ctas[: min(6, len(self._ctas))]
             result = random.sample(pool, k=min(2, len(pool)))
@@ -96,7 +217,7 @@ class CTAProvider:
         """Рендерит HTML‑блок CTA (минимальный стиль)."""
         return (
             f'<div class="cta-block" style="border:1px solid #eee;padding:16px;border-radius:8px;margin:24px 0;">'
-            f'<div style="font-weight:700;margin-bottom:8px;">{cta.title}</div>'
-            f'<a href="{cta.url}" target="_blank" rel="noopener" style="color:#0057ff;">Перейти</a>'
+            f'<div style="font-weight:700;margin-bottom:8px;">{html.escape(cta.title, quote=False)}</div>'
+            f'<a href="{html.escape(cta.url)}" target="_blank" rel="noopener" style="color:#0057ff;">Перейти</a>'
             f"</div>"
         )
@@ -0,0 +1,114 @@
+"""Бюджет времени узла графа и кооперативная отмена сетевых вызовов.
+
+Асинхронный планировщик (`agent.graph.run_graph_async`) выдаёт каждому узлу
+бюджет — срок и флаг отмены — через `contextvars`. Сетевой код не знает о
+планировщике и лишь спрашивает таймаут у `http_timeout(обычный)`:
+
+- без бюджета возвращается обычный таймаут (синхронный прогон не меняется);
+- с бюджетом — не больше, чем осталось до срока узла, так что зависший
+  запрос не переживёт узел;
+- после отмены узла (или по истечении срока) поднимается `DeadlineExceeded`,
+  и поток узла выходит на ближайшем сетевом вызове.
+
+Потоки пулов не наследуют контекст — функции, отправляемые в пул изнутри узла,
+оборачиваются `bound(fn)`. `has_budget(сек)` позволяет необязательным шагам
+(проверка ссылок, DALL‑E) деградировать, если времени мало.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Срок узла истёк или узел отменён планировщиком."""
+
+
+class Budget:
+    """Срок (по `time.monotonic`) и флаг отмены одного узла."""
+
+    def __init__(self, seconds: float, name: str = "") -> None:
+        self.name = name
+        self.deadline = time.monotonic() + max(0.0, seconds)
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise DeadlineExceeded(f"{self.name or 'node'}: cancelled")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"{self.name or 'node'}: deadline exceeded")
+
+
+_current: ContextVar[Budget | None] = ContextVar("node_budget", default=None)
+
+
+@contextmanager
+def use_budget(budget: Budget | None) -> Iterator[Budget | None]:
+    """Делает `budget` текущим для кода внутри блока (в этом потоке/контексте)."""
+    token = _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.reset(token)
+
+
+def current_budget() -> Budget | None:
+    return _current.get()
+
+
+def remaining() -> float | None:
+    """Сколько секунд осталось у текущего узла; None — бюджета нет."""
+    budget = _current.get()
+    return None if budget is None else budget.remaining()
+
+
+def check() -> None:
+    """Поднимает `DeadlineExceeded`, если узел отменён или его срок истёк."""
+    budget = _current.get()
+    if budget is not None:
+        budget.check()
+
+
+def has_budget(seconds: float) -> bool:
+    """Хватит ли оставшегося времени на шаг длительностью `seconds` (без бюджета — всегда да)."""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def http_timeout(default: float) -> float:
+    """Таймаут сетевого вызова: `default`, но не дольше оставшегося бюджета узла."""
+    budget = _current.get()
+    if budget is None:
+        return default
+    budget.check()
+    return min(default, budget.remaining())
+
+
+def bound(fn: Callable[..., T]) -> Callable[..., T]:
+    """Переносит текущий бюджет в поток пула, где будет выполнена `fn`."""
+    budget = _current.get()
+    if budget is None:
+        return fn
+
+    def _run(*args: Any, **kwargs: Any) -> T:
+        with use_budget(budget):
+            return fn(*args, **kwargs)
+
+    return _run
@@ -0,0 +1,123 @@
+"""Дисковый кэш подтверждений фактов (Google CSE, GitHub, HN Algolia).
+
+Ключ — провайдер и нормализованный запрос, значение — число найденных
+результатов. Положительные ответы живут по TTL провайдера, нулевые (негативный
+кэш) — по отдельному, более короткому TTL. Ошибки сети не кэшируются. Хранилище —
+SQLite в `Config.CACHE_DIR`, безопасно для вызовов из нескольких потоков.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from .config import Config, parse_mapping
+
+_DEFAULT_TTL_SEC = 3 * 24 * 3600
+
+
+def normalize_query(query: str) -> str:
+    """Нормализует запрос для ключа кэша: нижний регистр, схлопнутые пробелы."""
+    return re.sub(r"\s+", " ", (query or "").strip().lower())
+
+
+class EvidenceCache:
+    """Кэш числа результатов по (провайдер, запрос) с TTL и негативным кэшированием."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS evidence ("
+            "provider TEXT NOT NULL, query TEXT NOT NULL, hits INTEGER NOT NULL, stored_at REAL NOT NULL, "
+            "PRIMARY KEY (provider, query))",
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def ttl_for(provider: str, hits: int) -> float:
+        if hits <= 0:
+            return float(Config.EVIDENCE_CACHE_NEGATIVE_TTL_SEC)
+        raw = parse_mapping(Config.EVIDENCE_CACHE_TTLS).get(provider)
+        try:
+            return float(raw) if raw else _DEFAULT_TTL_SEC
+        except ValueError:
+            return _DEFAULT_TTL_SEC
+
+    def get(self, provider: str, query: str) -> int | None:
+        """Возвращает число результатов из кэша или None (нет записи/истёк TTL/ошибка чтения)."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT hits, stored_at FROM evidence WHERE provider = ? AND query = ?",
+                    (provider, normalize_query(query)),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning("Evidence cache read failed: %s", e)
+            return None
+        if not row:
+            return None
+        hits, stored_at = int(row[0]), float(row[1])
+        if time.time() - stored_at > self.ttl_for(provider, hits):
+            return None
+        return hits
+
+    def put(self, provider: str, query: str, hits: int) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO evidence (provider, query, hits, stored_at) VALUES (?, ?, ?, ?)",
+                    (provider, normalize_query(query), int(hits), time.time()),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning("Evidence cache write failed: %s", e)
+
+
+_cache: EvidenceCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_evidence_cache() -> EvidenceCache | None:
+    """Общий кэш (создаётся лениво); None, если кэш выключен или недоступен."""
+    global _cache  # noqa: PLW0603
+    if not Config.EVIDENCE_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = EvidenceCache(Config.CACHE_DIR / "evidence.sqlite3")
+            except Exception as e:
+                logging.warning("Evidence cache unavailable: %s", e)
+                return None
+        return _cache
+
+
+def peek_hits(provider: str, query: str) -> int | None:
+    """Ответ из кэша без обращения к провайдеру; None — нет записи или кэш выключен."""
+    cache = get_evidence_cache()
+    return cache.get(provider, query) if cache is not None else None
+
+
+def cached_hits(provider: str, query: str, fetch: Callable[[str], int]) -> int:
+    """Возвращает число результатов из кэша или вызывает `fetch` и сохраняет ответ.
+
+    Исключения `fetch` пробрасываются и не кэшируются.
+    """
+    cache = get_evidence_cache()
+    if cache is not None:
+        hits = cache.get(provider, query)
+        if hits is not None:
+            logging.debug("Evidence cache hit: %s q=%s hits=%s", provider, query, hits)
+            return hits
+    hits = fetch(query)
+    if cache is not None:
+        cache.put(provider, query, hits)
+    return hits
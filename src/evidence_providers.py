@@ -0,0 +1,63 @@
+"""Провайдеры подтверждений: число результатов по запросу в Google CSE, GitHub и HN.
+
+Каждая функция делает один живой запрос через общий ограничитель частоты
+(`limited_get`) и возвращает число найденных результатов. Ошибки HTTP (в т.ч.
+исчерпанная квота) поднимаются исключением, а не превращаются в «0 результатов»,
+поэтому не попадают в кэш подтверждений. Кэширование — забота вызывающей стороны
+(`evidence_cache.cached_hits`).
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+
+from .config import Config
+from .deadline import http_timeout
+from .rate_limiter import limited_get
+
+CSE_HOST = "www.googleapis.com"
+
+
+def fetch_cse_total(q: str) -> int:
+    """Один запрос к Google CSE; возвращает число найденных результатов."""
+    resp = limited_get(
+        f"https://{CSE_HOST}/customsearch/v1",
+        params={"key": Config.GOOGLE_API_KEY, "cx": Config.GOOGLE_CSE_ID, "q": q},
+        timeout=http_timeout(20),
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    total = int(data.get("searchInformation", {}).get("totalResults", "0"))
+    logging.debug("CSE: q=%s total=%s", q, total)
+    return total
+
+
+def fetch_github_total(q: str) -> int:
+    """Число публичных репозиториев GitHub по запросу."""
+    r = limited_get(
+        "https://api.github.com/search/repositories",
+        params={"q": q, "per_page": 1},
+        timeout=http_timeout(15),
+    )
+    r.raise_for_status()
+    return int(r.json().get("total_count", 0) or 0)
+
+
+def fetch_hn_total(q: str) -> int:
+    """Число историй Hacker News (Algolia) по запросу."""
+    r = limited_get(
+        "https://hn.algolia.com/api/v1/search",
+        params={"query": q, "tags": "story"},
+        timeout=http_timeout(15),
+    )
+    r.raise_for_status()
+    data = r.json()
+    return int(data.get("nbHits", 0) or len(data.get("hits", [])))
+
+
+FETCHERS: dict[str, Callable[[str], int]] = {
+    "cse": fetch_cse_total,
+    "github": fetch_github_total,
+    "hn": fetch_hn_total,
+}
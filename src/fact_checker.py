@@ -6,49 +6,92 @@ import ast
 import html
 import logging
 import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 
 import requests
-from bs4 import BeautifulSoup
 
-from .config import Config
+from .code_memo import get_code_memo
+from .config import Config, parse_mapping
+from .deadline import DeadlineExceeded, bound, check, has_budget, http_timeout
+from .evidence_cache import cached_hits, peek_hits
+from .evidence_providers import fetch_cse_total, fetch_github_total, fetch_hn_total
+from .html_scan import CodeBlock, extract_code_blocks, extract_links, splice_code_blocks
+from .query_planner import get_query_planner
+from .rate_limiter import RateLimitExceeded
+from .snippet_classifier import RUN, classify_snippet
 
 
-def validate_code_blocks(article_html: str) -> list[str]:
-    """Проверяет синтаксис Python в <pre><code> блоках, возвращает список ошибок."""
+@dataclass
+class CodeBlockIssue:
+    """Проблемный блок кода: порядковый номер <pre><code> в статье, код и текст ошибки."""
+
+    index: int
+    code: str
+    error: str
+
+
+_PISTON_PYTHON = "3.10.0"
+
+
+def _syntax_error(code_text: str) -> str | None:
+    """Текст ошибки синтаксиса или None (`ast.parse` дешевле запроса к памяти — не кэшируем)."""
+    try:
+        ast.parse(code_text)
+    except Exception as e:
+        return f"Ошибка Python-кода: {html.escape(str(e))}"
+    return None
+
+
+def validate_code_blocks(article_html: str, blocks: list[CodeBlock] | None = None) -> list[str]:
+    """Проверяет синтаксис Python в <pre><code> блоках, возвращает список ошибок.
+
+    `blocks` — уже извлечённые блоки (чтобы не разбирать HTML повторно).
+    """
     errors: list[str] = []
     try:
-        soup = BeautifulSoup(article_html, "html.parser")
-        for pre in soup.find_all("pre"):
-            code = pre.find("code")
-            if not code:
+        if blocks is None:
+            blocks = extract_code_blocks(article_html)
+        for blk in blocks:
+            if not blk.is_python:
                 continue
-            cls = code.get("class", [])
-            code_text = code.get_text()
-            if any("python" in c for c in cls):
-                try:
-                    ast.parse(code_text)
-                except Exception as e:
-                    errors.append(f"Ошибка Python-кода: {html.escape(str(e))}")
+            err = _syntax_error(blk.code)
+            if err:
+                errors.append(err)
     except Exception as e:
         errors.append(f"Парсинг HTML не удался: {e}")
     return errors
 
 
+def replace_code_blocks(article_html: str, fixes: dict[int, str]) -> str:
+    """Подменяет содержимое <pre><code> блоков по их номерам, остальной HTML не трогает."""
+    if not fixes:
+        return article_html
+    return splice_code_blocks(article_html, extract_code_blocks(article_html), fixes)
+
+
+def _skip_reason(code: str) -> str | None:
+    """Причина не запускать сниппет (по статической классификации AST) или None."""
+    cls = classify_snippet(code)
+    return None if cls.kind == RUN else f"skipped: {cls.reason}"
+
+
 def _run_python_piston(code: str) -> tuple[bool, str]:
     """Выполняет короткий Python‑сниппет в Piston, возвращает (ok, вывод)."""
-    if len(code) > 1000:
-        return True, "skipped"
-    banned = ["import os", "import sys", "subprocess", "open(", "requests."]
-    if any(b in code for b in banned):
-        return True, "skipped"
+    skip = _skip_reason(code)
+    if skip:
+        return True, skip
     try:
         payload = {
             "language": "python",
-            "version": "3.10.0",
+            "version": _PISTON_PYTHON,
             "files": [{"name": "main.py", "content": code}],
             "stdin": "",
         }
-        r = requests.post("https://emkc.org/api/v2/piston/execute", json=payload, timeout=20)
+        r = requests.post("https://emkc.org/api/v2/piston/execute", json=payload, timeout=http_timeout(20))
         if r.status_code >= 400:
             return False, f"sandbox http {r.status_code}"
         data = r.json()
@@ -56,6 +99,8 @@ def _run_python_piston(code: str) -> tuple[bool, str]:
         out = (run.get("stdout") or "") + (run.get("stderr") or "")
         ok = run.get("code") == 0
         return ok, out.strip()
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return False, str(e)
 
@@ -64,15 +109,13 @@ def _run_python_replit(code: str) -> tuple[bool, str]:
     """Выполняет сниппет в кастомном шлюзе Replit, если настроен."""
     if not (Config.REPLIT_EVAL_URL and Config.REPLIT_EVAL_TOKEN):
         return False, "replit not configured"
-    if len(code) > 1000:
-        return True, "skipped"
-    banned = ["import os", "import sys", "subprocess", "open(", "requests."]
-    if any(b in code for b in banned):
-        return True, "skipped"
+    skip = _skip_reason(code)
+    if skip:
+        return True, skip
     try:
         headers = {"Authorization": f"Bearer {Config.REPLIT_EVAL_TOKEN}", "Content-Type": "application/json"}
         payload = {"language": "python3", "files": [{"name": "main.py", "content": code}]}
-        r = requests.post(Config.REPLIT_EVAL_URL, json=payload, headers=headers, timeout=20)
+        r = requests.post(Config.REPLIT_EVAL_URL, json=payload, headers=headers, timeout=http_timeout(20))
         if r.status_code >= 400:
             return False, f"replit http {r.status_code}"
         data = r.json()
@@ -82,18 +125,120 @@ def _run_python_replit(code: str) -> tuple[bool, str]:
         exit_code = int(data.get("exitCode") or 0)
         ok = exit_code == 0
         return ok, (stdout + stderr).strip()
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         return False, str(e)
 
 
+def _run_python_local(codes: list[str]) -> list[tuple[bool, str]]:
+    """Выполняет сниппеты параллельно в локальном пуле процессов с rlimits."""
+    from .sandbox_pool import get_local_pool
+
+    results: list[tuple[bool, str]] = [(True, _skip_reason(c) or "") for c in codes]
+    runnable = [i for i, (_, skip) in enumerate(results) if not skip]
+    try:
+        outputs = get_local_pool().run_many([codes[i] for i in runnable])
+    except Exception as e:
+        # без изоляции не исполняем — пропуск, а не ошибка кода
+        logging.warning("Local sandbox unavailable: %s", e)
+        return [(True, f"skipped: {e}")] * len(codes)
+    for i, res in zip(runnable, outputs):
+        results[i] = res
+    return results
+
+
 def _run_python_in_sandbox(code: str) -> tuple[bool, str]:
     """Выбирает провайдер песочницы и запускает сниппет."""
     provider = Config.SANDBOX_PROVIDER
+    if provider == "local":
+        return _run_python_local([code])[0]
     if provider == "replit":
         return _run_python_replit(code)
     return _run_python_piston(code)
 
 
+def _execute_many(codes: list[str]) -> list[tuple[bool, str]]:
+    if Config.SANDBOX_PROVIDER == "local":
+        return _run_python_local(codes)
+    results: list[tuple[bool, str]] = []
+    for code in codes:
+        try:
+            results.append(_run_python_in_sandbox(code))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            results.append((True, f"skipped: {e}"))
+    return results
+
+
+# Вывод сниппета уходит в промпт починки и в контрольную точку — наружу машины
+_SANDBOX_ERROR_LINES = 8
+_SANDBOX_ERROR_CHARS = 600
+_TOKEN_LIKE = re.compile(r"[A-Za-z0-9_\-+/=:.]{32,}")
+
+
+def _scrub_sandbox_output(out: str) -> str:
+    """Хвост вывода песочницы без секретов: последние строки трейсбека, без ключей из `Config`
+    и длинных токеноподобных строк, не длиннее `_SANDBOX_ERROR_CHARS`."""
+    text = "\n".join(out.strip().splitlines()[-_SANDBOX_ERROR_LINES:])
+    secrets = (
+        Config.OPENAI_API_KEY,
+        Config.GHOST_ADMIN_API_KEY,
+        Config.GOOGLE_API_KEY,
+        Config.TOCLICK_API_KEY,
+        Config.REPLIT_EVAL_TOKEN,
+    )
+    for secret in secrets:
+        if secret and len(secret) >= 8:
+            text = text.replace(secret, "***")
+    text = _TOKEN_LIKE.sub("***", text)
+    return text if len(text) <= _SANDBOX_ERROR_CHARS else "…" + text[-_SANDBOX_ERROR_CHARS:]
+
+
+def _sandbox_runtime() -> str:
+    """Идентификатор рантайма песочницы для ключа памяти результатов."""
+    provider = Config.SANDBOX_PROVIDER
+    if provider == "local":
+        v = sys.version_info
+        return f"local:{v.major}.{v.minor}.{v.micro}"
+    if provider == "replit":
+        return "replit:python3"
+    return f"piston:{_PISTON_PYTHON}"
+
+
+def _is_definitive(ok: bool, out: str) -> bool:
+    """Результат зависит только от кода: успешный запуск или трейсбек самой программы.
+
+    Пропуски, HTTP‑ошибки песочницы, сетевые сбои и таймауты не запоминаем.
+    """
+    if ok:
+        return not out.startswith("skipped")
+    return "Traceback (most recent call last)" in out
+
+
+def _run_python_many(codes: list[str], limit: int | None = None) -> list[tuple[bool, str]]:
+    """Запускает набор сниппетов: локальный пул — параллельно, удалённые — по очереди.
+
+    Уже проверенные в этом рантайме сниппеты берутся из памяти результатов,
+    в песочницу уходят только новые или изменённые — не больше `limit` штук
+    (остальные считаются пропущенными).
+    """
+    memo = get_code_memo()
+    runtime = _sandbox_runtime()
+    results: list[tuple[bool, str] | None] = [
+        memo.get("sandbox", runtime, c) if memo is not None else None for c in codes
+    ]
+    misses = [i for i, r in enumerate(results) if r is None][:limit]
+    if len(misses) < len(codes):
+        logging.info("Sandbox memo: %d/%d snippets reused", len(codes) - len(misses), len(codes))
+    for i, (ok, out) in zip(misses, _execute_many([codes[i] for i in misses])):
+        results[i] = (ok, out)
+        if memo is not None and _is_definitive(ok, out):
+            memo.put("sandbox", runtime, codes[i], ok, out)
+    return [r if r is not None else (True, "skipped") for r in results]
+
+
 def _tokenize_topic(topic: str) -> list[str]:
     """Токенизирует тему для генерации запросов к поиску."""
     tokens = [t for t in re.split(r"[^\w\-\/]+", topic.lower()) if t and len(t) > 2]
@@ -101,8 +246,8 @@ def _tokenize_topic(topic: str) -> list[str]:
     return [t for t in tokens if t not in stop]
 
 
-def _build_search_queries(topic: str) -> list[str]:
-    """Строит набор поисковых запросов (точные/комбинированные) для CSE."""
+def _build_shaped_queries(topic: str) -> list[tuple[str, str]]:
+    """Строит поисковые запросы для CSE вместе с их формой (см. `query_planner`)."""
     base = topic.strip()
     tokens = _tokenize_topic(base)
     pairs = [t for t in tokens if ("/" in t or "-" in t)]
@@ -115,82 +260,306 @@ def _build_search_queries(topic: str) -> list[str]:
     if len(pairs) >= 2:
         combos.append(f"{pairs[0]} {pairs[1]}")
     # базовый список
-    queries: list[str] = [base]
-    queries.extend(pairs)
-    queries.extend(head)
-    queries.extend(quoted)
-    queries.extend([f"site:github.com {head[0]}" if head else ""])  # узкое подтверждение
-    queries.extend(combos)
+    queries: list[tuple[str, str]] = [("full", base)]
+    queries.extend(("pair", q) for q in pairs)
+    queries.extend(("head", q) for q in head)
+    queries.extend(("quoted", q) for q in quoted)
+    queries.append(("site_github", f"site:github.com {head[0]}" if head else ""))  # узкое подтверждение
+    queries.extend(("combo", q) for q in combos)
     seen: set[str] = set()
-    result: list[str] = []
-    for q in queries:
+    result: list[tuple[str, str]] = []
+    for shape, q in queries:
         qn = q.strip()
         if qn and qn not in seen and len(qn) > 2:
             seen.add(qn)
-            result.append(qn)
-    return result[:8]
+            result.append((shape, qn))
+    return result
 
 
-def verify_with_search(topic: str, max_checks: int = 8) -> list[str]:
-    """Пытается подтвердить тему через Google CSE; возвращает список ошибок."""
-    if not (Config.GOOGLE_API_KEY and Config.GOOGLE_CSE_ID):
-        return []
-    queries = _build_search_queries(topic)
+def _build_search_queries(topic: str) -> list[str]:
+    """Строит набор поисковых запросов (точные/комбинированные) для CSE в исходном порядке."""
+    return [q for _, q in _build_shaped_queries(topic)][:8]
+
+
+@dataclass
+class SearchStats:
+    """Статистика подтверждения через CSE: сколько живых запросов потрачено и как быстро.
+
+    Ответы из кэша подтверждений квоту не тратят и в `queries_spent`/`outcomes` не входят.
+    """
+
+    queries_spent: int = 0
+    time_to_confirm_ms: float | None = None
+    confirmed_by: str | None = None
+    # Ответы живых запросов CSE: были ли результаты (для статистики планировщика)
+    outcomes: dict[str, bool] = field(default_factory=dict)
+
+
+def _cse_total(q: str) -> int:
+    """Число результатов Google CSE по запросу (через дисковый кэш подтверждений)."""
+    return cached_hits("cse", q, fetch_cse_total)
+
+
+def _is_live(q: str) -> bool:
+    """Пойдёт ли запрос в сеть (ответа нет в кэше подтверждений)."""
+    return peek_hits("cse", q) is None
+
+
+def _stopped(stop: threading.Event | None) -> bool:
+    return stop is not None and stop.is_set()
+
+
+def _search_sequential(
+    queries: list[str],
+    stats: SearchStats,
+    t0: float,
+    stop: threading.Event | None = None,
+) -> list[str]:
     errors: list[str] = []
-    tried: list[str] = []
-    for q in queries[:max_checks]:
-        tried.append(q)
+    for q in queries:
+        if _stopped(stop):
+            break
+        live = _is_live(q)
+        stats.queries_spent += int(live)
         try:
-            resp = requests.get(
-                "https://www.googleapis.com/customsearch/v1",
-                params={"key": Config.GOOGLE_API_KEY, "cx": Config.GOOGLE_CSE_ID, "q": q},
-                timeout=20,
-            )
-            data = resp.json()
-            total = int(data.get("searchInformation", {}).get("totalResults", "0"))
-            logging.debug("CSE: q=%s total=%s", q, total)
+            total = _cse_total(q)
+            if live:
+                stats.outcomes[q] = total > 0
             if total > 0:
+                stats.confirmed_by = q
+                stats.time_to_confirm_ms = (time.perf_counter() - t0) * 1000.0
                 return []
+        except DeadlineExceeded:
+            raise
+        except RateLimitExceeded as e:
+            # У предела квоты/частоты — не тратим остальное, уступаем следующему провайдеру
+            stats.queries_spent -= int(live)
+            logging.info("CSE skipped: %s", e)
+            errors.append(f"Google CSE пропущен: {e}")
+            break
         except Exception as e:
             logging.warning("CSE error for q=%s: %s", q, e)
             errors.append(f"Ошибка Google CSE: {e}")
+    return errors
+
+
+def _search_hedged(
+    queries: list[str],
+    stats: SearchStats,
+    t0: float,
+    *,
+    parallelism: int,
+    hedge_delay: float,
+    stop: threading.Event | None = None,
+) -> list[str]:
+    """Запускает запросы с перекрытием: следующий стартует, если предыдущие не ответили за `hedge_delay`.
+
+    Одновременно в полёте не больше `parallelism` запросов. Первый положительный
+    ответ завершает поиск; ещё не запущенные запросы отменяются, ответы уже
+    отправленных игнорируются.
+    """
+    errors: list[str] = []
+    pending: dict[Future, str] = {}
+    live: set[str] = set()
+    pool = ThreadPoolExecutor(max_workers=parallelism)
+    next_i = 0
+    try:
+        while (next_i < len(queries) or pending) and not _stopped(stop):
+            timeout: float | None = None
+            if next_i < len(queries) and len(pending) < parallelism:
+                q = queries[next_i]
+                if _is_live(q):
+                    live.add(q)
+                    stats.queries_spent += 1
+                pending[pool.submit(bound(_cse_total), q)] = q
+                next_i += 1
+                if next_i < len(queries) and len(pending) < parallelism:
+                    timeout = hedge_delay
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                q = pending.pop(fut)
+                try:
+                    total = fut.result()
+                except DeadlineExceeded:
+                    raise
+                except RateLimitExceeded as e:
+                    stats.queries_spent -= int(q in live)
+                    logging.info("CSE skipped: %s", e)
+                    errors.append(f"Google CSE пропущен: {e}")
+                    next_i = len(queries)
+                    continue
+                except Exception as e:
+                    logging.warning("CSE error for q=%s: %s", q, e)
+                    errors.append(f"Ошибка Google CSE: {e}")
+                    continue
+                if q in live:
+                    stats.outcomes[q] = total > 0
+                if total > 0:
+                    stats.confirmed_by = q
+                    stats.time_to_confirm_ms = (time.perf_counter() - t0) * 1000.0
+                    return []
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return errors
+
+
+def verify_with_search(
+    topic: str,
+    max_checks: int = 8,
+    *,
+    stats: SearchStats | None = None,
+    stop: threading.Event | None = None,
+) -> list[str]:
+    """Пытается подтвердить тему через Google CSE; возвращает список ошибок.
+
+    При `CSE_PARALLELISM > 1` запросы идут с перекрытием (см. `_search_hedged`):
+    меньше `CSE_HEDGE_DELAY_SEC` — быстрее подтверждение, но больше расход квоты.
+    `stats` (если передан) заполняется числом потраченных запросов и временем
+    до первого подтверждения; установленный `stop` прекращает запуск новых запросов.
+    Порядок запросов задаёт планировщик по истории успешности их форм
+    (`QUERY_PLANNER_ENABLED`), ответы CSE пополняют эту историю.
+    """
+    if not (Config.GOOGLE_API_KEY and Config.GOOGLE_CSE_ID):
+        return []
+    stats = stats if stats is not None else SearchStats()
+    shaped = _build_shaped_queries(topic)
+    planner = get_query_planner()
+    planned = planner.plan(shaped) if planner is not None else _build_search_queries(topic)
+    queries = planned[:max_checks]
+    t0 = time.perf_counter()
+    if Config.CSE_PARALLELISM > 1:
+        errors = _search_hedged(
+            queries,
+            stats,
+            t0,
+            parallelism=Config.CSE_PARALLELISM,
+            hedge_delay=Config.CSE_HEDGE_DELAY_SEC,
+            stop=stop,
+        )
+    else:
+        errors = _search_sequential(queries, stats, t0, stop)
+    logging.info(
+        "CSE: confirmed=%s queries_spent=%d time_to_confirm=%s",
+        stats.confirmed_by is not None,
+        stats.queries_spent,
+        f"{stats.time_to_confirm_ms:.0f} ms" if stats.time_to_confirm_ms is not None else "-",
+    )
+    if planner is not None:
+        planner.record(
+            {q: shape for shape, q in shaped},
+            stats.outcomes,
+            stats.queries_spent,
+            stats.confirmed_by is not None,
+        )
+    if stats.confirmed_by is not None:
+        return []
     if not errors:
         # Возвращаем одну ошибку — сигнал верхнему уровню пересобрать/остановить публикацию
-        errors.append("Не найдено подтверждений ни по одному подзапросу: " + ", ".join(tried))
+        errors.append("Не найдено подтверждений ни по одному подзапросу: " + ", ".join(queries))
     return errors
 
 
 # Дополнительные внешние источники как fallback (без ключей)
-def _evidence_github(tokens: list[str]) -> bool:
+def _evidence_github(tokens: list[str], stop: threading.Event | None = None) -> bool:
     """Непрямое подтверждение через наличие репозиториев на GitHub."""
     # Проверим, что по ключам есть публичные репозитории — это хорошее непрямое подтверждение
     for t in tokens[:3]:
+        if _stopped(stop):
+            break
         try:
-            r = requests.get("https://api.github.com/search/repositories", params={"q": t, "per_page": 1}, timeout=15)
-            if r.status_code < 400 and r.json().get("total_count", 0) > 0:
+            if cached_hits("github", t, fetch_github_total) > 0:
                 logging.debug("Fallback GitHub ok for token=%s", t)
                 return True
+        except DeadlineExceeded:
+            raise
+        except RateLimitExceeded as e:
+            logging.info("GitHub search skipped: %s", e)
+            break
         except Exception as e:
             logging.warning("GitHub search error for %s: %s", t, e)
     return False
 
 
-def _evidence_hn(tokens: list[str]) -> bool:
+def _evidence_hn(tokens: list[str], stop: threading.Event | None = None) -> bool:
     """Непрямое подтверждение через посты на Hacker News."""
     # Algolia HN API без ключей
     for t in tokens[:3]:
+        if _stopped(stop):
+            break
         try:
-            r = requests.get("https://hn.algolia.com/api/v1/search", params={"query": t, "tags": "story"}, timeout=15)
-            if r.status_code < 400 and (r.json().get("nbHits", 0) or len(r.json().get("hits", [])) > 0):
+            if cached_hits("hn", t, fetch_hn_total) > 0:
                 logging.debug("Fallback HN ok for token=%s", t)
                 return True
+        except DeadlineExceeded:
+            raise
+        except RateLimitExceeded as e:
+            logging.info("HN search skipped: %s", e)
+            break
         except Exception as e:
             logging.warning("HN search error for %s: %s", t, e)
     return False
 
 
+def _race_evidence(topic: str) -> list[str]:
+    """Гонка провайдеров CSE ∥ GitHub ∥ HN: первый подтвердивший побеждает.
+
+    У каждого провайдера свой таймаут (`EVIDENCE_TIMEOUTS`, отсчёт от старта гонки,
+    но не дольше остатка бюджета узла); опоздавший считается неподтвердившим. После победы остальным выставляется
+    `stop` — они не начинают новых запросов, а ответы уже отправленных игнорируются.
+    Если никто не подтвердил, возвращаются ошибки CSE, как в цепочке.
+    """
+    tokens = _tokenize_topic(topic)
+    stop = threading.Event()
+    providers = {
+        "cse": lambda: verify_with_search(topic, stop=stop),
+        "github": lambda: [] if _evidence_github(tokens, stop) else ["github: no evidence"],
+        "hn": lambda: [] if _evidence_hn(tokens, stop) else ["hn: no evidence"],
+    }
+    timeouts = parse_mapping(Config.EVIDENCE_TIMEOUTS)
+    pool = ThreadPoolExecutor(max_workers=len(providers))
+    t0 = time.perf_counter()
+    pending = {pool.submit(bound(fn)): name for name, fn in providers.items()}
+    deadlines = {name: http_timeout(float(timeouts.get(name, 30))) for name in providers}
+    cse_errors: list[str] | None = None
+    try:
+        while pending:
+            elapsed = time.perf_counter() - t0
+            for fut, name in list(pending.items()):
+                if elapsed >= deadlines[name]:
+                    logging.warning("Evidence %s timed out after %.0fs", name, deadlines[name])
+                    del pending[fut]
+            if not pending:
+                break
+            wait_for = min(deadlines[name] for name in pending.values()) - elapsed
+            done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = pending.pop(fut)
+                try:
+                    errs = fut.result()
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    logging.warning("Evidence %s failed: %s", name, e)
+                    errs = [f"{name}: {e}"]
+                if not errs:
+                    logging.info("Evidence: confirmed by %s in %.0f ms", name, (time.perf_counter() - t0) * 1000.0)
+                    return []
+                if name == "cse":
+                    cse_errors = errs
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    # Гонку оборвал срок узла, а не медленные провайдеры — это не «факт не подтверждён»
+    check()
+    if cse_errors is None:
+        cse_errors = [f"Google CSE не ответил за {deadlines['cse']:.0f} с"]
+    return cse_errors
+
+
 def verify_facts(topic: str) -> list[str]:
-    """Композитная проверка фактов: CSE → GitHub → HN."""
+    """Композитная проверка фактов: гонка CSE ∥ GitHub ∥ HN или цепочка CSE → GitHub → HN."""
+    if Config.EVIDENCE_RACE:
+        return _race_evidence(topic)
     # 1) Google CSE
     cse_errors = verify_with_search(topic)
     if not cse_errors:
@@ -205,33 +574,128 @@ def verify_facts(topic: str) -> list[str]:
     return cse_errors
 
 
-def fact_check(article_html: str, topic: str) -> tuple[bool, list[str]]:
-    """Главная функция фактчекинга: синтаксис кода → песочница → поиск фактов."""
-    errors: list[str] = []
-    # 1) Синтаксис Python
-    errors.extend(validate_code_blocks(article_html))
+def check_code_blocks(
+    article_html: str,
+    *,
+    only: set[int] | None = None,
+    max_executions: int | None = 2,
+    blocks: list[CodeBlock] | None = None,
+) -> list[CodeBlockIssue]:
+    """Проверяет Python‑блоки (AST → статическая классификация → песочница) и возвращает проблемные.
 
-    # 2) Выполним отдельные короткие сниппеты в песочнице
-    try:
-        soup = BeautifulSoup(article_html, "html.parser")
-        executed = 0
-        for pre in soup.find_all("pre"):
-            if executed >= 2:
-                break
-            code = pre.find("code")
-            if not code:
-                continue
-            cls = code.get("class", [])
-            code_text = code.get_text()
-            if any("python" in c for c in cls):
-                ok, out = _run_python_in_sandbox(code_text)
-                if not ok:
-                    errors.append(f"Сниппет не исполнился в песочнице: {html.escape(out)}")
-                executed += 1
-    except Exception:
-        pass
+    `only` ограничивает проверку блоками с указанными номерами (например, после
+    точечной починки), `max_executions` — лимит запусков в удалённой песочнице (None — без
+    лимита; для `SANDBOX_PROVIDER=local` не применяется),
+    `blocks` — уже извлечённые блоки (чтобы не разбирать HTML повторно).
+    """
+    issues: list[CodeBlockIssue] = []
+    if blocks is None:
+        try:
+            blocks = extract_code_blocks(article_html)
+        except Exception as e:
+            return [CodeBlockIssue(index=-1, code="", error=f"Парсинг HTML не удался: {e}")]
+    # Локальный пул дешёвый — проверяем все сниппеты; удалённые песочницы ограничены лимитом
+    limit = None if Config.SANDBOX_PROVIDER == "local" else max_executions
+    to_run: list[CodeBlock] = []
+    kinds: dict[str, int] = {}
+    for blk in blocks:
+        if not blk.is_python or (only is not None and blk.index not in only):
+            continue
+        err = _syntax_error(blk.code)
+        if err:
+            issues.append(CodeBlockIssue(index=blk.index, code=blk.code, error=err))
+            continue
+        # Только определения — достаточно AST; опасные не исполняем; в песочницу — остальное
+        kind = classify_snippet(blk.code).kind
+        kinds[kind] = kinds.get(kind, 0) + 1
+        if kind == RUN:
+            to_run.append(blk)
+    if kinds:
+        logging.info("Code blocks: %s", kinds)
+    results = _run_python_many([b.code for b in to_run], limit)
+    for blk, (ok, out) in zip(to_run, results):
+        if not ok:
+            issues.append(
+                CodeBlockIssue(
+                    index=blk.index,
+                    code=blk.code,
+                    error=f"Сниппет не исполнился в песочнице: {html.escape(_scrub_sandbox_output(out))}",
+                ),
+            )
+    return issues
+
+
+@dataclass
+class FactCheckReport:
+    """Результат фактчекинга с разделением ошибок кода и ошибок подтверждения фактов."""
+
+    code_issues: list[CodeBlockIssue] = field(default_factory=list)
+    fact_errors: list[str] = field(default_factory=list)
+    # Вердикты по конкретным утверждениям статьи (claims.ClaimVerdict), если проверка включена
+    claims: list = field(default_factory=list)
+    # Результаты проверки внешних ссылок (link_checker.LinkResult), если проверка включена
+    links: list = field(default_factory=list)
+
+    @property
+    def errors(self) -> list[str]:
+        return [i.error for i in self.code_issues] + self.fact_errors
+
+    @property
+    def ok(self) -> bool:
+        return not self.code_issues and not self.fact_errors
 
+
+def fact_check_report(article_html: str, topic: str) -> FactCheckReport:
+    """Фактчекинг с детальным отчётом: синтаксис кода → песочница → поиск фактов → утверждения → ссылки.
+
+    Проверка утверждений управляется `CLAIM_CHECK`, проверка ссылок — `LINK_CHECK`:
+    off — выключена, report — результаты только в отчёте, strict — неподтверждённые
+    утверждения и битые ссылки становятся ошибками.
+    """
+    report = FactCheckReport()
+    # 1–2) Синтаксис Python и запуск коротких сниппетов в песочнице — за один разбор HTML
+    report.code_issues.extend(check_code_blocks(article_html))
     # 3) Поиск фактов (CSE + fallback источники)
-    errors.extend(verify_facts(topic))
+    report.fact_errors.extend(verify_facts(topic))
+    # 4) Конкретные утверждения статьи: версии, библиотеки, даты
+    mode = Config.CLAIM_CHECK
+    if mode in {"report", "strict"}:
+        from .claims import extract_claims, verify_claims
 
-    return (len(errors) == 0, errors)
+        try:
+            report.claims = verify_claims(extract_claims(article_html, limit=Config.CLAIM_MAX))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logging.warning("Claim check failed: %s", e)
+        if mode == "strict":
+            report.fact_errors.extend(
+                f"Не подтверждено утверждение: {html.escape(str(v.claim))}"
+                for v in report.claims
+                if v.verdict == "unconfirmed"
+            )
+    # 5) Внешние ссылки: HEAD/GET параллельно; при нехватке бюджета узла шаг пропускается
+    if Config.LINK_CHECK in {"report", "strict"} and not has_budget(Config.LINK_CHECK_TIMEOUT_SEC * 2):
+        logging.info("Link check skipped: node budget too small")
+    elif Config.LINK_CHECK in {"report", "strict"}:
+        from .link_checker import check_links
+
+        try:
+            report.links = check_links(extract_links(article_html))
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            logging.warning("Link check failed: %s", e)
+        if Config.LINK_CHECK == "strict":
+            report.fact_errors.extend(
+                f"Битая ссылка: {html.escape(r.url)} ({r.status or r.detail})"
+                for r in report.links
+                if r.verdict == "dead"
+            )
+    return report
+
+
+def fact_check(article_html: str, topic: str) -> tuple[bool, list[str]]:
+    """Главная функция фактчекинга: синтаксис кода → песочница → поиск фактов."""
+    report = fact_check_report(article_html, topic)
+    return report.ok, report.errors
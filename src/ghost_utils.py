@@ -3,6 +3,7 @@
 - ghost_admin_base: собирает базовый адрес Admin API
 - ghost_auth_headers: генерирует JWT с выравниванием по серверному времени
 - fetch_posts: обёртка GET /posts с параметрами NQL
+- upload_image_bytes: загрузка изображения (MIME по сигнатуре файла)
 """
 
 from __future__ import annotations
@@ -15,6 +16,8 @@ import jwt
 import requests
 
 from .config import Config
+from .deadline import DeadlineExceeded, http_timeout
+from .image_encoding import sniff_image_type
 
 
 def ghost_admin_base() -> str:
@@ -25,7 +28,7 @@ def ghost_admin_base() -> str:
 
 def _server_epoch(base: str) -> int:
     try:
-        r = requests.get(base + "/site/", timeout=10)
+        r = requests.get(base + "/site/", timeout=http_timeout(10))
         date_hdr = r.headers.get("Date")
         if date_hdr:
             dt_ = parsedate_to_datetime(date_hdr)
@@ -67,21 +70,32 @@ def fetch_posts(
         params["filter"] = filter
     if order:
         params["order"] = order
-    r = requests.get(base + "/posts/", headers=ghost_auth_headers(), params=params, timeout=timeout)
+    r = requests.get(base + "/posts/", headers=ghost_auth_headers(), params=params, timeout=http_timeout(timeout))
     r.raise_for_status()
     return r.json().get("posts", [])
 
 
-def upload_image_bytes(image_bytes: bytes, filename: str = "cover.png", *, timeout: int = 60) -> str | None:
-    """Загружает изображение в Ghost и возвращает URL или None при ошибке."""
+def upload_image_bytes(image_bytes: bytes, filename: str | None = None, *, timeout: int = 60) -> str | None:
+    """Загружает изображение в Ghost и возвращает URL или None при ошибке.
+
+    MIME‑тип определяется по сигнатуре файла; без `filename` имя — `cover` с подходящим расширением.
+    """
     base = ghost_admin_base()
+    mime, ext = sniff_image_type(image_bytes)
     try:
-        files = {"file": (filename, image_bytes, "image/png")}
-        r = requests.post(base + "/images/upload/", headers=ghost_auth_headers(), files=files, timeout=timeout)
+        files = {"file": (filename or f"cover{ext}", image_bytes, mime)}
+        r = requests.post(
+            base + "/images/upload/",
+            headers=ghost_auth_headers(),
+            files=files,
+            timeout=http_timeout(timeout),
+        )
         if r.status_code >= 400:
             return None
         data = r.json()
         return data.get("images", [{}])[0].get("url")
+    except DeadlineExceeded:
+        raise
     except Exception:
         return None
 
@@ -114,7 +128,12 @@ def publish_html_post(
             },
         ],
     }
-    r = requests.post(base + "/posts/?source=html", headers=ghost_auth_headers(), json=payload, timeout=timeout)
+    r = requests.post(
+        base + "/posts/?source=html",
+        headers=ghost_auth_headers(),
+        json=payload,
+        timeout=http_timeout(timeout),
+    )
     if r.status_code >= 400:
         r.raise_for_status()
     return r.json()
@@ -0,0 +1,248 @@
+"""Однопроходная финализация HTML статьи перед публикацией.
+
+Потоковый обработчик на `html.parser` за один проход:
+
+- подставляет блоки CTA на места маркеров `<!--CTA_SLOT-->` (лишние маркеры
+  удаляются, не поместившиеся блоки добавляются в конец);
+- вырезает опасные теги (`script`, `iframe`, `form`…) и атрибуты (`on*`,
+  ссылки со схемой не из белого списка http/https/mailto — кроме `data:image`
+  в `src`, `expression()` в стилях);
+- удаляет прочие комментарии и схлопывает пробелы вне `<pre>`/`<code>`;
+- запоминает границы закрытых элементов и стек открытых тегов, чтобы при
+  превышении бюджета (`HTML_MAX_BYTES`) обрезать документ по целому элементу и
+  корректно закрыть открытые теги, а не резать посреди тега.
+
+Результат собирается одним `"".join` без повторных склеек и разборов.
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+from .config import Config
+
+CTA_SLOT_MARKER = "CTA_SLOT"
+
+_DROP_WITH_CONTENT = frozenset(
+    {"script", "style", "iframe", "object", "embed", "applet", "svg", "math", "noscript", "template", "frameset"},
+)
+_DROP_TAG = frozenset({"form", "input", "button", "textarea", "select", "option", "link", "meta", "base", "frame"})
+_VOID = frozenset({"area", "br", "col", "hr", "img", "source", "track", "wbr"})
+_PRESERVE_WS = frozenset({"pre", "code"})
+_BLOCK = frozenset(
+    {
+        "p",
+        "div",
+        "ul",
+        "ol",
+        "li",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "pre",
+        "blockquote",
+        "table",
+        "thead",
+        "tbody",
+        "tr",
+        "td",
+        "th",
+        "figure",
+        "figcaption",
+        "section",
+        "article",
+        "hr",
+        "br",
+    },
+)
+_HEADINGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+_URL_ATTRS = frozenset({"href", "src", "action", "formaction", "xlink:href", "poster", "background"})
+_DROP_ATTRS = frozenset({"srcdoc", "formaction"})
+_SAFE_SCHEMES = frozenset({"http", "https", "mailto"})
+_SCHEME = re.compile(r"^([a-z][a-z0-9+.\-]*):", re.IGNORECASE)
+# Браузеры игнорируют управляющие символы и пробелы в схеме: "java\tscript:" == "javascript:"
+_URL_NOISE = re.compile(r"[\x00-\x20\x7f]+")
+_DATA_IMAGE = re.compile(r"^data:image/(?:png|jpeg|gif|webp);", re.IGNORECASE)
+_BAD_STYLE = re.compile(r"expression\s*\(|javascript\s*:|url\s*\(\s*['\"]?\s*javascript", re.IGNORECASE)
+_WS = re.compile(r"\s+")
+
+
+@dataclass
+class FinalizeResult:
+    """Итог финализации: HTML, сколько CTA вставлено, сколько тегов/атрибутов вырезано, была ли обрезка."""
+
+    html: str
+    ctas_inserted: int = 0
+    removed: int = 0
+    truncated: bool = False
+
+
+def _safe_url(value: str, *, allow_data_image: bool = False) -> bool:
+    """Белый список: относительные URL и схемы http/https/mailto (и `data:image` для `src`)."""
+    compact = _URL_NOISE.sub("", value)
+    m = _SCHEME.match(compact)
+    if m is None:
+        return True
+    if m.group(1).lower() in _SAFE_SCHEMES:
+        return True
+    return allow_data_image and _DATA_IMAGE.match(compact) is not None
+
+
+class _Finalizer(HTMLParser):
+    def __init__(self, cta_blocks: list[str]) -> None:
+        super().__init__(convert_charrefs=False)
+        self.out: list[str] = []
+        self.size = 0
+        # (число частей, размер, открытые теги) после закрытия элементов — безопасные места обрезки
+        self.cuts: list[tuple[int, int, tuple[str, ...]]] = [(0, 0, ())]
+        self.ctas = list(cta_blocks)
+        # номера частей `out`, в которых стоят вставленные CTA (для подсчёта после обрезки)
+        self.cta_parts: list[int] = []
+        self.removed = 0
+        self._stack: list[str] = []
+        self._skip = 0
+        self._preserve = 0
+        self._after_block = True
+
+    def _emit(self, s: str, *, block: bool = False) -> None:
+        if not s:
+            return
+        self.out.append(s)
+        self.size += len(s.encode("utf-8"))
+        self._after_block = block
+
+    def _mark_cut(self) -> None:
+        self.cuts.append((len(self.out), self.size, tuple(self._stack)))
+
+    def _attrs(self, tag: str, attrs: list[tuple[str, str | None]]) -> str:
+        parts: list[str] = []
+        for name, value in attrs:
+            key = name.lower()
+            if key.startswith("on") or key in _DROP_ATTRS:
+                self.removed += 1
+                continue
+            val = value or ""
+            if key in _URL_ATTRS and not _safe_url(val, allow_data_image=key == "src"):
+                self.removed += 1
+                continue
+            if key == "style" and _BAD_STYLE.search(val):
+                self.removed += 1
+                continue
+            parts.append(f' {key}="{html.escape(val, quote=True)}"' if value is not None else f" {key}")
+        if tag == "a" and any(k == "target" for k, _ in attrs) and not any(k == "rel" for k, _ in attrs):
+            parts.append(' rel="noopener"')
+        return "".join(parts)
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self._skip:
+            if tag in _DROP_WITH_CONTENT:
+                self._skip += 1
+            return
+        if tag in _DROP_WITH_CONTENT:
+            self._skip = 1
+            self.removed += 1
+            return
+        if tag in _DROP_TAG:
+            self.removed += 1
+            return
+        self._emit(f"<{tag}{self._attrs(tag, attrs)}>", block=tag in _BLOCK)
+        if tag in _VOID:
+            self._mark_cut()
+            return
+        self._stack.append(tag)
+        if tag in _PRESERVE_WS:
+            self._preserve += 1
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self._skip:
+            return
+        if tag in _DROP_WITH_CONTENT or tag in _DROP_TAG:
+            self.removed += 1
+            return
+        self._emit(f"<{tag}{self._attrs(tag, attrs)}>", block=tag in _BLOCK)
+        if tag not in _VOID:
+            self._emit(f"</{tag}>", block=tag in _BLOCK)
+        self._mark_cut()
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skip:
+            if tag in _DROP_WITH_CONTENT:
+                self._skip -= 1
+            return
+        if tag in _DROP_TAG or tag in _VOID or tag in _DROP_WITH_CONTENT or tag not in self._stack:
+            # непарные закрывающие теги не выводим
+            return
+        # неявно закрытые вложенные теги (например, <li> без </li>) снимаем со стека
+        while self._stack:
+            open_tag = self._stack.pop()
+            if open_tag in _PRESERVE_WS and self._preserve:
+                self._preserve -= 1
+            if open_tag == tag:
+                break
+        self._emit(f"</{tag}>", block=tag in _BLOCK)
+        if tag not in _HEADINGS:
+            # после заголовка не режем — иначе в конце останется заголовок без раздела
+            self._mark_cut()
+
+    def handle_data(self, data: str) -> None:
+        if self._skip:
+            return
+        if not self._preserve:
+            data = _WS.sub(" ", data)
+            if self._after_block:
+                data = data.lstrip()
+        self._emit(data)
+
+    def handle_entityref(self, name: str) -> None:
+        if not self._skip:
+            self._emit(f"&{name};")
+
+    def handle_charref(self, name: str) -> None:
+        if not self._skip:
+            self._emit(f"&#{name};")
+
+    def handle_comment(self, data: str) -> None:
+        if self._skip or data.strip() != CTA_SLOT_MARKER:
+            return
+        if self.ctas:
+            self.cta_parts.append(len(self.out))
+            self._emit(self.ctas.pop(0), block=True)
+            self._mark_cut()
+
+
+def finalize_html(
+    article_html: str,
+    cta_blocks: list[str] | None = None,
+    *,
+    max_bytes: int | None = None,
+) -> FinalizeResult:
+    """Финализирует HTML статьи за один проход (см. описание модуля).
+
+    `max_bytes` — бюджет размера в байтах UTF‑8 (по умолчанию `HTML_MAX_BYTES`, 0 — без ограничения).
+    """
+    parser = _Finalizer(cta_blocks or [])
+    parser.feed(article_html)
+    parser.close()
+    tail = parser.ctas
+    budget = Config.HTML_MAX_BYTES if max_bytes is None else max_bytes
+    tail_size = sum(len(b.encode("utf-8")) for b in tail)
+    parts, kept, truncated = parser.out, len(parser.out), False
+    if budget and parser.size + tail_size > budget:
+        # Обрезаем по последней границе элемента, закрывая открытые теги и оставляя место под CTA в конце
+        for count, size, open_tags in reversed(parser.cuts):
+            closing = "".join(f"</{t}>" for t in reversed(open_tags))
+            if size + len(closing) + tail_size <= budget or count == 0:
+                parts, kept, truncated = [*parts[:count], closing], count, True
+                break
+        logging.warning("HTML finalizer: %d bytes over budget %d, truncated", parser.size + tail_size, budget)
+    result = "".join(parts) + "".join(tail)
+    # CTA, отрезанные вместе с концом документа, вставленными не считаются
+    inserted = sum(1 for i in parser.cta_parts if i < kept) + len(tail)
+    return FinalizeResult(result, inserted, parser.removed, truncated)
@@ -0,0 +1,230 @@
+"""Однопроходное извлечение фрагментов из HTML статьи без построения дерева.
+
+Потоковый обработчик на `html.parser` находит блоки <pre><code> и возвращает
+язык, текст кода и смещения содержимого в исходной строке. Смещения позволяют
+подменять код точечно, не пересериализуя весь документ; если разметка внутри
+кода сбила смещения (сырой `<` вроде `if a<b:` парсер принимает за тег), подмена
+откатывается к пересериализации через BeautifulSoup. Отдельные обработчики
+собирают видимый текст статьи (для извлечения проверяемых утверждений) и
+внешние ссылки `<a href>` (для проверки битых ссылок).
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+
+@dataclass
+class CodeBlock:
+    """Блок <pre><code>: порядковый номер, классы, текст и смещения содержимого <code>."""
+
+    index: int
+    classes: list[str]
+    code: str
+    start: int
+    end: int
+
+    @property
+    def language(self) -> str | None:
+        """Язык из класса вида `language-xxx`/`lang-xxx` (или первый класс)."""
+        for c in self.classes:
+            for prefix in ("language-", "lang-"):
+                if c.startswith(prefix):
+                    return c[len(prefix) :] or None
+        return self.classes[0] if self.classes else None
+
+    @property
+    def is_python(self) -> bool:
+        return any("python" in c for c in self.classes)
+
+
+@dataclass
+class _OpenBlock:
+    classes: list[str]
+    start: int
+    parts: list[str] = field(default_factory=list)
+    depth: int = 0
+
+
+class _CodeBlockParser(HTMLParser):
+    """Собирает первый <code> внутри каждого <pre> (как `pre.find("code")`)."""
+
+    def __init__(self, source: str) -> None:
+        super().__init__(convert_charrefs=True)
+        self.source = source
+        self.blocks: list[CodeBlock] = []
+        self._line_starts = [0]
+        pos = source.find("\n")
+        while pos != -1:
+            self._line_starts.append(pos + 1)
+            pos = source.find("\n", pos + 1)
+        self._pre_depth = 0
+        self._pre_has_code = False
+        self._open: _OpenBlock | None = None
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self._line_starts[line - 1] + col
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "pre":
+            self._pre_depth += 1
+            if self._pre_depth == 1:
+                self._pre_has_code = False
+            return
+        if tag != "code" or not self._pre_depth:
+            return
+        if self._open is not None:
+            self._open.depth += 1
+            return
+        if self._pre_has_code:
+            return
+        self._pre_has_code = True
+        cls = next((v or "" for k, v in attrs if k == "class"), "")
+        start = self._offset() + len(self.get_starttag_text() or "")
+        self._open = _OpenBlock(classes=cls.split(), start=start)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "code" and self._open is not None:
+            if self._open.depth:
+                self._open.depth -= 1
+                return
+            self._close(self._offset())
+        elif tag == "pre" and self._pre_depth:
+            if self._pre_depth == 1 and self._open is not None:
+                # незакрытый <code> — содержимое до </pre>
+                self._close(self._offset())
+            self._pre_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._open is not None:
+            self._open.parts.append(data)
+
+    def _close(self, end: int) -> None:
+        blk = self._open
+        assert blk is not None
+        self.blocks.append(
+            CodeBlock(index=len(self.blocks), classes=blk.classes, code="".join(blk.parts), start=blk.start, end=end),
+        )
+        self._open = None
+
+
+class _TextParser(HTMLParser):
+    """Собирает видимый текст вне <pre>/<script>/<style> и содержимое инлайн‑<code>."""
+
+    _SKIP = frozenset({"pre", "script", "style"})
+    _BLOCK = frozenset({"p", "li", "h1", "h2", "h3", "h4", "h5", "h6", "div", "br", "tr", "blockquote"})
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.parts: list[str] = []
+        self.inline_code: list[str] = []
+        self._skip = 0
+        self._code: list[str] | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in self._SKIP:
+            self._skip += 1
+        elif tag == "code" and not self._skip:
+            self._code = []
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._SKIP and self._skip:
+            self._skip -= 1
+        elif tag == "code" and self._code is not None:
+            self.inline_code.append("".join(self._code).strip())
+            self._code = None
+        elif tag in self._BLOCK:
+            self.parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if self._skip:
+            return
+        self.parts.append(data)
+        if self._code is not None:
+            self._code.append(data)
+
+
+class _LinkParser(HTMLParser):
+    """Собирает абсолютные http(s)-ссылки из `<a href>` без повторов, в порядке появления."""
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.links: list[str] = []
+        self._seen: set[str] = set()
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag != "a":
+            return
+        href = next(((v or "").strip() for k, v in attrs if k == "href"), "")
+        if href.lower().startswith(("http://", "https://")) and href not in self._seen:
+            self._seen.add(href)
+            self.links.append(href)
+
+
+def extract_links(article_html: str) -> list[str]:
+    """Возвращает внешние ссылки статьи (http/https) без повторов."""
+    parser = _LinkParser()
+    parser.feed(article_html)
+    parser.close()
+    return parser.links
+
+
+def extract_text(article_html: str) -> tuple[str, list[str]]:
+    """Возвращает (видимый текст без блоков кода, список инлайн‑<code> фрагментов)."""
+    parser = _TextParser()
+    parser.feed(article_html)
+    parser.close()
+    return "".join(parser.parts), [c for c in parser.inline_code if c]
+
+
+def extract_code_blocks(article_html: str) -> list[CodeBlock]:
+    """Возвращает все блоки <pre><code> за один проход по HTML."""
+    parser = _CodeBlockParser(article_html)
+    parser.feed(article_html)
+    parser.close()
+    return parser.blocks
+
+
+def _offsets_reliable(source: str, blk: CodeBlock) -> bool:
+    """Смещения блока указывают ровно на содержимое <code>: дальше идёт `</code`/`</pre`, внутри их нет."""
+    inner = source[blk.start : blk.end].lower()
+    tail = source[blk.end : blk.end + 6].lower()
+    return tail.startswith(("</code", "</pre")) and "</code" not in inner and "</pre" not in inner
+
+
+def _replace_reserialized(article_html: str, fixes: dict[int, str]) -> str:
+    """Медленный путь: подмена через дерево BeautifulSoup и пересериализацию документа."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(article_html, "html.parser")
+    index = 0
+    for pre in soup.find_all("pre"):
+        code = pre.find("code")
+        if not code:
+            continue
+        if index in fixes:
+            code.string = fixes[index]
+        index += 1
+    return str(soup)
+
+
+def splice_code_blocks(article_html: str, blocks: list[CodeBlock], fixes: dict[int, str]) -> str:
+    """Подменяет содержимое блоков по номерам, используя смещения; прочий HTML не меняется.
+
+    Если у подменяемого блока смещения ненадёжны (см. `_offsets_reliable`),
+    документ пересериализуется целиком, чтобы не отрезать `</code>`.
+    """
+    targets = [blk for blk in blocks if blk.index in fixes]
+    if any(not _offsets_reliable(article_html, blk) for blk in targets):
+        logging.info("Code block offsets unreliable, re-serializing HTML for %d fixes", len(fixes))
+        return _replace_reserialized(article_html, fixes)
+    result = article_html
+    for blk in sorted(targets, key=lambda b: b.start, reverse=True):
+        result = result[: blk.start] + html.escape(fixes[blk.index], quote=False) + result[blk.end :]
+    return result
@@ -0,0 +1,89 @@
+"""Кодирование обложек под бюджет размера файла.
+
+Формат выбирается по `COVER_FORMAT`:
+
+- `auto` — «плоские» изображения (градиентный фолбэк, мало цветов) — PNG с
+  палитрой 256 цветов, фотоподобные (DALL‑E) — прогрессивный JPEG;
+- `webp` / `jpeg` — всегда этот формат; `png` — прежний полноцветный PNG.
+
+Для JPEG/WebP качество подбирается бинарным поиском: максимальное качество в
+диапазоне [`COVER_MIN_QUALITY`, 92], при котором файл укладывается в бюджет
+(`COVER_MAX_BYTES` для 1200x630, для других размеров — пропорционально площади).
+MIME‑тип и расширение определяются по сигнатуре (`sniff_image_type`), поэтому
+их не нужно передавать отдельно до загрузки в Ghost.
+"""
+
+from __future__ import annotations
+
+import io
+import logging
+
+from PIL import Image
+
+from .config import Config
+
+_MAX_QUALITY = 92
+_REFERENCE_AREA = 1200 * 630
+_MIN_BUDGET = 16_000
+_FLAT_MAX_COLORS = 4096
+
+
+def sniff_image_type(data: bytes) -> tuple[str, str]:
+    """(MIME‑тип, расширение) по сигнатуре файла; по умолчанию PNG."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg", ".jpg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif", ".gif"
+    return "image/png", ".png"
+
+
+def byte_budget(size: tuple[int, int]) -> int:
+    """Бюджет размера файла для изображения данного размера."""
+    return max(_MIN_BUDGET, round(Config.COVER_MAX_BYTES * size[0] * size[1] / _REFERENCE_AREA))
+
+
+def _save(img: Image.Image, fmt: str, **params) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format=fmt, **params)
+    return out.getvalue()
+
+
+def _encode_lossy(img: Image.Image, fmt: str, budget: int) -> bytes:
+    """Бинарный поиск максимального качества, укладывающегося в бюджет."""
+    params = {"optimize": True, "progressive": True} if fmt == "JPEG" else {"method": 4}
+    lo, hi = max(1, Config.COVER_MIN_QUALITY), _MAX_QUALITY
+    best = _save(img, fmt, quality=hi, **params)
+    if len(best) <= budget:
+        return best
+    best = _save(img, fmt, quality=lo, **params)
+    if len(best) > budget:
+        logging.info("Cover: %s at minimum quality %d is %d bytes (budget %d)", fmt, lo, len(best), budget)
+        return best
+    while hi - lo > 2:
+        mid = (lo + hi) // 2
+        data = _save(img, fmt, quality=mid, **params)
+        if len(data) <= budget:
+            lo, best = mid, data
+        else:
+            hi = mid
+    return best
+
+
+def _is_flat(img: Image.Image) -> bool:
+    return img.getcolors(maxcolors=_FLAT_MAX_COLORS) is not None
+
+
+def encode_cover(img: Image.Image, budget: int | None = None) -> bytes:
+    """Кодирует обложку в формат из `COVER_FORMAT`, стараясь уложиться в бюджет байт."""
+    budget = budget or byte_budget(img.size)
+    fmt = Config.COVER_FORMAT
+    img = img.convert("RGB")
+    if fmt == "png":
+        return _save(img, "PNG")
+    if fmt == "auto" and _is_flat(img):
+        data = _save(img.quantize(colors=256), "PNG", optimize=True)
+        if len(data) <= budget:
+            return data
+    return _encode_lossy(img, "WEBP" if fmt == "webp" else "JPEG", budget)
@@ -0,0 +1,247 @@
+"""Параллельная проверка внешних ссылок статьи.
+
+Все `<a href>` проверяются одновременно через общую `requests.Session` с пулом
+соединений: сначала HEAD, при любом статусе ≥ 400 (многие серверы не
+поддерживают HEAD и отвечают 403/405/501) — GET без чтения тела. Одновременных запросов к одному хосту — не больше
+`LINK_CHECK_PER_HOST`, чтобы не получить 429 от docs/GitHub. Результаты
+кэшируются по URL (SQLite в `Config.CACHE_DIR`) на `LINK_CHECK_TTL_SEC`;
+в кэш попадают только рабочие ссылки и однозначно битые (404/410), а
+неопределённые исходы (таймауты, ошибки соединения, 429, 5xx) не кэшируются и
+битыми не считаются. Ответы 401/403 и прочие 4xx кроме 404/410 тоже считаются
+неопределёнными: закрытая авторизацией или антиботом страница не обязательно битая.
+
+Ссылки на хосты, которые резолвятся в непубличные адреса (локальная сеть,
+loopback, link‑local), не запрашиваются — это проверяется и для каждого
+редиректа, поэтому редиректы проходятся вручную. DNS‑резолв выполняется в
+отдельном небольшом пуле потоков с таймаутом запроса: `getaddrinfo` своего
+таймаута не имеет и на «зависшем» резолвере держал бы воркер проверки.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from dataclasses import dataclass
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import Config
+from .deadline import bound, http_timeout
+
+_USER_AGENT = "Mozilla/5.0 (compatible; DailyDevDigestLinkChecker/1.0)"
+_MAX_REDIRECTS = 5
+# Статусы, после которых ссылка считается битой надолго и кэшируется
+_DEFINITE_DEAD = frozenset({404, 410})
+# Потоков для getaddrinfo: зависшие резолвы занимают не больше стольких потоков
+_RESOLVER_WORKERS = 8
+
+
+@dataclass
+class LinkResult:
+    """Итог проверки ссылки: ok / dead / unknown, HTTP‑статус и пояснение."""
+
+    url: str
+    verdict: str
+    status: int | None = None
+    detail: str | None = None
+    cached: bool = False
+
+
+class LinkCache:
+    """Результаты проверки по URL с TTL; хранятся только ok и dead с 404/410."""
+
+    def __init__(self, path: Path, ttl_sec: float) -> None:
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            "url TEXT PRIMARY KEY, verdict TEXT NOT NULL, status INTEGER, stored_at REAL NOT NULL)",
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> LinkResult | None:
+        with self._lock:
+            row = self._conn.execute("SELECT verdict, status, stored_at FROM links WHERE url = ?", (url,)).fetchone()
+        if not row or time.time() - float(row[2]) > self.ttl_sec:
+            return None
+        return LinkResult(url, str(row[0]), row[1], cached=True)
+
+    def put(self, result: LinkResult) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO links (url, verdict, status, stored_at) VALUES (?, ?, ?, ?)",
+                    (result.url, result.verdict, result.status, time.time()),
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.warning("Link cache write failed: %s", e)
+
+
+_cache: LinkCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_link_cache() -> LinkCache | None:
+    """Общий кэш ссылок (создаётся лениво); None, если недоступен или TTL = 0."""
+    global _cache  # noqa: PLW0603
+    if Config.LINK_CHECK_TTL_SEC <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LinkCache(Config.CACHE_DIR / "links.sqlite3", Config.LINK_CHECK_TTL_SEC)
+            except Exception as e:
+                logging.warning("Link cache unavailable: %s", e)
+                return None
+        return _cache
+
+
+def _make_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = _USER_AGENT
+    return session
+
+
+def _classify_status(url: str, status: int) -> LinkResult:
+    if status < 400:
+        return LinkResult(url, "ok", status)
+    if status in _DEFINITE_DEAD:
+        return LinkResult(url, "dead", status)
+    if status == 429 or status >= 500:
+        return LinkResult(url, "unknown", status, detail="temporary error")
+    return LinkResult(url, "unknown", status, detail="inconclusive status")
+
+
+def _is_cacheable(result: LinkResult) -> bool:
+    return result.verdict == "ok" or (result.verdict == "dead" and result.status in _DEFINITE_DEAD)
+
+
+_resolver: ThreadPoolExecutor | None = None
+_resolver_lock = threading.Lock()
+
+
+def _get_resolver() -> ThreadPoolExecutor:
+    global _resolver  # noqa: PLW0603
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = ThreadPoolExecutor(max_workers=_RESOLVER_WORKERS, thread_name_prefix="link-dns")
+        return _resolver
+
+
+def _host_problem(host: str | None, timeout: float) -> str | None:
+    """Почему хост нельзя запрашивать: не резолвится или есть непубличный адрес; None — можно.
+
+    Резолв ждём не дольше `timeout` секунд; по таймауту хост считается
+    неразрешённым (ссылка получит вердикт unknown).
+    """
+    if not host:
+        return "no host"
+    fut = _get_resolver().submit(socket.getaddrinfo, host, None, proto=socket.IPPROTO_TCP)
+    try:
+        infos = fut.result(timeout=timeout)
+    except FuturesTimeout:
+        fut.cancel()
+        return f"dns timeout: {host}"
+    except (OSError, UnicodeError):
+        return f"unresolvable host: {host}"
+    addrs = {info[4][0].split("%", maxsplit=1)[0] for info in infos}
+    if not addrs or not all(ipaddress.ip_address(a).is_global for a in addrs):
+        return f"non-public host: {host}"
+    return None
+
+
+class _BlockedHostError(requests.RequestException):
+    """Ссылка (или редирект) ведёт на хост, который не резолвится или непубличен."""
+
+
+def _request(session: requests.Session, method: str, url: str, timeout: float) -> int:
+    """Запрос с ручным проходом редиректов; каждый хост проверяется `_host_problem`."""
+    for _ in range(_MAX_REDIRECTS + 1):
+        problem = _host_problem(urlsplit(url).hostname, timeout)
+        if problem:
+            raise _BlockedHostError(problem)
+        resp = session.request(method, url, allow_redirects=False, timeout=timeout, stream=True)
+        status, location = resp.status_code, resp.headers.get("Location")
+        resp.close()
+        if not (resp.is_redirect and location):
+            return status
+        url = urljoin(url, location)
+    raise requests.TooManyRedirects(f"more than {_MAX_REDIRECTS} redirects")
+
+
+def _probe(session: requests.Session, url: str, timeout: float) -> LinkResult:
+    """HEAD, а при отказе — GET со `stream=True` (тело не скачиваем)."""
+    try:
+        status = _request(session, "HEAD", url, timeout)
+        if status < 400:
+            return _classify_status(url, status)
+        return _classify_status(url, _request(session, "GET", url, timeout))
+    except _BlockedHostError as e:
+        return LinkResult(url, "unknown", detail=str(e))
+    except requests.Timeout:
+        return LinkResult(url, "unknown", detail="timeout")
+    except requests.ConnectionError as e:
+        return LinkResult(url, "unknown", detail=f"connection error: {e.__class__.__name__}")
+    except requests.RequestException as e:
+        return LinkResult(url, "unknown", detail=str(e))
+
+
+def check_links(urls: list[str], *, concurrency: int | None = None) -> list[LinkResult]:
+    """Проверяет ссылки параллельно; порядок результатов совпадает с `urls`.
+
+    Время проверки ≈ время самого медленного запроса (пока ссылок не больше
+    `concurrency` и хосты не упираются в `LINK_CHECK_PER_HOST`).
+    """
+    if not urls:
+        return []
+    cache = get_link_cache()
+    results: list[LinkResult | None] = [cache.get(u) if cache is not None else None for u in urls]
+    misses = [i for i, r in enumerate(results) if r is None]
+    t0 = time.perf_counter()
+    if misses:
+        workers = max(1, min(concurrency or Config.LINK_CHECK_CONCURRENCY, len(misses)))
+        per_host = max(1, Config.LINK_CHECK_PER_HOST)
+        host_slots: dict[str, threading.Semaphore] = {}
+        for i in misses:
+            host_slots.setdefault(urlsplit(urls[i]).hostname or "", threading.Semaphore(per_host))
+        session = _make_session(workers)
+
+        def _run(url: str) -> LinkResult:
+            with host_slots[urlsplit(url).hostname or ""]:
+                return _probe(session, url, http_timeout(Config.LINK_CHECK_TIMEOUT_SEC))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for i, res in zip(misses, pool.map(bound(_run), [urls[i] for i in misses])):
+                    results[i] = res
+                    if cache is not None and _is_cacheable(res):
+                        cache.put(res)
+        finally:
+            session.close()
+    final = [r if r is not None else LinkResult(u, "unknown") for u, r in zip(urls, results)]
+    counts: dict[str, int] = {}
+    for r in final:
+        counts[r.verdict] = counts.get(r.verdict, 0) + 1
+    logging.info(
+        "Links: %d checked (%d cached) in %.0f ms %s",
+        len(final),
+        len(urls) - len(misses),
+        (time.perf_counter() - t0) * 1000.0,
+        counts,
+    )
+    return final
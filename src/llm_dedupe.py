@@ -10,6 +10,7 @@ from __future__ import annotations
 from collections.abc import Iterable
 
 from .config import Config
+from .llm_router import chat_completion
 
 
 def _openai_client():
@@ -31,6 +32,8 @@ def llm_is_duplicate(
 ) -> bool | None:
     """Проверяет, является ли `candidate_title` по смыслу дубликатом одного из `recent_titles`.
 
+    Модель берётся из маршрута задачи `dedup`; явный `model` его переопределяет.
+
     Возвращает:
     - True — явный дубликат по мнению LLM
     - False — не дубликат по мнению LLM
@@ -44,9 +47,6 @@ def llm_is_duplicate(
     if not titles:
         return False
 
-    if model is None:
-        model = Config.OPENAI_MODEL
-
     # Форматируем до разумного лимита, чтобы не раздувать промпт
     max_list = 40
     listed = "\n".join(f"- {t}" for t in titles[:max_list])
@@ -61,14 +61,14 @@ def llm_is_duplicate(
     )
 
     try:
-        kwargs = {
-            "model": model,
-            "messages": [{"role": "system", "content": system}, {"role": "user", "content": user}],
-            "max_tokens": 2,
-        }
-        if ("gpt-5" not in model) and ("thinking" not in model):
-            kwargs["temperature"] = 0.0
-        resp = client.chat.completions.create(**kwargs)
+        resp = chat_completion(
+            client,
+            "dedup",
+            [{"role": "system", "content": system}, {"role": "user", "content": user}],
+            temperature=0.0,
+            model=model,
+            max_tokens=2,
+        )
         answer = (resp.choices[0].message.content or "").strip().lower()
         if answer.startswith("y"):
             return True
@@ -0,0 +1,145 @@
+"""Маршрутизация LLM‑вызовов по задачам с фоллбеком по задержке.
+
+Каждая задача (dedup, title, article, length_fit, repair) получает свою модель
+из таблицы `OPENAI_MODEL_ROUTES`; по умолчанию — `Config.OPENAI_MODEL`. Если
+настроен `OPENAI_FALLBACK_MODEL`, вызов основной модели ограничивается бюджетом
+задержки задачи: при превышении запрос повторяется на быстрой модели, а основная
+модель помечается «медленной» и на время `OPENAI_SLOW_COOLDOWN_SEC` пропускается.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any
+
+from .config import Config, parse_mapping
+from .deadline import DeadlineExceeded, check, http_timeout, remaining
+
+# Таймаут OpenAI SDK по умолчанию (сек) — верхняя граница, которую урезает бюджет узла графа
+_SDK_TIMEOUT = 600.0
+
+# Бюджеты задержки по умолчанию (сек) — короткие задачи не должны ждать тяжёлую модель
+DEFAULT_LATENCY_BUDGETS: dict[str, float] = {
+    "dedup": 5.0,
+    "title": 10.0,
+    "repair": 60.0,
+    "length_fit": 120.0,
+    "article": 180.0,
+}
+
+_slow_until: dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def model_for(task: str) -> str:
+    """Возвращает модель для задачи по таблице маршрутов (или модель по умолчанию)."""
+    return parse_mapping(Config.OPENAI_MODEL_ROUTES).get(task, Config.OPENAI_MODEL)
+
+
+def latency_budget(task: str) -> float:
+    """Бюджет задержки задачи в секундах: из `OPENAI_LATENCY_BUDGETS` или по умолчанию."""
+    raw = parse_mapping(Config.OPENAI_LATENCY_BUDGETS).get(task)
+    try:
+        return float(raw) if raw else DEFAULT_LATENCY_BUDGETS.get(task, 60.0)
+    except ValueError:
+        return DEFAULT_LATENCY_BUDGETS.get(task, 60.0)
+
+
+def supports_temperature(model: str) -> bool:
+    """Reasoning‑модели (gpt-5, *thinking*) не принимают temperature."""
+    return ("gpt-5" not in model) and ("thinking" not in model)
+
+
+def _is_slow(model: str) -> bool:
+    with _lock:
+        return _slow_until.get(model, 0.0) > time.monotonic()
+
+
+def _mark_slow(model: str) -> None:
+    with _lock:
+        _slow_until[model] = time.monotonic() + Config.OPENAI_SLOW_COOLDOWN_SEC
+
+
+def _timeout_errors() -> tuple[type[BaseException], ...]:
+    try:
+        from openai import APITimeoutError
+
+        return (APITimeoutError, TimeoutError)
+    except Exception:
+        return (TimeoutError,)
+
+
+def chat_completion(
+    client,
+    task: str,
+    messages: list[dict[str, Any]],
+    *,
+    temperature: float | None = None,
+    model: str | None = None,
+    **extra: Any,
+):
+    """Chat Completions с маршрутизацией по задаче и фоллбеком на быструю модель.
+
+    `model` явно переопределяет маршрут. Возвращает ответ SDK как есть; ошибки,
+    не связанные с таймаутом, поднимаются вызывающей стороне.
+    """
+    primary = model or model_for(task)
+    fallback = Config.OPENAI_FALLBACK_MODEL
+    if remaining() is not None:
+        # Внутри узла с бюджетом: без повторов SDK и не дольше оставшегося времени узла
+        client = client.with_options(timeout=http_timeout(_SDK_TIMEOUT), max_retries=0)
+    if not fallback or fallback == primary:
+        return _create_within_deadline(client, primary, messages, temperature, extra)
+
+    budget = latency_budget(task)
+    if not _is_slow(primary):
+        t0 = time.perf_counter()
+        timeout = http_timeout(budget)
+        try:
+            # Без повторов SDK: бюджет — это предел ожидания основной модели
+            fast_client = client.with_options(timeout=timeout, max_retries=0)
+            return _create(fast_client, primary, messages, temperature, extra)
+        except _timeout_errors():
+            # Таймаут урезан бюджетом узла — виноват срок узла, а не модель: не помечаем её медленной
+            check()
+            if timeout < budget:
+                raise DeadlineExceeded(f"LLM {task}: node budget exhausted") from None
+            _mark_slow(primary)
+            logging.warning(
+                "LLM %s: %s exceeded %.0fs budget (%.1fs), falling back to %s",
+                task,
+                primary,
+                budget,
+                time.perf_counter() - t0,
+                fallback,
+            )
+    else:
+        logging.info("LLM %s: %s marked slow, using %s", task, primary, fallback)
+    return _create_within_deadline(client, fallback, messages, temperature, extra)
+
+
+def _create_within_deadline(
+    client,
+    model: str,
+    messages: list[dict[str, Any]],
+    temperature: float | None,
+    extra: dict[str, Any],
+):
+    """`_create`, но таймаут SDK после исчерпания бюджета узла поднимается как `DeadlineExceeded`."""
+    try:
+        return _create(client, model, messages, temperature, extra)
+    except _timeout_errors():
+        check()
+        left = remaining()
+        if left is not None and left < 1.0:
+            raise DeadlineExceeded(f"LLM {model}: node budget exhausted") from None
+        raise
+
+
+def _create(client, model: str, messages: list[dict[str, Any]], temperature: float | None, extra: dict[str, Any]):
+    kwargs: dict[str, Any] = {"model": model, "messages": messages, **extra}
+    if temperature is not None and supports_temperature(model):
+        kwargs["temperature"] = temperature
+    return client.chat.completions.create(**kwargs)
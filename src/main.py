@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
+import json
 import logging
 
 import typer
 
-from .agent.graph import AgentContext, run_publication_once
+from .agent.graph import AgentContext, resume_publication, run_publication_batch, run_publication_once
 from .analytics_reporter import send_weekly_report
 from .config import Config
+from .query_planner import get_query_planner
 
 app = typer.Typer(help="DailyDevDigestAi — публикация статей и отчёты")
 
@@ -61,6 +63,51 @@ def daily() -> None:
         pass
 
 
+@app.command()
+def resume(
+    run_id: str | None = typer.Option(None, "--run-id", help="Идентификатор прогона (по умолчанию — последний)"),
+) -> None:
+    """Продолжает незавершённый прогон с последнего выполненного узла (контрольные точки в CACHE_DIR)."""
+    setup_logging()
+    Config.ensure_dirs()
+    ctx = resume_publication(run_id)
+    if ctx is None:
+        logging.info("Нет контрольной точки для продолжения%s", f" (run_id={run_id})" if run_id else "")
+        return
+    try:
+        posts = (ctx.publish_result or {}).get("posts", [])
+        p = posts[0] if posts else {}
+        logging.info(
+            "Опубликовано/запланировано: id=%s title=%s status=%s feature_image=%s",
+            p.get("id"),
+            p.get("title"),
+            p.get("status"),
+            p.get("feature_image"),
+        )
+    except Exception:
+        pass
+
+
+@app.command()
+def batch(
+    count: int = typer.Option(7, "--count", "-n", min=1, help="Сколько статей подготовить (слоты 11:00 подряд)"),
+) -> None:
+    """Пакетный режим: N различных тем за один сбор, конвейер генерации/проверки/обложек/публикации."""
+    setup_logging()
+    Config.ensure_dirs()
+    for ctx in run_publication_batch(count):
+        posts = (ctx.publish_result or {}).get("posts", [])
+        p = posts[0] if posts else {}
+        logging.info(
+            "Пакет: слот=%s title=%s id=%s status=%s%s",
+            ctx.publish_at,
+            ctx.title,
+            p.get("id"),
+            p.get("status"),
+            "" if posts else f" (не опубликовано, run_id={ctx.run_id})",
+        )
+
+
 @app.command()
 def weekly() -> None:
     setup_logging()
@@ -71,5 +118,15 @@ def weekly() -> None:
         logging.error("Ошибка отправки отчёта: %s", e)
 
 
+@app.command("query-stats")
+def query_stats() -> None:
+    """Статистика планировщика запросов CSE: успешность форм запросов и медиана запросов на подтверждение."""
+    planner = get_query_planner()
+    if planner is None:
+        typer.echo("Планировщик запросов выключен (QUERY_PLANNER_ENABLED=0)")
+        return
+    typer.echo(json.dumps(planner.stats(), ensure_ascii=False, indent=2))
+
+
 if __name__ == "__main__":
     app()
@@ -3,11 +3,25 @@
 from __future__ import annotations
 
 import datetime as dt
+import logging
 
 import pytz
 
 from .config import Config
-from .ghost_utils import ghost_admin_base, publish_html_post, upload_image_bytes
+from .ghost_utils import fetch_posts, ghost_admin_base, publish_html_post, upload_image_bytes
+
+# Внутренний тег Ghost (начинается с `#`, на сайте не виден) с id прогона — по нему
+# пост прогона находится повторно, если ответ на создание потерян (таймаут, сбой)
+_RUN_TAG_PREFIX = "#run-"
+
+
+def slot_msk_11(day_offset: int = 0) -> dt.datetime:
+    """Слот публикации: ближайшие 11:00 (`APP_TIMEZONE`, по умолчанию МСК) плюс `day_offset` дней."""
+    tz = pytz.timezone(Config.APP_TIMEZONE or "Europe/Moscow")
+    now = dt.datetime.now(tz)
+    day = now.date() if now.hour < 11 else now.date() + dt.timedelta(days=1)
+    # локализуем дату слота, а не прибавляем сутки к aware‑времени — 11:00 сохраняется при переходе на летнее время
+    return tz.localize(dt.datetime.combine(day + dt.timedelta(days=max(0, day_offset)), dt.time(11)))
 
 
 class GhostPublisher:
@@ -20,6 +34,21 @@ class GhostPublisher:
             raise RuntimeError("Не настроен Ghost Admin API")
         self.base = ghost_admin_base()
 
+    def find_run_post(self, run_id: str) -> dict | None:
+        """Пост, уже созданный прогоном `run_id` (по внутреннему тегу), или None.
+
+        Ошибки запроса не скрываются: не зная, есть ли пост, публиковать повторно нельзя.
+        """
+        # Ghost превращает `#` в начале имени тега в префикс `hash-` слага
+        slug = "hash-" + f"{_RUN_TAG_PREFIX}{run_id}".lstrip("#").lower()
+        posts = fetch_posts(
+            filter=f"tag:{slug}+status:[draft,scheduled,published]",
+            fields="id,title,slug,status,published_at,feature_image",
+            limit=1,
+            timeout=30,
+        )
+        return posts[0] if posts else None
+
     def publish(
         self,
         title: str,
@@ -27,35 +56,44 @@ class GhostPublisher:
         tags: list[str],
         feature_image_bytes: bytes | None,
         schedule_msk_11: bool = True,
+        *,
+        feature_image_url: str | None = None,
+        publish_at: dt.datetime | None = None,
+        run_id: str | None = None,
     ) -> dict:
         """Публикует/планирует HTML‑пост в Ghost.
 
         - Ограничивает длину заголовка до 255 символов
-        - Загружает feature image при наличии
+        - Загружает feature image при наличии (если не передан уже загруженный `feature_image_url`)
         - При `schedule_msk_11=True` планирует публикацию на 11:00 МСК ближайшего дня
+          или на заданный слот `publish_at` (пакетный режим); прошедший слот заменяется ближайшим
+        - С `run_id` помечает пост внутренним тегом прогона (см. `find_run_post`)
         """
         # Нормализация заголовка под ограничения Ghost (<=255 символов)
         safe_title = (title or "").strip()
         if len(safe_title) > 255:
             safe_title = safe_title[:252].rstrip() + "..."
 
-        feature_image = None
-        if feature_image_bytes:
+        feature_image = feature_image_url
+        if not feature_image and feature_image_bytes:
             feature_image = upload_image_bytes(feature_image_bytes)
 
         status = "published"
         published_at = None
         if schedule_msk_11:
-            tz = pytz.timezone(Config.APP_TIMEZONE or "Europe/Moscow")
-            now = dt.datetime.now(tz)
-            scheduled = now.replace(hour=11, minute=0, second=0, microsecond=0)
-            if now >= scheduled:
-                scheduled = scheduled + dt.timedelta(days=1)
+            scheduled = slot_msk_11()
+            if publish_at is not None:
+                if publish_at > dt.datetime.now(pytz.utc):
+                    scheduled = publish_at
+                else:
+                    logging.warning("Publish slot %s already passed, using %s", publish_at.isoformat(), scheduled)
             published_at = scheduled.astimezone(pytz.utc).isoformat()
             status = "scheduled"
 
         # Нормализуем теги и публикуем через общий util
         uniq_tags: list[str] = list({*(tags or []), "AI Generated"})
+        if run_id:
+            uniq_tags.append(f"{_RUN_TAG_PREFIX}{run_id}")
         return publish_html_post(
             title=safe_title,
             html=html,
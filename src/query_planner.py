@@ -0,0 +1,116 @@
+"""Планировщик запросов CSE по накопленной статистике «форм» запросов.
+
+Каждый запрос из `_build_search_queries` имеет форму: `full` (тема целиком),
+`pair` (токен с дефисом/слешем), `head` (ведущий токен), `quoted` (точная
+фраза), `site_github`, `combo`. Для каждой формы ведётся счёт попыток и
+подтверждений (JSON‑журнал `query_stats.json` в `CACHE_DIR`), а также число
+живых запросов CSE, потраченных на каждое подтверждение (ответы из кэша
+подтверждений не считаются).
+
+План: формы упорядочиваются по сглаженной вероятности успеха
+`(hits + 1) / (tries + 2)` (без данных — исходный порядок), формы с
+достаточной историей и вероятностью ниже `QUERY_PLANNER_PRUNE_BELOW`
+отбрасываются. С вероятностью `QUERY_PLANNER_EXPLORE` отброшенная форма всё же
+ставится в конец плана, чтобы статистика по ней не застывала.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import random
+import statistics
+import threading
+from pathlib import Path
+
+from .config import Config
+
+_MAX_SPENT_HISTORY = 200
+
+
+class QueryPlanner:
+    """Статистика по формам запросов и построение плана."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._shapes: dict[str, dict[str, int]] = {}
+        self._spent: list[int] = []
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self._shapes = {k: {"tries": int(v["tries"]), "hits": int(v["hits"])} for k, v in data["shapes"].items()}
+            self._spent = [int(x) for x in data.get("spent", [])][-_MAX_SPENT_HISTORY:]
+        except Exception:
+            self._shapes, self._spent = {}, []
+
+    def score(self, shape: str) -> float:
+        s = self._shapes.get(shape, {})
+        return (s.get("hits", 0) + 1) / (s.get("tries", 0) + 2)
+
+    def _pruned(self, shape: str) -> bool:
+        tries = self._shapes.get(shape, {}).get("tries", 0)
+        return tries >= Config.QUERY_PLANNER_MIN_TRIES and self.score(shape) < Config.QUERY_PLANNER_PRUNE_BELOW
+
+    def plan(self, shaped: list[tuple[str, str]]) -> list[str]:
+        """Упорядочивает/прореживает пары (форма, запрос); хотя бы один запрос остаётся."""
+        with self._lock:
+            ranked = sorted(enumerate(shaped), key=lambda it: (-self.score(it[1][0]), it[0]))
+            kept = [q for _, (shape, q) in ranked if not self._pruned(shape)]
+            dropped = [q for _, (shape, q) in ranked if self._pruned(shape)]
+        if dropped and (not kept or random.random() < Config.QUERY_PLANNER_EXPLORE):
+            kept.append(dropped[0])
+        return kept
+
+    def record(self, shapes: dict[str, str], outcomes: dict[str, bool], spent: int, confirmed: bool) -> None:
+        """Учитывает ответы CSE (запрос → были ли результаты) и расход запросов на подтверждение.
+
+        В `outcomes` и `spent` — только живые запросы: ответы из кэша подтверждений
+        ничего не говорят о расходе квоты. Подтверждение целиком из кэша (`spent == 0`)
+        в историю расхода не пишется.
+        """
+        if not outcomes and not (confirmed and spent > 0):
+            return
+        with self._lock:
+            for q, hit in outcomes.items():
+                shape = shapes.get(q)
+                if shape is None:
+                    continue
+                s = self._shapes.setdefault(shape, {"tries": 0, "hits": 0})
+                s["tries"] += 1
+                s["hits"] += int(hit)
+            if confirmed and spent > 0:
+                self._spent = [*self._spent, spent][-_MAX_SPENT_HISTORY:]
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text(json.dumps({"shapes": self._shapes, "spent": self._spent}), encoding="utf-8")
+            except Exception as e:
+                logging.warning("Query planner stats write failed: %s", e)
+
+    def stats(self) -> dict:
+        """Сводка: попытки/подтверждения/вероятность по формам и медиана запросов на подтверждение."""
+        with self._lock:
+            shapes = {
+                k: {"tries": v["tries"], "hits": v["hits"], "rate": round(self.score(k), 3), "pruned": self._pruned(k)}
+                for k, v in sorted(self._shapes.items(), key=lambda kv: -self.score(kv[0]))
+            }
+            spent = list(self._spent)
+        return {
+            "shapes": shapes,
+            "confirmations": len(spent),
+            "median_queries_per_confirmation": statistics.median(spent) if spent else None,
+        }
+
+
+_planner: QueryPlanner | None = None
+_planner_lock = threading.Lock()
+
+
+def get_query_planner() -> QueryPlanner | None:
+    """Общий планировщик (создаётся лениво); None, если выключен."""
+    global _planner  # noqa: PLW0603
+    if not Config.QUERY_PLANNER_ENABLED:
+        return None
+    with _planner_lock:
+        if _planner is None:
+            _planner = QueryPlanner(Config.CACHE_DIR / "query_stats.json")
+        return _planner
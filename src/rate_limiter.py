@@ -0,0 +1,183 @@
+"""Ограничитель частоты внешних запросов: token bucket по хостам + дневной лимит.
+
+- Для каждого хоста из `RATE_LIMITS` (формат `host=N/сек`) ведётся свой
+  token bucket. Если токена нет, вызов ждёт не дольше `RATE_LIMIT_MAX_WAIT_SEC`,
+  иначе отказывает — вызывающая сторона переходит к следующему провайдеру.
+- Дневные квоты (`DAILY_QUOTAS`, формат `host=N`) учитываются в файле-журнале
+  `quota.json` в `CACHE_DIR`, поэтому переживают перезапуски. Сутки считаются в
+  часовом поясе `QUOTA_TIMEZONE` (у Google CSE сброс в полночь по Тихоокеанскому).
+- Ответы 429/403 с `Retry-After`/`X-RateLimit-Reset` блокируют хост до указанного
+  времени, чтобы не добивать лимит повторными запросами.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+import pytz
+import requests
+
+from .config import Config, parse_mapping
+
+
+class RateLimitExceeded(RuntimeError):
+    """Запрос не выполнен: хост у предела частоты или дневной квоты."""
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: `capacity` токенов, пополнение `rate` в секунду."""
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self.capacity = max(1.0, capacity)
+        self.rate = rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def block_until(self, until: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, until)
+            self._tokens = 0.0
+
+    def acquire(self, max_wait: float) -> bool:
+        """Забирает токен, подождав не дольше `max_wait` секунд; False — если не успели."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                ready_at = max(self._blocked_until, now + (1.0 - self._tokens) / self.rate if self.rate > 0 else 1e18)
+            if ready_at > deadline:
+                return False
+            time.sleep(max(0.0, ready_at - time.monotonic()))
+
+
+class QuotaLedger:
+    """Дневной журнал израсходованных запросов по хостам (JSON‑файл)."""
+
+    def __init__(self, path: Path, timezone: str) -> None:
+        self.path = path
+        self.tz = pytz.timezone(timezone)
+        self._lock = threading.Lock()
+        self._data: dict[str, dict[str, int]] = {}
+        try:
+            self._data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            self._data = {}
+
+    def _today(self) -> str:
+        return dt.datetime.now(self.tz).strftime("%Y-%m-%d")
+
+    def used(self, host: str) -> int:
+        with self._lock:
+            return int(self._data.get(self._today(), {}).get(host, 0))
+
+    def try_spend(self, host: str, limit: int) -> bool:
+        """Учитывает запрос, если дневной лимит ещё не исчерпан."""
+        with self._lock:
+            today = self._today()
+            day = self._data.setdefault(today, {})
+            if day.get(host, 0) >= limit:
+                return False
+            day[host] = day.get(host, 0) + 1
+            # Храним только текущие сутки
+            self._data = {today: day}
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text(json.dumps(self._data), encoding="utf-8")
+            except Exception as e:
+                logging.warning("Quota ledger write failed: %s", e)
+            return True
+
+
+class RateLimiter:
+    """Ограничитель по хостам: token bucket + дневная квота."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, TokenBucket] = {}
+        for host, spec in parse_mapping(Config.RATE_LIMITS).items():
+            try:
+                count, _, per = spec.partition("/")
+                n, seconds = float(count), float(per or 1)
+                self._buckets[host] = TokenBucket(capacity=n, rate=n / seconds)
+            except ValueError:
+                logging.warning("Bad RATE_LIMITS entry for %s: %s", host, spec)
+        self._quotas = {h: int(v) for h, v in parse_mapping(Config.DAILY_QUOTAS).items() if v.isdigit()}
+        self._ledger = QuotaLedger(Config.CACHE_DIR / "quota.json", Config.QUOTA_TIMEZONE)
+
+    def acquire(self, host: str, *, max_wait: float | None = None) -> None:
+        """Резервирует запрос к хосту или поднимает `RateLimitExceeded`."""
+        limit = self._quotas.get(host)
+        if limit is not None and self._ledger.used(host) >= limit:
+            raise RateLimitExceeded(f"{host}: daily quota {limit} exhausted")
+        bucket = self._buckets.get(host)
+        wait_sec = Config.RATE_LIMIT_MAX_WAIT_SEC if max_wait is None else max_wait
+        if bucket is not None and not bucket.acquire(wait_sec):
+            raise RateLimitExceeded(f"{host}: rate limit")
+        if limit is not None and not self._ledger.try_spend(host, limit):
+            raise RateLimitExceeded(f"{host}: daily quota {limit} exhausted")
+
+    def remaining(self, host: str) -> int | None:
+        """Сколько запросов к хосту осталось на сегодня; None — дневной квоты нет."""
+        limit = self._quotas.get(host)
+        return None if limit is None else max(0, limit - self._ledger.used(host))
+
+    def note_response(self, host: str, resp: requests.Response) -> None:
+        """Учитывает 429/403 от хоста: блокирует bucket до Retry-After/X-RateLimit-Reset."""
+        if resp.status_code not in (403, 429):
+            return
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            return
+        wait_sec = 60.0
+        retry_after = resp.headers.get("Retry-After")
+        reset = resp.headers.get("X-RateLimit-Reset")
+        try:
+            if retry_after:
+                wait_sec = float(retry_after)
+            elif reset:
+                wait_sec = max(0.0, float(reset) - time.time())
+        except ValueError:
+            pass
+        if resp.status_code == 403 and not (retry_after or resp.headers.get("X-RateLimit-Remaining") == "0"):
+            # 403 без признаков лимита — ошибка доступа, а не частоты
+            return
+        logging.warning("Rate limited by %s: pausing for %.0fs", host, wait_sec)
+        bucket.block_until(time.monotonic() + wait_sec)
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter  # noqa: PLW0603
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def limited_get(url: str, **kwargs: Any) -> requests.Response:
+    """`requests.get` через общий ограничитель хоста; может поднять `RateLimitExceeded`."""
+    host = urlsplit(url).hostname or ""
+    limiter = get_rate_limiter()
+    limiter.acquire(host)
+    resp = requests.get(url, **kwargs)
+    limiter.note_response(host, resp)
+    return resp
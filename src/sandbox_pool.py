@@ -0,0 +1,261 @@
+"""Локальная песочница Python: пул заранее запущенных изолированных процессов.
+
+Каждый воркер — отдельный интерпретатор (`python -I -S`), запущенный заранее и
+ожидающий код в stdin, поэтому стоимость старта оплачивается вне критического
+пути. Один воркер исполняет ровно один сниппет и завершается; пул сразу
+поднимает замену в фоне.
+
+Бэкенд включается только явно (`SANDBOX_PROVIDER=local`) и только при наличии
+bubblewrap (`SANDBOX_BWRAP`): без изоляции пул не создаётся, и сниппеты
+пропускаются. Ограничения воркера:
+
+- bubblewrap: новые user/pid/ipc/uts/net namespace (сети нет вовсе), uid/gid
+  nobody, сброшенные capabilities, чистое окружение; файловая система — только
+  системные каталоги и установка Python на чтение, `/tmp` и рабочий каталог —
+  пустые tmpfs/временная директория. Каталог проекта, `.env` и домашний каталог
+  внутрь не монтируются;
+- rlimits на CPU, адресное пространство, размер файлов, число дескрипторов и
+  `RLIMIT_NPROC=0` (ни fork, ни потоков) — их ставит сам загрузчик воркера до
+  чтения сниппета (без `preexec_fn`, который небезопасен в многопоточном родителе);
+- своя сессия (`start_new_session`) и таймаут по wall‑clock с убийством группы
+  процессов;
+- дополнительно импорт `_socket`/`socket` запрещён import‑хуком.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from .config import Config
+
+# Код загрузчика воркера: ставит себе rlimits (argv: CPU‑секунды, МБ памяти), запрещает импорт
+# сетевых модулей и исполняет сниппет из stdin как __main__
+_BOOTSTRAP = r"""
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+if resource is not None:
+    _cpu, _mem = int(sys.argv[1]), int(sys.argv[2]) * 1024 * 1024
+    for _res, _value in (
+        (resource.RLIMIT_CPU, _cpu),
+        (resource.RLIMIT_AS, _mem),
+        (resource.RLIMIT_FSIZE, 1024 * 1024),
+        (resource.RLIMIT_NOFILE, 64),
+        (resource.RLIMIT_CORE, 0),
+        (resource.RLIMIT_NPROC, 0),
+    ):
+        try:
+            resource.setrlimit(_res, (_value, _value))
+        except (ValueError, OSError):
+            pass
+sys.argv = ["main.py"]
+
+_BLOCKED = frozenset({"_socket", "socket", "_ssl", "ssl"})
+
+class _NoNetFinder:
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        if name.split(".", 1)[0] in _BLOCKED:
+            raise ImportError(f"module {name!r} is disabled in sandbox (no network)")
+        return None
+
+for _name in list(sys.modules):
+    if _name.split(".", 1)[0] in _BLOCKED:
+        del sys.modules[_name]
+sys.meta_path.insert(0, _NoNetFinder())
+code = sys.stdin.read()
+exec(compile(code, "main.py", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+"""
+
+_MAX_OUTPUT = 4000
+# uid/gid nobody внутри user namespace
+_NOBODY = "65534"
+# Что монтируется в песочницу на чтение (если есть): системные библиотеки и интерпретатор
+_RO_PATHS = ("/usr", "/bin", "/lib", "/lib64", "/etc/alternatives", "/etc/ld.so.cache")
+
+
+def _bwrap_command(cwd: str, cpu_sec: int, memory_mb: int) -> list[str]:
+    """Команда запуска воркера в bubblewrap; RuntimeError, если bwrap не найден."""
+    bwrap = shutil.which(Config.SANDBOX_BWRAP)
+    if bwrap is None:
+        raise RuntimeError(f"local sandbox needs bubblewrap ({Config.SANDBOX_BWRAP!r} not found)")
+    python = os.path.realpath(sys.executable)
+    cmd = [
+        bwrap,
+        "--unshare-all",
+        "--unshare-user",
+        "--die-with-parent",
+        "--new-session",
+        "--cap-drop",
+        "ALL",
+        "--uid",
+        _NOBODY,
+        "--gid",
+        _NOBODY,
+        "--clearenv",
+        "--setenv",
+        "PATH",
+        "/usr/bin:/bin",
+        "--setenv",
+        "PYTHONIOENCODING",
+        "utf-8",
+        "--setenv",
+        "PYTHONDONTWRITEBYTECODE",
+        "1",
+        "--proc",
+        "/proc",
+        "--dev",
+        "/dev",
+        "--tmpfs",
+        "/tmp",
+    ]
+    for path in sorted({*_RO_PATHS, sys.base_prefix, os.path.dirname(python)}):
+        if os.path.exists(path):
+            cmd += ["--ro-bind", path, path]
+    cmd += ["--bind", cwd, "/work", "--chdir", "/work"]
+    return [*cmd, "--", python, "-I", "-S", "-c", _BOOTSTRAP, str(cpu_sec), str(memory_mb)]
+
+
+@dataclass
+class _Worker:
+    proc: subprocess.Popen
+    cwd: str
+
+
+class LocalSandboxPool:
+    """Пул предзапущенных ограниченных процессов для исполнения сниппетов."""
+
+    def __init__(
+        self,
+        size: int,
+        *,
+        cpu_sec: int = 2,
+        memory_mb: int = 256,
+        wall_sec: float = 5.0,
+    ) -> None:
+        self.size = max(1, size)
+        self.cpu_sec = cpu_sec
+        self.memory_mb = memory_mb
+        self.wall_sec = wall_sec
+        self._ready: queue.Queue[_Worker] = queue.Queue()
+        self._closed = False
+        for _ in range(self.size):
+            self._ready.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        cwd = tempfile.mkdtemp(prefix="ddd-sandbox-")
+        try:
+            proc = subprocess.Popen(
+                _bwrap_command(cwd, self.cpu_sec, self.memory_mb),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=cwd,
+                env={},
+                start_new_session=True,
+            )
+        except Exception:
+            shutil.rmtree(cwd, ignore_errors=True)
+            raise
+        return _Worker(proc=proc, cwd=cwd)
+
+    def _replenish(self) -> None:
+        if self._closed:
+            return
+        try:
+            self._ready.put(self._spawn())
+        except Exception as e:
+            logging.warning("Sandbox pool: spawn failed: %s", e)
+
+    def _acquire(self) -> _Worker:
+        try:
+            worker = self._ready.get_nowait()
+        except queue.Empty:
+            worker = self._spawn()
+        # Замена поднимается в фоне, пока текущий воркер исполняет код
+        threading.Thread(target=self._replenish, daemon=True).start()
+        return worker
+
+    @staticmethod
+    def _discard(worker: _Worker) -> None:
+        if worker.proc.poll() is None:
+            try:
+                os.killpg(worker.proc.pid, signal.SIGKILL)
+            except Exception:
+                worker.proc.kill()
+            worker.proc.wait()
+        shutil.rmtree(worker.cwd, ignore_errors=True)
+
+    def run(self, code: str) -> tuple[bool, str]:
+        """Исполняет сниппет в отдельном воркере, возвращает (ok, вывод)."""
+        worker = self._acquire()
+        try:
+            out, _ = worker.proc.communicate(code.encode("utf-8"), timeout=self.wall_sec)
+            text = out.decode("utf-8", errors="replace").strip()[:_MAX_OUTPUT]
+            rc = worker.proc.returncode
+            if rc is not None and rc < 0:
+                text = (text + f"\nkilled by signal {-rc}").strip()
+            return rc == 0, text
+        except subprocess.TimeoutExpired:
+            return False, f"timeout after {self.wall_sec:.0f}s"
+        except Exception as e:
+            return False, str(e)
+        finally:
+            self._discard(worker)
+
+    def run_many(self, codes: list[str]) -> list[tuple[bool, str]]:
+        """Исполняет сниппеты параллельно (не больше `size` одновременно), порядок сохраняется."""
+        if not codes:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.size, len(codes))) as pool:
+            return list(pool.map(self.run, codes))
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._ready.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool: LocalSandboxPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_local_pool() -> LocalSandboxPool:
+    """Возвращает общий пул (создаётся лениво по настройкам `Config`).
+
+    RuntimeError — изоляция недоступна (нет bubblewrap или он не смог запустить
+    воркер): локальный бэкенд не работает без неё.
+    """
+    global _pool  # noqa: PLW0603
+    with _pool_lock:
+        if _pool is None:
+            pool = LocalSandboxPool(
+                Config.SANDBOX_POOL_SIZE,
+                cpu_sec=Config.SANDBOX_CPU_SEC,
+                memory_mb=Config.SANDBOX_MEMORY_MB,
+                wall_sec=Config.SANDBOX_WALL_SEC,
+            )
+            ok, out = pool.run("print('ok')")
+            if not ok or out != "ok":
+                pool.close()
+                raise RuntimeError(f"local sandbox isolation unavailable: {out[:200]}")
+            _pool = pool
+            atexit.register(_pool.close)
+        return _pool
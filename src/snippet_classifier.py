@@ -0,0 +1,292 @@
+"""Статическая классификация Python‑сниппетов перед отправкой в песочницу.
+
+По AST сниппет относится к одному из классов:
+
+- `definition` — только импорты стандартной библиотеки, определения функций и
+  классов без кода, исполняемого при определении (декораторы, вызовы в
+  значениях по умолчанию, базовых классах и теле класса), присваивания без
+  вызовов и docstring: исполнять нечего, достаточно проверки синтаксиса.
+  Импорт сторонних пакетов — уже не определение: сниппет запускается, чтобы
+  песочница поймала неверный импорт или API;
+- `run` — безопасен для запуска в песочнице;
+- `unsafe` — всё остальное: не исполняем (fail closed).
+
+Импортировать можно только модули из allowlist `_SAFE_MODULES` (чистые
+вычисления); сторонние пакеты и прочая стандартная библиотека — `unsafe`.
+Разрешённые модули реэкспортируют опасные (`logging.os`, `tarfile.os`,
+`asyncio.subprocess`), поэтому на любом объекте запрещены атрибуты с именами
+модулей вне allowlist, а также `os`/`sys`/`subprocess`/`builtins`/`open`/`mro`,
+атрибуты кадров (`gi_frame`, `f_globals`…), dunder‑атрибуты (кроме `__init__`),
+приватные атрибуты чужих объектов (`random._os`) и dunder внутри строк
+(`"{0.__class__}".format(x)`, `g["__builtins__"]`). Интроспекция (`getattr`,
+`globals`, `vars`…) и `open`/`exec`/`eval` тоже запрещены.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+import sys
+from dataclasses import dataclass
+
+DEFINITION = "definition"
+RUN = "run"
+UNSAFE = "unsafe"
+
+MAX_RUN_LENGTH = 1000
+
+# Разрешённые модули (allowlist, fail closed): чистые вычисления без доступа к ОС,
+# файлам, сети и интерпретатору. Всё, чего здесь нет, — `unsafe`, сниппет не исполняется.
+# Потоков нет: локальная песочница ставит RLIMIT_NPROC=0, и `threading` там не работает.
+_SAFE_MODULES = frozenset(
+    {
+        "__future__",
+        "abc",
+        "array",
+        "base64",
+        "binascii",
+        "bisect",
+        "calendar",
+        "cmath",
+        "collections",
+        "contextlib",
+        "copy",
+        "csv",
+        "dataclasses",
+        "datetime",
+        "decimal",
+        "difflib",
+        "enum",
+        "fractions",
+        "functools",
+        "graphlib",
+        "hashlib",
+        "heapq",
+        "hmac",
+        "html",
+        "io",
+        "itertools",
+        "json",
+        "math",
+        "numbers",
+        "operator",
+        "pprint",
+        "queue",
+        "random",
+        "re",
+        "reprlib",
+        "secrets",
+        "statistics",
+        "string",
+        "struct",
+        "textwrap",
+        "time",
+        "typing",
+        "unicodedata",
+        "weakref",
+        "zlib",
+    },
+)
+# Модули стандартной библиотеки вне allowlist: разрешённые модули реэкспортируют их
+# как атрибуты (`logging.os`, `dataclasses.inspect`), поэтому такие атрибуты запрещены
+_UNSAFE_MODULE_ATTRS = frozenset(sys.stdlib_module_names - _SAFE_MODULES)
+_UNSAFE_NAMES = frozenset(
+    {
+        "open",
+        "exec",
+        "eval",
+        "compile",
+        "__import__",
+        "input",
+        "breakpoint",
+        "help",
+        "memoryview",
+        "__builtins__",
+        # интроспекция позволяет собрать имя в рантайме: getattr(__builtins__, "op" + "en")
+        "getattr",
+        "setattr",
+        "delattr",
+        "vars",
+        "globals",
+        "locals",
+    },
+)
+# Dunder‑атрибуты запрещены все, кроме вызова конструктора базового класса (super().__init__)
+_ALLOWED_DUNDER_ATTRS = frozenset({"__init__"})
+# Приватные атрибуты (`random._os`) допустимы только у собственных объектов сниппета
+_PRIVATE_ATTR_OWNERS = frozenset({"self", "cls"})
+_UNSAFE_ATTRS = frozenset(
+    {
+        # доступ к ОС и интерпретатору через любой объект
+        "os",
+        "sys",
+        "subprocess",
+        "builtins",
+        "open",
+        "mro",
+        "system",
+        "popen",
+        "create_subprocess_exec",
+        "create_subprocess_shell",
+        "open_connection",
+        "start_server",
+        # кадры и код генераторов/корутин/трейсбеков ведут к globals и builtins
+        "gi_frame",
+        "gi_code",
+        "cr_frame",
+        "cr_code",
+        "ag_frame",
+        "ag_code",
+        "tb_frame",
+        "f_back",
+        "f_globals",
+        "f_locals",
+        "f_builtins",
+        "f_code",
+        # чтение файлов и вычисление строк как кода
+        "FileIO",
+        "open_code",
+        "get_type_hints",
+        "ForwardRef",
+    },
+)
+# Dunder внутри строки: `"{0.__class__}".format(x)` и ключи вида `g["__builtins__"]`
+_DUNDER_IN_STRING = re.compile(r"__\w+__")
+_ALLOWED_DUNDER_STRINGS = frozenset({"__main__", "__init__"})
+# Поля форматирования с доступом к атрибутам: `"{0.gi_frame.f_globals}".format(g)`
+_FORMAT_FIELD = re.compile(r"\{[^{}]*\}")
+_FIELD_ATTR = re.compile(r"\.\s*(\w+)")
+
+
+@dataclass(frozen=True)
+class SnippetClass:
+    """Класс сниппета и причина (для логов и сообщений `skipped`)."""
+
+    kind: str
+    reason: str = ""
+
+
+def _is_safe_module(name: str | None) -> bool:
+    return bool(name) and name.split(".", maxsplit=1)[0] in _SAFE_MODULES
+
+
+def _import_reason(node: ast.Import | ast.ImportFrom) -> str | None:
+    if isinstance(node, ast.Import):
+        bad = [a.name for a in node.names if not _is_safe_module(a.name)]
+        return f"import {bad[0]} (not allowlisted)" if bad else None
+    if node.level > 0:
+        return "relative import"
+    if not _is_safe_module(node.module):
+        return f"from {node.module} import (not allowlisted)"
+    # `from io import open`, `from logging import os` — те же запреты, что и для атрибутов
+    bad = [a.name for a in node.names if _is_unsafe_attr_name(a.name) or a.name in _UNSAFE_NAMES]
+    return f"from {node.module} import {bad[0]}" if bad else None
+
+
+def _is_unsafe_attr_name(attr: str) -> bool:
+    return (
+        attr in _UNSAFE_ATTRS
+        or attr in _UNSAFE_MODULE_ATTRS
+        or (_is_dunder(attr) and attr not in _ALLOWED_DUNDER_ATTRS)
+    )
+
+
+def _attr_reason(node: ast.Attribute) -> str | None:
+    attr = node.attr
+    if _is_unsafe_attr_name(attr):
+        return f"uses .{attr}"
+    if attr.startswith("_") and not _is_dunder(attr):
+        owner = node.value.id if isinstance(node.value, ast.Name) else None
+        return None if owner in _PRIVATE_ATTR_OWNERS else f"uses private .{attr}"
+    return None
+
+
+def _node_reason(node: ast.AST) -> str | None:
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return _import_reason(node)
+    if isinstance(node, ast.Name):
+        return f"uses {node.id}" if node.id in _UNSAFE_NAMES else None
+    if isinstance(node, ast.Attribute):
+        return _attr_reason(node)
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return _string_reason(node.value)
+    if isinstance(node, ast.arg) and isinstance(node.annotation, ast.Constant):
+        # строковые аннотации вычисляются eval'ом (get_type_hints, singledispatch.register)
+        return f"string annotation of {node.arg}"
+    return None
+
+
+def _string_reason(value: str) -> str | None:
+    bad = [m for m in _DUNDER_IN_STRING.findall(value) if m not in _ALLOWED_DUNDER_STRINGS]
+    if bad:
+        return f"uses {bad[0]!r} in a string"
+    for field in _FORMAT_FIELD.findall(value):
+        attrs = [a for a in _FIELD_ATTR.findall(field) if _is_unsafe_attr_name(a) or a.startswith("_")]
+        if attrs:
+            return f"uses .{attrs[0]} in a format field"
+    return None
+
+
+def _unsafe_reason(tree: ast.AST) -> str | None:
+    for node in ast.walk(tree):
+        reason = _node_reason(node)
+        if reason:
+            return reason
+    return None
+
+
+def _is_dunder(name: str) -> bool:
+    return len(name) > 4 and name.startswith("__") and name.endswith("__")
+
+
+def _is_stdlib_import(stmt: ast.Import | ast.ImportFrom) -> bool:
+    if isinstance(stmt, ast.ImportFrom):
+        modules = [stmt.module or ""] if stmt.level == 0 else []
+    else:
+        modules = [alias.name for alias in stmt.names]
+    return bool(modules) and all(m.split(".", maxsplit=1)[0] in sys.stdlib_module_names for m in modules)
+
+
+def _has_call(nodes: list[ast.AST | None]) -> bool:
+    return any(isinstance(n, (ast.Call, ast.Await)) for node in nodes if node is not None for n in ast.walk(node))
+
+
+def _is_inert_definition(stmt: ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef) -> bool:
+    """Определение без кода, исполняемого в момент определения."""
+    if stmt.decorator_list:
+        return False
+    if isinstance(stmt, ast.ClassDef):
+        # тело класса исполняется при определении — в нём допустимы только определения
+        return not _has_call([*stmt.bases, *(k.value for k in stmt.keywords)]) and all(
+            _is_definition_stmt(s) for s in stmt.body
+        )
+    # значения по умолчанию вычисляются при определении функции
+    return not _has_call([*stmt.args.defaults, *stmt.args.kw_defaults])
+
+
+def _is_definition_stmt(stmt: ast.stmt) -> bool:
+    if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        return _is_stdlib_import(stmt)
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return _is_inert_definition(stmt)
+    if isinstance(stmt, ast.Expr):
+        return isinstance(stmt.value, ast.Constant)
+    if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+        return not _has_call([stmt.value])
+    return isinstance(stmt, ast.Pass)
+
+
+def classify_snippet(code: str) -> SnippetClass:
+    """Классифицирует сниппет. Синтаксически неверный код — `unsafe` (его ловит AST‑проверка)."""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError) as e:
+        return SnippetClass(UNSAFE, f"syntax: {e}")
+    reason = _unsafe_reason(tree)
+    if reason:
+        return SnippetClass(UNSAFE, reason)
+    if all(_is_definition_stmt(s) for s in tree.body):
+        return SnippetClass(DEFINITION, "definitions only")
+    if len(code) > MAX_RUN_LENGTH:
+        return SnippetClass(UNSAFE, f"longer than {MAX_RUN_LENGTH} chars")
+    return SnippetClass(RUN)
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import logging
 import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
@@ -10,7 +11,9 @@ import feedparser
 import requests
 
 from .config import Config
-from .domain.dedup import quick_duplicate_heuristic
+from .deadline import check as check_deadline
+from .deadline import http_timeout
+from .domain.dedup import is_similar_to_recent, quick_duplicate_heuristic
 from .llm_dedupe import llm_is_duplicate
 from .state import StateStore
 
@@ -58,13 +61,18 @@ HOWTO_HINTS = [
 def fetch_hn(limit: int = 50) -> list[TopicCandidate]:
     """Возвращает кандидатов из Hacker News (top stories) с ключевыми словами."""
     try:
-        ids = requests.get("https://hacker-news.firebaseio.com/v0/topstories.json", timeout=15).json()
+        ids = requests.get("https://hacker-news.firebaseio.com/v0/topstories.json", timeout=http_timeout(15)).json()
     except Exception:
         return []
     result: list[TopicCandidate] = []
     for sid in ids[:limit]:
+        # отмена узла прерывает обход (внутри try её бы поглотил `except`)
+        check_deadline()
         try:
-            item = requests.get(f"https://hacker-news.firebaseio.com/v0/item/{sid}.json", timeout=10).json()
+            item = requests.get(
+                f"https://hacker-news.firebaseio.com/v0/item/{sid}.json",
+                timeout=http_timeout(10),
+            ).json()
             title = item.get("title", "")
             ts = item.get("time", int(time.time()))
             dt = datetime.fromtimestamp(ts, tz=timezone.utc)
@@ -80,6 +88,7 @@ def fetch_reddit() -> list[TopicCandidate]:
     """Возвращает кандидатов из Reddit по заранее заданным фидам."""
     result: list[TopicCandidate] = []
     for url in REDDIT_FEEDS:
+        check_deadline()
         try:
             feed = feedparser.parse(url)
             for e in feed.entries:
@@ -123,6 +132,7 @@ def fetch_telegram_rss() -> list[TopicCandidate]:
         return []
     result: list[TopicCandidate] = []
     for url in feeds:
+        check_deadline()
         try:
             feed = feedparser.parse(url)
             for e in feed.entries[:20]:
@@ -138,7 +148,22 @@ def fetch_telegram_rss() -> list[TopicCandidate]:
 
 
 def select_topic(state: StateStore | None = None) -> dict[str, object]:
-    """Собирает кандидатов из источников, применяет антидубли и выбирает лучшего."""
+    """Собирает кандидатов из источников, применяет антидубли и выбирает лучшего.
+
+    Помимо темы возвращает `recent_titles` — заголовки из Ghost, уже полученные
+    для антидублей (переиспользуются при выборе заголовка).
+    """
+    return select_topics(state, 1)[0]
+
+
+def select_topics(state: StateStore | None = None, count: int = 1) -> list[dict[str, object]]:
+    """Выбирает до `count` различных тем за один сбор кандидатов (для пакетного режима).
+
+    Источники и история Ghost запрашиваются один раз; темы отбираются по
+    убыванию рейтинга, похожие на уже выбранные в этом пакете пропускаются.
+    Если различных тем меньше `count`, это пишется в лог; если подходящих
+    кандидатов нет совсем — одна базовая тема.
+    """
     state = state or StateStore()
     cutoff = datetime.now(timezone.utc) - timedelta(hours=48)
 
@@ -179,21 +204,39 @@ def select_topic(state: StateStore | None = None) -> dict[str, object]:
     candidates.sort(key=_boost_score, reverse=True)
 
     if not candidates:
-        # fallback — базовая тема
+        # fallback — базовая тема (одна: пакет из `count` статей сократится до одной)
+        if count > 1:
+            logging.warning("Topics: no candidates left, using 1 fallback topic instead of %d", count)
         title = "Как начать проект с GPT-4o: от идеи до продакшна"
-        return {
-            "title": title,
-            "tags": ["AI", "LLM", "OpenAI"],
-            "outline": [
-                "Почему сейчас самое время стартовать",
-                "Архитектура агента и пайплайна",
-                "Фактчекинг и безопасность",
-                "Публикация и аналитика",
-            ],
-            "source": "fallback",
-        }
-
-    best = candidates[0]
+        return [
+            {
+                "title": title,
+                "tags": ["AI", "LLM", "OpenAI"],
+                "outline": [
+                    "Почему сейчас самое время стартовать",
+                    "Архитектура агента и пайплайна",
+                    "Фактчекинг и безопасность",
+                    "Публикация и аналитика",
+                ],
+                "source": "fallback",
+                "recent_titles": recent_titles,
+            },
+        ]
+
+    # Антидубли внутри пакета: темы, похожие на уже выбранные, пропускаем
+    picked: list[TopicCandidate] = []
+    for c in candidates:
+        if len(picked) >= max(1, count):
+            break
+        if is_similar_to_recent(c.title, [p.title for p in picked]):
+            continue
+        picked.append(c)
+    if len(picked) < count:
+        logging.warning("Topics: only %d distinct topics of %d requested", len(picked), count)
+    return [_topic_from_candidate(c, recent_titles) for c in picked]
+
+
+def _topic_from_candidate(best: TopicCandidate, recent_titles: list[str]) -> dict[str, object]:
     tags = ["AI"] if "ai" in best.title.lower() else []
     if any(w in best.title.lower() for w in ["python", "django", "fastapi"]):
         tags.append("Python")
@@ -201,7 +244,13 @@ def select_topic(state: StateStore | None = None) -> dict[str, object]:
         tags.append("WebDev")
 
     outline = build_outline(best.title)
-    return {"title": best.title, "tags": tags or ["Tech"], "outline": outline, "source": best.source}
+    return {
+        "title": best.title,
+        "tags": tags or ["Tech"],
+        "outline": outline,
+        "source": best.source,
+        "recent_titles": recent_titles,
+    }
 
 
 def build_outline(title: str) -> list[str]:
@@ -0,0 +1,68 @@
+"""Финализация HTML: санитизация, вставка CTA и обрезка по бюджету размера."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.html_finalizer import finalize_html
+
+CTA = ['<div class="cta">A</div>', '<div class="cta">B</div>', '<div class="cta">C</div>']
+
+
+@pytest.mark.parametrize(
+    ("dirty", "forbidden"),
+    [
+        ("<p>x</p><script>alert(1)</script>", "alert"),
+        ('<p onclick="alert(1)">x</p>', "onclick"),
+        ('<a href="javascript:alert(1)">x</a>', "javascript"),
+        ('<a href="java\tscript:alert(1)">x</a>', "script:"),
+        ('<a href="JaVaScRiPt:alert(1)">x</a>', "alert"),
+        ('<iframe src="https://evil.example"></iframe><p>x</p>', "iframe"),
+        ('<p style="width: expression(alert(1))">x</p>', "expression"),
+        ('<img src="data:text/html;base64,PHNjcmlwdD4=">', "data:text"),
+        ('<form action="https://evil.example"><input name="q"></form>', "form"),
+        ("<svg><script>alert(1)</script></svg><p>x</p>", "svg"),
+    ],
+)
+def test_dangerous_markup_is_removed(dirty: str, forbidden: str) -> None:
+    result = finalize_html(dirty, max_bytes=0)
+    assert forbidden not in result.html
+    assert result.removed >= 1
+
+
+def test_safe_markup_is_kept() -> None:
+    article = (
+        '<p>Ссылка <a href="https://example.com" target="_blank">тут</a>'
+        ' и <a href="mailto:a@example.com">почта</a></p>'
+        '<img src="data:image/png;base64,iVBORw0KGgo=" alt="x">'
+    )
+    result = finalize_html(article, max_bytes=0)
+    assert 'href="https://example.com"' in result.html
+    assert 'rel="noopener"' in result.html
+    assert 'href="mailto:a@example.com"' in result.html
+    assert 'src="data:image/png;base64,iVBORw0KGgo="' in result.html
+    assert result.removed == 0
+
+
+def test_whitespace_collapsed_outside_pre() -> None:
+    result = finalize_html("<p>a    b\n\n c</p><pre><code>x  =  1\n  y</code></pre>", max_bytes=0)
+    assert "<p>a b c</p>" in result.html
+    assert "x  =  1\n  y" in result.html
+
+
+def test_cta_slots_and_tail() -> None:
+    article = "<p>a</p><!--CTA_SLOT--><p>b</p><!-- other -->"
+    result = finalize_html(article, CTA, max_bytes=0)
+    assert result.html == '<p>a</p><div class="cta">A</div><p>b</p><div class="cta">B</div><div class="cta">C</div>'
+    assert result.ctas_inserted == 3
+
+
+def test_truncation_closes_tags_and_counts_surviving_ctas() -> None:
+    article = "<p>intro</p><!--CTA_SLOT--><p>" + "x" * 500 + "</p><!--CTA_SLOT--><div><p>" + "y" * 500 + "</p></div>"
+    result = finalize_html(article, CTA, max_bytes=300)
+    assert result.truncated
+    assert len(result.html.encode("utf-8")) <= 300
+    assert "y" * 10 not in result.html
+    # второй слот отрезан вместе с концом — вставленными считаются первый CTA и хвост
+    assert result.ctas_inserted == result.html.count('class="cta"') == 2
+    assert result.html.count("<p>") == result.html.count("</p>")
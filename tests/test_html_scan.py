@@ -0,0 +1,46 @@
+"""Однопроходный разбор HTML: блоки кода, текст, ссылки и точечная подмена кода."""
+
+from __future__ import annotations
+
+from src.html_scan import extract_code_blocks, extract_links, extract_text, splice_code_blocks
+
+ARTICLE = (
+    "<h2>Пример</h2>\n"
+    '<p>Смотрите <a href="https://example.com/docs">доки</a> и <code>import requests</code>.</p>\n'
+    '<pre><code class="language-python">print(1)\n</code></pre>\n'
+    "<p>Ещё</p>\n"
+    '<pre><code class="language-bash">echo hi</code></pre>\n'
+)
+
+
+def test_extract_code_blocks_with_offsets() -> None:
+    blocks = extract_code_blocks(ARTICLE)
+    assert [b.index for b in blocks] == [0, 1]
+    assert blocks[0].is_python and blocks[0].language == "python"
+    assert blocks[1].language == "bash"
+    assert ARTICLE[blocks[0].start : blocks[0].end] == "print(1)\n"
+
+
+def test_splice_replaces_only_target_block() -> None:
+    blocks = extract_code_blocks(ARTICLE)
+    result = splice_code_blocks(ARTICLE, blocks, {0: "print(a < b)"})
+    assert '<code class="language-python">print(a &lt; b)</code>' in result
+    # всё вне подменённого блока — байт в байт
+    assert result.replace("print(a &lt; b)", "print(1)\n") == ARTICLE
+
+
+def test_splice_falls_back_when_offsets_unreliable() -> None:
+    # сырой `<` внутри кода html.parser принимает за начало тега — смещения ненадёжны
+    article = '<pre><code class="language-python">if a<b:\n    pass</code></pre><p>tail</p>'
+    blocks = extract_code_blocks(article)
+    result = splice_code_blocks(article, blocks, {0: "x = 1"})
+    assert "x = 1</code>" in result
+    assert "<p>tail</p>" in result
+
+
+def test_extract_text_and_links() -> None:
+    text, inline = extract_text(ARTICLE)
+    assert "Пример" in text and "Ещё" in text
+    assert "print(1)" not in text
+    assert inline == ["import requests"]
+    assert extract_links(ARTICLE) == ["https://example.com/docs"]
@@ -0,0 +1,81 @@
+"""Ограничитель частоты: token bucket, дневной журнал квот и реакция на 429/403."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+import requests
+
+from src import rate_limiter
+from src.config import Config
+from src.rate_limiter import QuotaLedger, RateLimiter, RateLimitExceeded, TokenBucket
+
+
+@pytest.fixture
+def limiter(monkeypatch: pytest.MonkeyPatch, tmp_path) -> RateLimiter:
+    monkeypatch.setattr(Config, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(Config, "RATE_LIMITS", "fast.example=100/1,slow.example=1/60")
+    monkeypatch.setattr(Config, "DAILY_QUOTAS", "fast.example=3")
+    monkeypatch.setattr(Config, "RATE_LIMIT_MAX_WAIT_SEC", 0.05)
+    return RateLimiter()
+
+
+def _response(status: int, headers: dict[str, str] | None = None) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    return resp
+
+
+def test_token_bucket_capacity_and_refill() -> None:
+    bucket = TokenBucket(capacity=2, rate=100.0)
+    assert bucket.acquire(0) and bucket.acquire(0)
+    assert not bucket.acquire(0)
+    assert bucket.acquire(0.1)
+
+
+def test_token_bucket_block_until() -> None:
+    bucket = TokenBucket(capacity=5, rate=100.0)
+    bucket.block_until(rate_limiter.time.monotonic() + 60)
+    assert not bucket.acquire(0.05)
+
+
+def test_quota_ledger_persists_and_enforces_limit(tmp_path) -> None:
+    path = tmp_path / "quota.json"
+    ledger = QuotaLedger(path, "America/Los_Angeles")
+    assert ledger.try_spend("h", 2) and ledger.try_spend("h", 2)
+    assert not ledger.try_spend("h", 2)
+    assert QuotaLedger(path, "America/Los_Angeles").used("h") == 2
+    assert list(json.loads(path.read_text(encoding="utf-8")).values()) == [{"h": 2}]
+
+
+def test_daily_quota_exhausted(limiter: RateLimiter) -> None:
+    for _ in range(3):
+        limiter.acquire("fast.example")
+    assert limiter.remaining("fast.example") == 0
+    with pytest.raises(RateLimitExceeded, match="daily quota"):
+        limiter.acquire("fast.example")
+
+
+def test_rate_limit_without_waiting_past_max(limiter: RateLimiter) -> None:
+    limiter.acquire("slow.example")
+    with pytest.raises(RateLimitExceeded, match="rate limit"):
+        limiter.acquire("slow.example")
+
+
+def test_unknown_host_is_unlimited(limiter: RateLimiter) -> None:
+    for _ in range(10):
+        limiter.acquire("other.example")
+    assert limiter.remaining("other.example") is None
+
+
+def test_429_blocks_host(limiter: RateLimiter) -> None:
+    limiter.note_response("fast.example", _response(429, {"Retry-After": "60"}))
+    with pytest.raises(RateLimitExceeded, match="rate limit"):
+        limiter.acquire("fast.example")
+
+
+def test_403_without_rate_limit_headers_does_not_block(limiter: RateLimiter) -> None:
+    limiter.note_response("fast.example", _response(403))
+    limiter.acquire("fast.example")
@@ -0,0 +1,82 @@
+"""Локальная песочница: команда bubblewrap, отказ без изоляции и обходы внутри воркера."""
+
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from src import sandbox_pool
+from src.config import Config
+from src.fact_checker import _scrub_sandbox_output
+
+needs_bwrap = pytest.mark.skipif(shutil.which(Config.SANDBOX_BWRAP) is None, reason="bubblewrap not installed")
+
+
+@pytest.fixture
+def fake_bwrap(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(sandbox_pool.shutil, "which", lambda name: "/usr/bin/bwrap")
+
+
+def test_bwrap_command_isolates_worker(fake_bwrap: None, tmp_path) -> None:
+    cmd = sandbox_pool._bwrap_command(str(tmp_path), 2, 256)
+    assert cmd[0] == "/usr/bin/bwrap"
+    for flag in ("--unshare-all", "--unshare-user", "--die-with-parent", "--clearenv"):
+        assert flag in cmd
+    assert cmd[cmd.index("--uid") + 1] == "65534"
+    assert cmd[cmd.index("--cap-drop") + 1] == "ALL"
+    # Каталог проекта и домашний каталог внутрь не монтируются — только рабочая временная директория
+    binds = [cmd[i + 1] for i, arg in enumerate(cmd) if arg in ("--bind", "--ro-bind")]
+    assert str(tmp_path) in binds
+    assert str(Path(__file__).resolve().parents[1]) not in binds
+    assert "/root" not in binds and "/home" not in binds
+    assert "RLIMIT_NPROC" in cmd[cmd.index("-c") + 1]
+
+
+def test_missing_bwrap_disables_local_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Config, "SANDBOX_BWRAP", "definitely-not-bwrap")
+    monkeypatch.setattr(sandbox_pool, "_pool", None)
+    with pytest.raises(RuntimeError):
+        sandbox_pool.get_local_pool()
+    assert sandbox_pool._pool is None
+
+
+def test_scrub_masks_secrets_and_truncates(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test-secret-value")
+    out = "\n".join(f"line {i}" for i in range(50)) + "\nKeyError: sk-test-secret-value " + "a" * 40
+    text = _scrub_sandbox_output(out)
+    assert "sk-test-secret-value" not in text
+    assert "a" * 40 not in text
+    assert "line 0" not in text
+    assert len(text) <= 601
+
+
+@needs_bwrap
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import os\nprint(open(os.path.join(os.sep, 'root', '.bashrc')).read())",
+        "import os\nprint(os.environ['OPENAI_API_KEY'])",
+        "import os\nos.fork()",
+        "import socket\nsocket.create_connection(('1.1.1.1', 80), timeout=1)",
+        "import _thread\n_thread.start_new_thread(print, ())",
+    ],
+    ids=["read home", "read env", "fork", "network", "thread"],
+)
+def test_worker_blocks_escapes(code: str) -> None:
+    pool = sandbox_pool.LocalSandboxPool(1, wall_sec=10)
+    try:
+        ok, _ = pool.run(code)
+    finally:
+        pool.close()
+    assert not ok
+
+
+@needs_bwrap
+def test_worker_runs_plain_code() -> None:
+    pool = sandbox_pool.LocalSandboxPool(1, wall_sec=10)
+    try:
+        assert pool.run("print(sum(range(10)))") == (True, "45")
+    finally:
+        pool.close()
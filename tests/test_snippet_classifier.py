@@ -0,0 +1,82 @@
+"""Классификатор сниппетов: известные обходы — unsafe, обычный учебный код — исполняется."""
+
+from __future__ import annotations
+
+import pytest
+
+from src.snippet_classifier import DEFINITION, RUN, UNSAFE, classify_snippet
+
+ESCAPES = {
+    "os import": "import os\nos.system('id')",
+    "subprocess": "import subprocess\nsubprocess.run(['id'])",
+    "codecs.open": "import codecs\nprint(codecs.open('/etc/passwd').read())",
+    "logging.os": "import logging\nlogging.os.system('id')",
+    "tarfile.os": "import tarfile\ntarfile.os.listdir('/')",
+    "asyncio.subprocess": "import asyncio\nprint(asyncio.subprocess)",
+    "mro": "x = 1\nprint(type(x).mro()[-1].__subclasses__())",
+    "random._os": "import random\nprint(random._os.environ)",
+    "io.FileIO": "import io\nprint(io.FileIO('/etc/passwd').read())",
+    "from io import open": "from io import open\nprint(open('/etc/passwd').read())",
+    "frame builtins": "def g():\n    yield 1\ngen = g()\nprint(gen.gi_frame.f_builtins)",
+    "format dunder": "print('{0.__class__}'.format(1))",
+    "string annotation": ("import typing\ndef f(x: 'sys.modules'):\n    pass\nprint(typing.get_type_hints(f))"),
+    "singledispatch annotation": (
+        "from functools import singledispatch\n"
+        "@singledispatch\n"
+        "def f(x):\n"
+        "    pass\n"
+        "@f.register\n"
+        'def _(x: \'__import__("os").system("id")\'):\n'
+        "    pass\n"
+    ),
+    "builtins dict": "g = globals()\nprint(g['__builtins__'])",
+    "eval": "print(eval('1 + 1'))",
+    "third party": "import numpy as np\nprint(np.zeros(3))",
+    "uuid": "import uuid\nprint(uuid.uuid4())",
+    "threading": "import threading\nthreading.Thread(target=print).start()",
+}
+
+BENIGN = {
+    "math": "import math\nprint(math.sqrt(16))",
+    "defaultdict": "from collections import defaultdict\nd = defaultdict(int)\nd['a'] += 1\nprint(d)",
+    "class with private": (
+        "class Counter:\n"
+        "    def __init__(self):\n"
+        "        self._n = 0\n"
+        "    def inc(self):\n"
+        "        self._n += 1\n"
+        "        return self._n\n"
+        "print(Counter().inc())"
+    ),
+    "main guard": "def main():\n    print('hi')\n\nif __name__ == '__main__':\n    main()",
+    "StringIO": "import io\nbuf = io.StringIO()\nbuf.write('x')\nprint(buf.getvalue())",
+    "format": "name = 'world'\nprint('hello {}'.format(name))",
+    "dataclass": (
+        "from __future__ import annotations\n"
+        "from dataclasses import dataclass\n"
+        "@dataclass\n"
+        "class P:\n"
+        "    x: int\n"
+        "print(P(1))"
+    ),
+    "json": "import json\nprint(json.dumps({'a': 1}))",
+}
+
+
+@pytest.mark.parametrize("code", ESCAPES.values(), ids=ESCAPES.keys())
+def test_escape_snippets_are_unsafe(code: str) -> None:
+    assert classify_snippet(code).kind == UNSAFE
+
+
+@pytest.mark.parametrize("code", BENIGN.values(), ids=BENIGN.keys())
+def test_regular_snippets_run(code: str) -> None:
+    assert classify_snippet(code).kind == RUN
+
+
+def test_pure_definitions_are_not_run() -> None:
+    code = "import math\n\ndef area(r):\n    return math.pi * r * r\n"
+    assert classify_snippet(code).kind == DEFINITION
+
+
+def test_syntax_error_is_not_run() -> None:
+    assert classify_snippet("def broken(:\n    pass").kind == UNSAFE